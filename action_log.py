@@ -0,0 +1,186 @@
+"""
+Castle War Game - Action Log
+Compact binary record of a match: the seed of its card RNG, the player names
+and one 32-bit word per applied action. Since every card draw comes from that
+seed, replaying the actions through a RulesEngine rebuilds the exact state
+after any turn without rendering anything.
+
+Archive files are plain concatenations of logs:
+    header  "<4sQIII" magic, card seed, action count, name lengths
+    names   UTF-8 player names (an empty second name means the AI Enemy)
+    actions action_count little-endian uint32 words, see encode_action
+Logs of the first format ("CWL1", one-byte name lengths) can still be read.
+"""
+
+import random
+import struct
+import sys
+from array import array
+
+from rules_engine import Action, ATTACK, HEAL, DAMAGE, PLAY_CARD, NEXT_TURN, new_match
+
+MAGIC = b"CWL2"
+_HEADER = struct.Struct("<4sQIII")
+# Header of every readable format by its magic
+_HEADERS = {b"CWL1": struct.Struct("<4sQIBB"), MAGIC: _HEADER}
+
+# Action kinds by their 3-bit code
+ACTION_KINDS = (NEXT_TURN, ATTACK, HEAL, DAMAGE, PLAY_CARD)
+_KIND_CODES = {kind: code for code, kind in enumerate(ACTION_KINDS)}
+
+NO_PERCENTAGE = 0x7F  # soldier_percentage=None
+NO_CARD = 0xF  # No card id
+MAX_CARD_INDEX = 0x3FFFF  # The 18 bits left in the word
+
+
+def encode_action(action, card_id=None):
+    """Pack an action into 32 bits: kind, soldier percentage, card id and card index"""
+    percentage = NO_PERCENTAGE if action.soldier_percentage is None else int(action.soldier_percentage)
+    card_index = 0 if action.card_index is None else action.card_index
+    if not 0 <= percentage <= 100 and percentage != NO_PERCENTAGE:
+        raise ValueError(f"Soldier percentage out of range: {percentage}")
+    if card_index > MAX_CARD_INDEX:
+        raise ValueError(f"Card index out of range: {card_index}")
+    card_id = NO_CARD if card_id is None else card_id
+    return _KIND_CODES[action.kind] | percentage << 3 | card_id << 10 | card_index << 14
+
+
+def decode_action(word):
+    """Unpack a word written by encode_action, returns (action, card_id)"""
+    kind = ACTION_KINDS[word & 0x7]
+    percentage = word >> 3 & 0x7F
+    card_id = word >> 10 & 0xF
+    card_index = word >> 14
+    action = Action(kind, None if percentage == NO_PERCENTAGE else percentage,
+                    card_index if kind == PLAY_CARD else None)
+    return action, None if card_id == NO_CARD else card_id
+
+
+class ActionLog:
+    """Actions applied to one match, in order
+
+    Pass it as the log of a RulesEngine (see new_match) to record every action
+    that took effect.
+    """
+
+    def __init__(self, card_seed, player1_name, player2_name=None):
+        self.card_seed = card_seed
+        self.player1_name = player1_name
+        self.player2_name = player2_name
+        self.actions = array("I")
+
+    def __len__(self):
+        return len(self.actions)
+
+    def record(self, action, card_id=None):
+        """Append an applied action (card_id is the card it played, if any)"""
+        self.append(self.encode(action, card_id))
+
+    def encode(self, action, card_id=None):
+        """Word an action is recorded as, raises ValueError if the format cannot hold it"""
+        return encode_action(action, card_id)
+
+    def append(self, word):
+        """Append the word of an applied action, as returned by encode"""
+        self.actions.append(word)
+
+    def decoded(self):
+        """Iterate over (action, card_id) pairs"""
+        for word in self.actions:
+            yield decode_action(word)
+
+    def new_engine(self, stats=None, on_message=None):
+        """A fresh engine for this match, with the same card draws as the original"""
+        return new_match(self.player1_name, self.player2_name, stats=stats, on_message=on_message,
+                         rng=random.Random(self.card_seed))
+
+    def to_bytes(self):
+        """Serialise to the archive format"""
+        name1 = self.player1_name.encode()
+        name2 = (self.player2_name or "").encode()
+        actions = self.actions
+        if sys.byteorder != "little":
+            actions = array("I", actions)
+            actions.byteswap()
+        return (_HEADER.pack(MAGIC, self.card_seed, len(self.actions), len(name1), len(name2))
+                + name1 + name2 + actions.tobytes())
+
+    @classmethod
+    def read(cls, file):
+        """Read the next log from a binary file, returns None at the end of the file"""
+        header = _read_header(file)
+        if header is None:
+            return None
+        card_seed, count, name1_length, name2_length = header
+        player1_name = file.read(name1_length).decode()
+        player2_name = file.read(name2_length).decode() or None
+        log = cls(card_seed, player1_name, player2_name)
+        log.actions.frombytes(file.read(count * log.actions.itemsize))
+        if sys.byteorder != "little":
+            log.actions.byteswap()
+        return log
+
+
+def _read_header(file):
+    """Read the header of the next log, returns (card_seed, count, name lengths) or None at the end"""
+    magic = file.read(len(MAGIC))
+    if not magic:
+        return None
+    header = _HEADERS.get(magic)
+    if header is None:
+        raise ValueError("Not a Castle War action log")
+    return header.unpack(magic + file.read(header.size - len(magic)))[1:]
+
+
+def append_logs(path, logs):
+    """Append logs to an archive file"""
+    with open(path, "ab") as file:
+        for log in logs:
+            file.write(log if isinstance(log, bytes) else log.to_bytes())
+
+
+def read_logs(path):
+    """Iterate over every log of an archive file"""
+    with open(path, "rb") as file:
+        log = ActionLog.read(file)
+        while log is not None:
+            yield log
+            log = ActionLog.read(file)
+
+
+def index_logs(path):
+    """Byte offset of every log in an archive, skipping over the actions"""
+    offsets = []
+    with open(path, "rb") as file:
+        offset = 0
+        header = _read_header(file)
+        while header is not None:
+            _, count, name1_length, name2_length = header
+            offsets.append(offset)
+            offset = file.tell() + name1_length + name2_length + 4 * count
+            file.seek(offset)
+            header = _read_header(file)
+    return offsets
+
+
+def read_log_at(path, offset):
+    """Read the log starting at a byte offset returned by index_logs"""
+    with open(path, "rb") as file:
+        file.seek(offset)
+        return ActionLog.read(file)
+
+
+def replay(log, actions=None, stats=None, on_message=None):
+    """Rebuild a match by fast-forwarding its first actions logged actions (all by default)
+
+    actions counts every logged action, not turns. Returns the RulesEngine,
+    whose state is exactly that of the original match after those actions.
+    """
+    engine = log.new_engine(stats, on_message)
+    apply = engine.apply
+    for index, (action, _) in enumerate(log.decoded()):
+        if actions is not None and index >= actions:
+            break
+        if not apply(action):
+            raise ValueError(f"Action {index} of the log was rejected: {action}")
+    return engine
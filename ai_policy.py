@@ -0,0 +1,522 @@
+"""
+Castle War Game - AI Policies
+Opponents that pick actions for a RulesEngine, usable by the GUI and headless tools.
+"""
+
+import math
+import os
+import random
+import itertools
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+from functools import partial
+
+from rules_engine import (Action, END_TURN, ATTACK, HEAL, DAMAGE, PLAY_CARD, NEXT_TURN, allocation_percentages,
+                          new_match)
+
+
+class BasicPolicy:
+    """The original scripted enemy: fixed allocation ratios and action odds"""
+
+    def __init__(self, rng=None):
+        self.rng = rng or random
+
+    def think(self, engine, seconds):
+        """Spend up to seconds on the current decision, True once choose_action is ready"""
+        return True
+
+    def choose_action(self, engine):
+        """Pick the next action for the current player of the engine"""
+        state = engine.state
+        if state.current_round == 1 or state.action_taken:
+            return END_TURN
+
+        player = state.get_current_player()
+
+        # Decide how to allocate population if not done yet this round
+        soldier_percentage = None
+        if not player.allocated_this_round:
+            soldier_percentage = 70 if player.hearts > 15 else 30
+
+        # First decide if AI will use a card (60% chance if one is available)
+        playable = engine.playable_cards()
+        if playable and self.rng.random() < 0.6:
+            return Action(PLAY_CARD, soldier_percentage, self.rng.choice(playable))
+
+        ai_choice = self.rng.random()
+        if ai_choice < 0.3:  # 30% chance to heal
+            return Action(HEAL, soldier_percentage)
+        elif ai_choice < 0.6:  # 30% chance to boost damage
+            return Action(DAMAGE, soldier_percentage)
+        return Action(ATTACK, soldier_percentage)  # 40% chance to attack
+
+
+def heuristic_value(state):
+    """Player1's chance of winning: exact once the game is over, else judged by the hearts difference"""
+    if state.game_over:
+        return 1.0 if state.winner == "player1" else 0.0
+    return 0.5 + 0.5 * math.tanh((state.player1.hearts - state.player2.hearts) / 20)
+
+
+class _SearchNode:
+    """A decision point of the MCTS tree: a state with the player to move"""
+    __slots__ = ("key", "player", "untried", "edges", "visits")
+
+    def __init__(self, key, player, moves):
+        self.key = key
+        self.player = player
+        self.untried = moves
+        self.edges = []
+        self.visits = 0
+
+
+class _SearchEdge:
+    """A move from a node; a chance node over the states it can lead to (card draws)"""
+    __slots__ = ("action", "player", "visits", "total", "outcomes")
+
+    def __init__(self, action, player):
+        self.action = action
+        self.player = player
+        self.visits = 0
+        self.total = 0.0  # Sum of rewards for player
+        self.outcomes = {}  # State snapshot -> _SearchNode
+
+
+class MCTSPolicy:
+    """Monte Carlo Tree Search over allocations, actions and card plays
+
+    A move is one action followed by ending the turn. Each move is a chance
+    node whose outcomes are the distinct states it led to, so Battle Chest,
+    Double Draw and steal draws are sampled with their real odds. The search
+    spends time_budget seconds per move (or a fixed number of iterations) and
+    keeps the subtree of the position reached when it is asked again.
+    """
+
+    def __init__(self, rng=None, time_budget=0.05, iterations=None, exploration=0.7, allocation_steps=6,
+                 rollout_rounds=30):
+        self.rng = rng or random.Random()
+        self.time_budget = time_budget
+        self.iterations = iterations
+        self.exploration = exploration
+        self.allocation_steps = allocation_steps
+        self.rollout_rounds = rollout_rounds
+        self.rollout_policy = BasicPolicy(self.rng)
+        self._root = None
+        self._spent = 0.0
+        self._iterations_done = 0
+
+    def think(self, engine, seconds):
+        """Search for up to seconds, True once the budget for this move is spent"""
+        state = engine.state
+        if state.game_over or state.current_round == 1 or state.action_taken:
+            return True
+
+        root = self._prepare_root(engine)
+        if len(root.untried) + len(root.edges) <= 1:
+            return True
+
+        if self.iterations is not None:
+            self._search(engine, root, self.iterations - self._iterations_done, None)
+            return True
+        seconds = min(seconds, self.time_budget - self._spent)
+        if seconds > 0:
+            start = time.perf_counter()
+            self._search(engine, root, None, start + seconds)
+            self._spent += time.perf_counter() - start
+        return self._spent >= self.time_budget
+
+    def choose_action(self, engine):
+        """Search the current position for the rest of the budget and pick the most visited move"""
+        state = engine.state
+        if state.current_round == 1 or state.action_taken:
+            return END_TURN
+        return most_visited(self.root_statistics(engine))
+
+    def root_statistics(self, engine):
+        """Finish the search of the current position, returns (action, visits, total reward) per move"""
+        self.think(engine, self.time_budget)
+        root = self._root
+        self._spent = 0.0
+        self._iterations_done = 0
+        if not root.edges:
+            return [(root.untried[-1], 0, 0.0)]
+        return [(edge.action, edge.visits, edge.total) for edge in root.edges]
+
+    def _prepare_root(self, engine):
+        """Reuse the subtree of the current position from the last search, or start a new tree"""
+        key = engine.state.snapshot()
+        root = self._root
+        if root is not None and root.key == key:
+            return root
+
+        # The position is usually two moves (ours and the opponent's) below the old root
+        self._root = None
+        self._spent = 0.0
+        self._iterations_done = 0
+        nodes = [root] if root is not None else []
+        for _ in range(2):
+            nodes = [child for node in nodes for edge in node.edges for child in edge.outcomes.values()]
+            for node in nodes:
+                if node.key == key:
+                    self._root = node
+                    return node
+
+        self._root = self._new_node(engine, key)
+        return self._root
+
+    def _new_node(self, engine, key):
+        state = engine.state
+        moves = [] if state.game_over else self._moves(engine)
+        self.rng.shuffle(moves)
+        return _SearchNode(key, state.current_turn, moves)
+
+    def _moves(self, engine):
+        """Legal actions, with the allocation thinned to allocation_steps distinct soldier counts"""
+        actions = engine.legal_actions()
+        player = engine.state.get_current_player()
+        if player.allocated_this_round:
+            return actions
+
+        percentages = allocation_percentages(player.population)
+        if len(percentages) > self.allocation_steps:
+            last = len(percentages) - 1
+            percentages = {percentages[round(i * last / (self.allocation_steps - 1))]
+                           for i in range(self.allocation_steps)}
+        return [action for action in actions if action.soldier_percentage in percentages]
+
+    def _search(self, engine, root, iterations, deadline):
+        """Run iterations from root until the iteration count or deadline is reached"""
+        state = engine.state
+        card_system = engine.card_system
+        snapshot = state.snapshot()
+
+        # Search on the real engine, but keep its logs, stats and card RNG out of it
+        saved = (engine.log, engine.stats, engine.on_message, card_system.rng)
+        engine.log = engine.stats = engine.on_message = None
+        card_system.rng = self.rng
+        try:
+            while True:
+                if iterations is not None:
+                    if iterations <= 0:
+                        break
+                    iterations -= 1
+                elif time.perf_counter() >= deadline:
+                    break
+                state.restore(snapshot)
+                self._iterate(engine, root)
+                self._iterations_done += 1
+        finally:
+            state.restore(snapshot)
+            engine.log, engine.stats, engine.on_message, card_system.rng = saved
+
+    def _iterate(self, engine, root):
+        """Selection, expansion, rollout and backpropagation of one simulated game"""
+        state = engine.state
+        node = root
+        nodes = [root]
+        edges = []
+        while not state.game_over:
+            if node.untried:
+                edge = _SearchEdge(node.untried.pop(), node.player)
+                node.edges.append(edge)
+            else:
+                edge = self._select(node)
+            edges.append(edge)
+
+            self._play(engine, edge.action)
+            key = state.snapshot()
+            child = edge.outcomes.get(key)
+            if child is None:
+                child = edge.outcomes[key] = self._new_node(engine, key)
+                nodes.append(child)
+                break
+            node = child
+            nodes.append(node)
+
+        reward = self._rollout(engine)
+        for node in nodes:
+            node.visits += 1
+        for edge in edges:
+            edge.visits += 1
+            edge.total += reward if edge.player == "player1" else 1.0 - reward
+
+    def _select(self, node):
+        """UCB1 over the moves of a fully expanded node"""
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+        return max(node.edges, key=lambda edge: edge.total / edge.visits
+                   + exploration * math.sqrt(log_visits / edge.visits))
+
+    def _play(self, engine, action):
+        """Apply a move: the action, then end the turn"""
+        engine.apply(action)
+        if action.kind != NEXT_TURN and not engine.state.game_over:
+            engine.apply(END_TURN)
+
+    def _rollout(self, engine):
+        """Play on with the basic policy, returns player1's reward in [0, 1]"""
+        state = engine.state
+        policy = self.rollout_policy
+        last_round = state.current_round + self.rollout_rounds
+        while not state.game_over and state.current_round < last_round:
+            engine.apply(policy.choose_action(engine))
+
+        return heuristic_value(state)
+
+
+def most_visited(statistics):
+    """The action with the most visits in (action, visits, total) root statistics"""
+    return max(statistics, key=lambda item: item[1])[0]
+
+
+# Search trees kept by each worker process, least recently used first, see _search_worker
+_worker_searches = OrderedDict()
+_MAX_WORKER_SEARCHES = 64
+
+# Set in processes that are themselves pool workers, see search_in_process
+_in_process_search = False
+
+# Identifies each ParallelMCTSPolicy's trees; not drawn from its rng, or a replayed game would reuse the old trees
+_search_ids = itertools.count()
+
+
+def _warm_worker():
+    """Worker initializer: the rules engine and this module are imported once per worker"""
+    _worker_searches.clear()
+
+
+def _search_worker(search_key, seed, player1_name, player2_name, snapshot, options):
+    """Run one independent MCTS of a position in a search worker, returns its root statistics
+
+    A worker keeps its trees between moves and every slot always runs on the
+    same worker (see get_search_workers), so the subtree is reused whenever
+    the slot searches for the same search_key again.
+    """
+    policy = _worker_searches.get(search_key)
+    if policy is None:
+        if len(_worker_searches) >= _MAX_WORKER_SEARCHES:
+            _worker_searches.popitem(last=False)
+        policy = _worker_searches[search_key] = MCTSPolicy(random.Random(seed), **options)
+    else:
+        _worker_searches.move_to_end(search_key)
+    engine = new_match(player1_name, player2_name)
+    engine.state.restore(snapshot)
+    return policy.root_statistics(engine)
+
+
+def _noop():
+    return None
+
+
+# Single-process executors shared by every ParallelMCTSPolicy of the process, created on first use
+_search_workers = []
+
+
+def get_search_workers(workers=None):
+    """The persistent search workers for root-parallel search, started, one executor per slot
+
+    Slot i is always submitted to executor i, so it always runs in the same
+    process and finds the tree it kept from the previous move.
+    """
+    workers = workers or os.cpu_count() or 1
+    if len(_search_workers) < workers:
+        started = [ProcessPoolExecutor(max_workers=1, initializer=_warm_worker)
+                   for _ in range(workers - len(_search_workers))]
+        # Start every worker now rather than on the first move
+        wait([executor.submit(_noop) for executor in started])
+        _search_workers.extend(started)
+    return _search_workers[:workers]
+
+
+def search_in_process():
+    """Pool worker initializer: search every tree in the worker itself rather than in search processes
+
+    The pool already keeps every core busy, and search processes per worker
+    would start about cpu_count ** 2 of them. The trees are the same either
+    way, so the moves do not change.
+    """
+    global _in_process_search
+    _in_process_search = True
+
+
+def shutdown_search_pool():
+    """Stop the search workers
+
+    Needed before a multiprocessing worker that used them exits, since the
+    worker would otherwise wait forever for the search processes.
+    """
+    for executor in _search_workers:
+        executor.shutdown()
+    del _search_workers[:]
+
+
+class ParallelMCTSPolicy:
+    """Root-parallel MCTS: independent trees in search worker processes, root statistics merged
+
+    Each of the workers searches the position with its own MCTSPolicy for the
+    same budget; the move with the most visits over all trees is played.
+    Inside pool workers the trees are searched one after another in the worker
+    (see search_in_process). Extra keyword arguments are passed on to MCTSPolicy.
+    """
+
+    def __init__(self, rng=None, workers=None, **options):
+        self.rng = rng or random.Random()
+        self.workers = workers or os.cpu_count() or 1
+        self.options = options
+        self._search_id = (os.getpid(), next(_search_ids))
+        self._futures = None
+        self._snapshot = None  # The position self._futures are searching
+
+    def think(self, engine, seconds):
+        """Start the workers on the current position, True once they have all finished"""
+        state = engine.state
+        if state.game_over or state.current_round == 1 or state.action_taken:
+            return True
+        self._start(engine)
+        wait(self._futures, timeout=seconds)
+        return all(future.done() for future in self._futures)
+
+    def choose_action(self, engine):
+        """Wait for the workers and pick the most visited move over all trees"""
+        state = engine.state
+        if state.current_round == 1 or state.action_taken:
+            return END_TURN
+        self._start(engine)
+
+        merged = {}
+        for future in self._futures:
+            for action, visits, total in future.result():
+                counts = merged.setdefault(action, [0, 0.0])
+                counts[0] += visits
+                counts[1] += total
+        self._futures = self._snapshot = None
+        return most_visited((action, visits, total) for action, (visits, total) in merged.items())
+
+    def _start(self, engine):
+        """Start searching the current position unless that search is already running
+
+        A search of another position, abandoned or cancelled, is dropped:
+        its results would describe the wrong root.
+        """
+        state = engine.state
+        snapshot = state.snapshot()
+        if self._futures is not None and snapshot == self._snapshot:
+            return
+        if self._futures is not None:
+            for future in self._futures:
+                future.cancel()
+        searches = [((self._search_id, slot), self.rng.getrandbits(64)) for slot in range(self.workers)]
+        if _in_process_search:
+            self._futures = []
+            for search_key, seed in searches:
+                future = Future()
+                future.set_result(_search_worker(search_key, seed, state.player1.name, state.player2.name,
+                                                 snapshot, self.options))
+                self._futures.append(future)
+        else:
+            executors = get_search_workers(self.workers)
+            self._futures = [executor.submit(_search_worker, search_key, seed, state.player1.name,
+                                             state.player2.name, snapshot, self.options)
+                             for (search_key, seed), executor in zip(searches, executors)]
+        self._snapshot = snapshot
+
+
+# Solvers by table file, shared so the table is only loaded once per process
+_solvers = {}
+
+
+class PerfectPolicy:
+    """Expectimax play from the solver's transposition table (see solver.py)
+
+    Positions already in the table at depth or better are answered instantly.
+    Others are searched by iterative deepening within time_budget seconds (or
+    fully to depth with None) and added to the table, which is
+    appended to table_file. With table_file "" the policy keeps a table of
+    its own in memory, so its moves do not depend on what was solved before.
+    """
+
+    def __init__(self, rng=None, depth=3, time_budget=0.1, table_file=None):
+        from solver import ExpectimaxSolver, DEFAULT_TABLE_FILE  # The solver imports this module
+
+        table_file = DEFAULT_TABLE_FILE if table_file is None else table_file
+        if not table_file:
+            self.solver = ExpectimaxSolver(table_file)
+        else:
+            if table_file not in _solvers:
+                _solvers[table_file] = ExpectimaxSolver(table_file)
+            self.solver = _solvers[table_file]
+        self.depth = depth
+        self.time_budget = time_budget
+
+    def think(self, engine, seconds):
+        """The table lookup or search happens in choose_action"""
+        return True
+
+    def choose_action(self, engine):
+        """The best action for the current player according to the solver"""
+        return self.solver.best_action(engine, self.depth, self.time_budget)
+
+
+class TablePolicy:
+    """Allocation and action looked up in the precomputed DP table (see policy_table.py)
+
+    The table does not model card draws, so this policy never plays cards.
+    """
+
+    def __init__(self, rng=None, table_file=None):
+        from policy_table import DEFAULT_TABLE_FILE, load_table  # NumPy is only needed for this policy
+
+        self.table = load_table(table_file or DEFAULT_TABLE_FILE)
+
+    def think(self, engine, seconds):
+        """Lookups need no thinking time"""
+        return True
+
+    def choose_action(self, engine):
+        """Look up the current position"""
+        from policy_table import table_action
+
+        state = engine.state
+        if state.current_round == 1 or state.action_taken:
+            return END_TURN
+        kind, percentage = table_action(self.table, state)
+        if state.get_current_player().allocated_this_round:
+            percentage = None
+        return Action(kind, percentage)
+
+
+MCTS_ITERATIONS = 500  # Search iterations per move headless, about the 0.05 s time budget on a desktop core
+PARALLEL_MCTS_TREES = 4  # Trees searched per move headless, fixed rather than one per core of the machine
+
+# Policies selectable by name from tools such as simulate.py. Their budgets are fixed amounts of work, not
+# time, so a seeded match gives the same result on every run and machine (see simulate.play_seeded_match).
+POLICIES = {
+    "basic": BasicPolicy,
+    "mcts": partial(MCTSPolicy, iterations=MCTS_ITERATIONS),
+    "parallel_mcts": partial(ParallelMCTSPolicy, workers=PARALLEL_MCTS_TREES, iterations=MCTS_ITERATIONS),
+    "perfect": partial(PerfectPolicy, time_budget=None, table_file=""),
+    "table": TablePolicy,
+}
+
+# The same policies for the interactive game, which thinks for a fixed time per move instead so the enemy
+# answers promptly on any machine; moves then depend on the machine's speed, and perfect uses the shared table
+INTERACTIVE_POLICIES = {
+    **POLICIES,
+    "mcts": MCTSPolicy,
+    "parallel_mcts": ParallelMCTSPolicy,
+    "perfect": PerfectPolicy,
+}
+
+
+def play_match(engine, policy1, policy2, max_rounds=None):
+    """Play a match to the end (or max_rounds), returns the number of actions applied"""
+    state = engine.state
+    actions = 0
+    while not state.game_over:
+        if max_rounds is not None and state.current_round > max_rounds:
+            break
+        policy = policy1 if state.current_turn == "player1" else policy2
+        engine.apply(policy.choose_action(engine))
+        actions += 1
+    return actions
@@ -0,0 +1,75 @@
+"""
+Castle War Game - Asset Manager
+Images are read and decoded once per process, and every converted or scaled
+variant is kept, keyed by size, so opening a screen again costs no disk I/O,
+decoding or scaling. preload() decodes images on a background thread, e.g.
+while the main menu is shown. Fonts are cached by config.get_font.
+
+A file that changes on disk (e.g. regenerated statistics charts) is decoded
+again the next time it is requested.
+"""
+
+import os
+import threading
+
+import pygame
+
+CASTLE_IMAGE = "castle_icon.png"
+
+_lock = threading.Lock()
+_decoded = {}  # path -> (modification time, surface as loaded)
+_variants = {}  # (path, size, smooth) -> surface converted for the display
+
+
+def load_image(path):
+    """The decoded image at path, as loaded (not converted for the display)
+
+    Raises the same errors as pygame.image.load for missing or broken files.
+    """
+    modified = os.stat(path).st_mtime_ns
+    with _lock:
+        entry = _decoded.get(path)
+    if entry is not None and entry[0] == modified:
+        return entry[1]
+
+    image = pygame.image.load(path)
+    with _lock:
+        _decoded[path] = (modified, image)
+        for key in [key for key in _variants if key[0] == path]:
+            del _variants[key]
+    return image
+
+
+def get_image(path, size=None, smooth=False):
+    """The image at path converted for the display, scaled to size=(width, height) if given
+
+    Needs the display mode to be set. The surface is shared by every caller,
+    so it must only be blitted, never drawn on.
+    """
+    image = load_image(path)
+    key = (path, tuple(size) if size else None, smooth)
+    surface = _variants.get(key)
+    if surface is None:
+        # Scale before converting: the source may be far bigger than the variant
+        if size and tuple(size) != image.get_size():
+            scale = pygame.transform.smoothscale if smooth else pygame.transform.scale
+            image = scale(image, size)
+        surface = _variants[key] = image.convert_alpha()
+    return surface
+
+
+def preload(paths):
+    """Decode images on a background thread, returns the thread
+
+    Missing or broken files are skipped here; they fail when actually used.
+    """
+    def decode_all():
+        for path in paths:
+            try:
+                load_image(path)
+            except (OSError, pygame.error):
+                pass
+
+    thread = threading.Thread(target=decode_all, name="asset-preload", daemon=True)
+    thread.start()
+    return thread
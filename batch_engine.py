@@ -0,0 +1,246 @@
+"""
+Castle War Game - Vectorised Batch Engine
+Plays K independent matches in lockstep with the state held as NumPy
+struct-of-arrays columns. Every turn is applied to all running games at once
+with masked array operations that mirror rules_engine.RulesEngine driven by
+ai_policy.BasicPolicy on both sides, for balance sweeps over millions of games.
+
+Every turn in Castle War is exactly one action followed by ending the turn,
+so all games in a batch share the same round and current player; finished
+games are masked out and periodically compacted away.
+"""
+
+import numpy as np
+
+from card_system import (CARD_NAMES, CARD_SAMPLER, CardSampler, COUNTER_SHIELD, STEAL_CARD, DOUBLE_DRAW,
+                         REBIRTH_CARD, LUCKY_CHARM, TRAP_CARD, HEAL_CARD, POPULATION_CARD, ATTACK_BOOST_CARD)
+
+NUM_CARDS = len(CARD_NAMES)
+
+
+class BatchGames:
+    """K concurrent matches between two BasicPolicy players
+
+    Player columns have shape (2, K): row 0 is player1 and row 1 is player2.
+    card_rarity may override card_system.CARD_RARITY for balance sweeps.
+    """
+
+    # Columns indexed by (player, game slot), compacted together
+    _PLAYER_COLUMNS = ("hearts", "population", "soldier_count", "farmer_count", "damage_bonus",
+                       "has_counter_shield", "has_trap", "has_rebirth", "double_draw", "lucky_boost", "cards",
+                       "hearts_lost", "cards_played")
+
+    def __init__(self, num_games, rng=None, card_rarity=None, max_rounds=200):
+        self.num_games = num_games
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.max_rounds = max_rounds
+        self.sampler = CardSampler(card_rarity) if card_rarity else CARD_SAMPLER
+
+        shape = (2, num_games)
+        self.hearts = np.full(shape, 20, dtype=np.int32)
+        self.population = np.ones(shape, dtype=np.int32)
+        self.soldier_count = np.zeros(shape, dtype=np.int32)
+        self.farmer_count = np.zeros(shape, dtype=np.int32)
+        self.damage_bonus = np.zeros(shape, dtype=np.int32)
+        self.has_counter_shield = np.zeros(shape, dtype=bool)
+        self.has_trap = np.zeros(shape, dtype=bool)
+        self.has_rebirth = np.zeros(shape, dtype=bool)
+        self.double_draw = np.zeros(shape, dtype=bool)
+        self.lucky_boost = np.zeros(shape, dtype=np.int32)
+        self.cards = np.zeros((2, num_games, NUM_CARDS), dtype=np.int16)  # Hand as counts per card id
+        self.hearts_lost = np.zeros(shape, dtype=np.int32)
+        self.cards_played = np.zeros(shape, dtype=np.int32)
+        self.active = np.ones(num_games, dtype=bool)
+
+        # Finished games are periodically compacted out of the columns above;
+        # game_ids maps each remaining column slot back to its game number.
+        self.game_ids = np.arange(num_games)
+
+        # Per-game results, always indexed by game number
+        self.winner = np.full(num_games, -1, dtype=np.int8)  # 0 = player1, 1 = player2, -1 = draw/running
+        self.rounds = np.zeros(num_games, dtype=np.int32)
+        self.total_hearts_lost = np.zeros(shape, dtype=np.int32)
+        self.total_cards_played = np.zeros(shape, dtype=np.int32)
+
+        self.current_round = 1
+        self.current_turn = 0
+
+    def run(self):
+        """Play every game to the end (or max_rounds), returns self"""
+        while self.active.any() and self.current_round <= self.max_rounds:
+            self.step()
+            # Stop paying for finished games once they are the majority
+            if self.current_turn == 0 and self.active.sum() * 2 < len(self.active):
+                self._compact()
+        self.rounds[self.game_ids[self.active]] = self.current_round - 1
+        self._compact()
+        return self
+
+    def _compact(self):
+        """Drop finished games from the state columns, saving their counters"""
+        self.total_hearts_lost[:, self.game_ids] = self.hearts_lost
+        self.total_cards_played[:, self.game_ids] = self.cards_played
+
+        keep = np.flatnonzero(self.active)
+        for name in self._PLAYER_COLUMNS:
+            setattr(self, name, getattr(self, name)[:, keep])
+        self.game_ids = self.game_ids[keep]
+        self.active = self.active[keep]
+
+    def step(self):
+        """Advance every running game by one turn of the current player"""
+        p = self.current_turn
+        o = 1 - p
+
+        # First round: players can only end their turn
+        if self.current_round > 1:
+            active = self.active.copy()
+            self._process_turn_start(p, active)
+            self._take_action(p, o, active)
+
+        # End turn, after player 2 a new round starts
+        if p == 0:
+            self.current_turn = 1
+        else:
+            self.current_turn = 0
+            self.current_round += 1
+            self.population[:, self.active] = self.current_round
+            self.lucky_boost -= self.lucky_boost > 0
+
+    def _give_cards(self, p, mask, card_ids):
+        games = np.flatnonzero(mask)
+        self.cards[p, games, card_ids[games]] += 1
+
+    def _battle_chest(self, p, mask):
+        """10% chance per game to draw a card whose rarity follows the rarity table"""
+        k = len(self.active)
+        chest = mask & (self.rng.random(k) < 0.1)
+        card_ids = self.sampler.draw_many(k, self.rng, self.lucky_boost[p])
+        self._give_cards(p, chest & (card_ids >= 0), card_ids)
+
+    def _process_turn_start(self, p, active):
+        """Double Draw, Battle Chest and Endangered Mode"""
+        double = active & self.double_draw[p]
+        self._battle_chest(p, double)
+        self._battle_chest(p, double)
+        self.double_draw[p, double] = False
+
+        self._battle_chest(p, active)
+
+        endangered = active & (self.hearts[p] < 10)
+        self._give_cards(p, endangered, self.rng.integers(0, NUM_CARDS, len(self.active)))
+
+    def _weighted_card_choice(self, weights):
+        """Pick a card id per game with probability proportional to weights (K, NUM_CARDS)"""
+        cumulative = weights.cumsum(axis=1)
+        target = self.rng.random(len(weights)) * cumulative[:, -1]
+        return np.minimum((cumulative <= target[:, None]).sum(axis=1), NUM_CARDS - 1)
+
+    def _take_action(self, p, o, active):
+        """Allocate population and play a card, heal, boost damage or attack"""
+        rng = self.rng
+        k = len(self.active)
+
+        # Allocation: 70% soldiers while healthy, 30% otherwise
+        percentage = np.where(self.hearts[p] > 15, 70, 30)
+        soldiers = np.where(active, self.population[p] * percentage // 100, self.soldier_count[p])
+        self.soldier_count[p] = soldiers
+        self.farmer_count[p] = np.where(active, self.population[p] - soldiers, self.farmer_count[p])
+
+        # 60% chance to play a random usable card from the hand
+        playable = self.cards[p].astype(np.int32)
+        playable[:, HEAL_CARD] *= self.hearts[p] < 20
+        playable[:, STEAL_CARD] *= self.cards[o].sum(axis=1) > 0
+        play = active & (playable.sum(axis=1) > 0) & (rng.random(k) < 0.6)
+        card = self._weighted_card_choice(playable)
+        self._play_cards(p, o, play, card)
+
+        # Otherwise 30% heal, 30% boost damage, 40% attack
+        act = active & ~play
+        choice = rng.random(k)
+        heal = act & (choice < 0.3)
+        boost = act & (choice >= 0.3) & (choice < 0.6)
+        attack = act & (choice >= 0.6)
+
+        farmers = self.farmer_count[p]
+        self.hearts[p] += np.where(heal & (farmers > 0), np.minimum(farmers, 30 - self.hearts[p]), 0)
+        self.damage_bonus[p] += np.where(boost, farmers, 0)
+
+        if attack.any():
+            self._attack(p, o, attack)
+
+    def _play_cards(self, p, o, play, card):
+        """Apply the effect of the chosen card in every game that plays one"""
+        games = np.flatnonzero(play)
+        self.cards[p, games, card[games]] -= 1
+        self.cards_played[p] += play
+
+        def played(card_id):
+            return play & (card == card_id)
+
+        self.has_counter_shield[p] |= played(COUNTER_SHIELD)
+        self.double_draw[p] |= played(DOUBLE_DRAW)
+        self.has_rebirth[p] |= played(REBIRTH_CARD)
+        self.lucky_boost[p] += played(LUCKY_CHARM)
+        self.has_trap[p] |= played(TRAP_CARD)
+        self.population[p] += 20 * played(POPULATION_CARD)
+        self.damage_bonus[p] += 30 * played(ATTACK_BOOST_CARD)
+
+        heal = played(HEAL_CARD)
+        self.hearts[p] += np.where(heal, np.minimum(10, 20 - self.hearts[p]), 0)
+
+        # Steal a random card from the opponent's hand
+        steal = np.flatnonzero(played(STEAL_CARD))
+        if len(steal):
+            stolen = self._weighted_card_choice(self.cards[o].astype(np.int32))[steal]
+            self.cards[o, steal, stolen] -= 1
+            self.cards[p, steal, stolen] += 1
+
+    def _attack(self, p, o, attack):
+        """Resolve attacks with Counter Shield and Trap Card reactions, then check victory"""
+        damage = self.soldier_count[p] + self.damage_bonus[p]
+
+        countered = attack & self.has_counter_shield[o]
+        reflected = np.where(countered, (damage * 0.5).astype(np.int32), 0)
+        self.hearts[p] -= reflected
+        self.hearts_lost[p] += reflected
+        self.has_counter_shield[o] &= ~countered
+
+        trapped = attack & ~countered & self.has_trap[o]
+        self.hearts[p] -= 10 * trapped
+        self.hearts_lost[p] += 10 * trapped
+        reduced = self.damage_bonus[p] - (self.soldier_count[p] * 0.2).astype(np.int32)
+        self.damage_bonus[p] = np.where(trapped, np.maximum(reduced, 0), self.damage_bonus[p])
+        self.has_trap[o] &= ~trapped
+
+        hit = np.where(attack & ~countered, damage, 0)
+        self.hearts[o] -= hit
+        self.hearts_lost[o] += hit
+
+        # Rebirth Cards revive before the victory check
+        for q in (0, 1):
+            revive = attack & (self.hearts[q] <= 0) & self.has_rebirth[q]
+            self.hearts[q, revive] = 10
+            self.has_rebirth[q] &= ~revive
+
+        player2_wins = attack & (self.hearts[0] <= 0)
+        player1_wins = attack & ~player2_wins & (self.hearts[1] <= 0)
+        self.winner[self.game_ids[player2_wins]] = 1
+        self.winner[self.game_ids[player1_wins]] = 0
+        finished = player1_wins | player2_wins
+        self.rounds[self.game_ids[finished]] = self.current_round
+        self.active &= ~finished
+
+    def summary(self):
+        """Aggregate results over the whole batch"""
+        games = max(self.num_games, 1)
+        return {
+            "games": self.num_games,
+            "player1_wins": int((self.winner == 0).sum()),
+            "player2_wins": int((self.winner == 1).sum()),
+            "draws": int((self.winner == -1).sum()),
+            "mean_rounds": float(self.rounds.sum()) / games,
+            "mean_hearts_lost_player1": float(self.total_hearts_lost[0].sum()) / games,
+            "mean_hearts_lost_player2": float(self.total_hearts_lost[1].sum()) / games,
+            "mean_cards_played": float(self.total_cards_played.sum()) / games,
+        }
@@ -1,5 +1,8 @@
 # card_system.py
 import random
+from array import array
+from bisect import bisect_right
+from collections import namedtuple
 
 # Card rarity constants
 CARD_RARITY = {
@@ -23,121 +26,183 @@ SPECIAL_CARDS = {
     "Attack Boost Card": "+30 damage to next attack."
 }
 
+# Rarity of each special card
+SPECIAL_CARD_RARITY = {
+    "Counter Shield": "LEGENDARY",
+    "Steal Card": "EPIC",
+    "Double Draw": "RARE",
+    "Rebirth Card": "LEGENDARY",
+    "Lucky Charm": "EPIC",
+    "Trap Card": "RARE",
+    "Heal Card": "COMMON",
+    "Population Card": "COMMON",
+    "Attack Boost Card": "RARE"
+}
 
-class Card:
-    def __init__(self, name, rarity, description, effect_function=None):
-        self.name = name
-        self.rarity = rarity  # LEGENDARY, EPIC, RARE, COMMON
-        self.description = description
-        self.effect_function = effect_function
-        self.is_active = False
-        self.duration = 0  # For cards with duration effects
+# Card ids are positions in this tuple; hands store ids, not Card objects
+CARD_NAMES = tuple(SPECIAL_CARDS)
+
+COUNTER_SHIELD = CARD_NAMES.index("Counter Shield")
+STEAL_CARD = CARD_NAMES.index("Steal Card")
+DOUBLE_DRAW = CARD_NAMES.index("Double Draw")
+REBIRTH_CARD = CARD_NAMES.index("Rebirth Card")
+LUCKY_CHARM = CARD_NAMES.index("Lucky Charm")
+TRAP_CARD = CARD_NAMES.index("Trap Card")
+HEAL_CARD = CARD_NAMES.index("Heal Card")
+POPULATION_CARD = CARD_NAMES.index("Population Card")
+ATTACK_BOOST_CARD = CARD_NAMES.index("Attack Boost Card")
+
+RARITY_ORDER = ("LEGENDARY", "EPIC", "RARE", "COMMON", "NONE")
+
+BATTLE_CHEST_CHANCE = 0.1  # Chance per turn start to open a Battle Chest
 
-    def use(self, player, opponent=None):
-        """Apply the card effect"""
-        if self.effect_function:
-            return self.effect_function(player, opponent)
-        return False
+
+class Card(namedtuple("Card", ["card_id", "name", "rarity", "description"])):
+    """Immutable card type, shared by every copy of that card in play"""
+    __slots__ = ()
 
     def __str__(self):
         return f"{self.name} ({self.rarity}): {self.description}"
 
 
+# One shared Card per card id
+CARD_TYPES = tuple(Card(card_id, name, SPECIAL_CARD_RARITY[name], SPECIAL_CARDS[name])
+                   for card_id, name in enumerate(CARD_NAMES))
+
+
+def new_hand(card_ids=()):
+    """Create a compact hand: one byte per card id"""
+    return array('B', card_ids)
+
+
+class CardSampler:
+    """Precomputed Battle Chest draw tables, built once from the rarity weights
+
+    A Battle Chest draw rolls 0-100, Lucky Charm shifts the roll down by 10 per
+    level, the roll picks a rarity and a card of that rarity is chosen uniformly.
+    That is a fixed distribution over card ids per lucky level, so each level gets
+    a cumulative table and a draw is a single roll plus a bisect.
+    """
+
+    MAX_LUCKY_BOOST = 10  # From this level on every roll lands on LEGENDARY
+
+    def __init__(self, card_rarity=CARD_RARITY, special_card_rarity=SPECIAL_CARD_RARITY):
+        self.card_names = tuple(special_card_rarity)
+        self._ids_by_rarity = {rarity: [card_id for card_id, name in enumerate(self.card_names)
+                                        if special_card_rarity[name] == rarity]
+                               for rarity in RARITY_ORDER}
+        # (bounds, card ids) per lucky level, card id -1 means no card
+        self._tables = [self._build_table(card_rarity, level) for level in range(self.MAX_LUCKY_BOOST + 1)]
+        self._flat_tables = None
+
+    def _build_table(self, card_rarity, lucky_boost):
+        bounds = []
+        card_ids = []
+        start = 0.0
+        cumulative = 0.0
+        for rarity in RARITY_ORDER[:-1]:
+            cumulative += card_rarity[rarity]
+            # Shifting the roll down by 10 per level is the same as moving every threshold up
+            end = min(100.0, cumulative + lucky_boost * 10)
+            if end > start:
+                ids = self._ids_by_rarity[rarity] or [-1]
+                step = (end - start) / len(ids)
+                for i, card_id in enumerate(ids):
+                    bounds.append(end if i == len(ids) - 1 else start + step * (i + 1))
+                    card_ids.append(card_id)
+                start = end
+        # Whatever is left of the roll is NONE
+        bounds.append(100.0)
+        card_ids.append(-1)
+        return bounds, card_ids
+
+    def draw(self, lucky_boost=0, rng=random):
+        """Draw one Battle Chest card id, or None"""
+        bounds, card_ids = self._tables[min(lucky_boost, self.MAX_LUCKY_BOOST)]
+        card_id = card_ids[bisect_right(bounds, rng.random() * 100)]
+        return card_id if card_id >= 0 else None
+
+    def distribution(self, lucky_boost=0):
+        """Exact probability of each Battle Chest draw as {card id or None: probability}"""
+        bounds, card_ids = self._tables[min(lucky_boost, self.MAX_LUCKY_BOOST)]
+        probabilities = {}
+        start = 0.0
+        for end, card_id in zip(bounds, card_ids):
+            key = card_id if card_id >= 0 else None
+            probabilities[key] = probabilities.get(key, 0.0) + (end - start) / 100
+            start = end
+        return probabilities
+
+    def draw_uniform(self, rng=random):
+        """Draw any card id with equal probability (Endangered Mode)"""
+        return rng.randrange(len(self.card_names))
+
+    def draw_many(self, n, rng=None, lucky_boost=0):
+        """Draw n Battle Chest cards at once as a NumPy array of card ids (-1 for no card)
+
+        lucky_boost may be a single level or an array with one level per draw.
+        """
+        import numpy as np  # Only batch callers need NumPy
+
+        if self._flat_tables is None:
+            # All levels in one sorted table, level L occupying [100 * L, 100 * (L + 1))
+            bounds = np.concatenate([np.asarray(table[0]) + 100.0 * level
+                                     for level, table in enumerate(self._tables)])
+            card_ids = np.concatenate([np.asarray(table[1]) for table in self._tables])
+            self._flat_tables = bounds, card_ids
+
+        rng = rng if rng is not None else np.random.default_rng()
+        bounds, card_ids = self._flat_tables
+        levels = np.minimum(lucky_boost, self.MAX_LUCKY_BOOST)
+        rolls = rng.random(n) * 100 + levels * 100.0
+        return card_ids[np.minimum(np.searchsorted(bounds, rolls, side="right"), len(bounds) - 1)]
+
+
+# Shared sampler for the standard rarity table
+CARD_SAMPLER = CardSampler()
+
+
 class CardSystem:
-    def __init__(self, player1, player2):
+    def __init__(self, player1, player2, sampler=CARD_SAMPLER, rng=None):
         self.player1 = player1
         self.player2 = player2
+        self.sampler = sampler
+        self.rng = rng or random.Random()  # Owned by this game, see seeding.py
         self.setup_special_cards()
 
     def setup_special_cards(self):
-        """Define special cards and their effects"""
-        self.special_cards = {
-            "Counter Shield": Card("Counter Shield", "LEGENDARY",
-                                   "Blocks next attack and reflects 50% of damage.",
-                                   self.effect_counter_shield),
-            "Steal Card": Card("Steal Card", "EPIC",
-                               "Randomly steal one opponent's card.",
-                               self.effect_steal_card),
-            "Double Draw": Card("Double Draw", "RARE",
-                                "Draw 2 random cards on your next turn.",
-                                self.effect_double_draw),
-            "Rebirth Card": Card("Rebirth Card", "LEGENDARY",
-                                 "Revive with 10 hearts if health reaches 0 (one-time use).",
-                                 self.effect_rebirth),
-            "Lucky Charm": Card("Lucky Charm", "EPIC",
-                                "Temporarily increases chances to get a better rarity card.",
-                                self.effect_lucky_charm),
-            "Trap Card": Card("Trap Card", "RARE",
-                              "If attacked, enemy loses 10 hearts and has 20% less damage for 2 turns.",
-                              self.effect_trap_card),
-            "Heal Card": Card("Heal Card", "COMMON",
-                              "Heal 10 hearts or 5 per turn if below 20 hearts.",
-                              self.effect_heal),
-            "Population Card": Card("Population Card", "COMMON",
-                                    "Add 20 population or store extra.",
-                                    self.effect_population),
-            "Attack Boost Card": Card("Attack Boost Card", "RARE",
-                                      "+30 damage to next attack.",
-                                      self.effect_attack_boost)
+        """Map the shared card types to their effects"""
+        self.special_cards = {card.name: card for card in CARD_TYPES}
+
+        # Effect functions indexed by card id
+        effects = {
+            "Counter Shield": self.effect_counter_shield,
+            "Steal Card": self.effect_steal_card,
+            "Double Draw": self.effect_double_draw,
+            "Rebirth Card": self.effect_rebirth,
+            "Lucky Charm": self.effect_lucky_charm,
+            "Trap Card": self.effect_trap_card,
+            "Heal Card": self.effect_heal,
+            "Population Card": self.effect_population,
+            "Attack Boost Card": self.effect_attack_boost
         }
+        self.effects = tuple(effects[name] for name in CARD_NAMES)
 
-    def get_random_rarity(self, lucky_boost=0):
-        """Determine the rarity of a card based on probabilities"""
-        roll = random.random() * 100
-
-        # Apply lucky charm boost if active
-        if lucky_boost > 0:
-            # Increase chances for better cards
-            roll = max(0, roll - (lucky_boost * 10))
-
-        if roll < CARD_RARITY["LEGENDARY"]:
-            return "LEGENDARY"
-        elif roll < CARD_RARITY["LEGENDARY"] + CARD_RARITY["EPIC"]:
-            return "EPIC"
-        elif roll < CARD_RARITY["LEGENDARY"] + CARD_RARITY["EPIC"] + CARD_RARITY["RARE"]:
-            return "RARE"
-        elif roll < CARD_RARITY["LEGENDARY"] + CARD_RARITY["EPIC"] + CARD_RARITY["RARE"] + CARD_RARITY["COMMON"]:
-            return "COMMON"
-        else:
-            return "NONE"
-
-    def get_random_card_by_rarity(self, rarity):
-        """Get a random card of the specified rarity"""
-        if rarity == "NONE":
-            return None
-
-        # Filter cards by rarity
-        cards_of_rarity = [card for card in self.special_cards.values() if card.rarity == rarity]
-
-        if cards_of_rarity:
-            return random.choice(cards_of_rarity)
-        return None
+    def use_card(self, card_id, player, opponent):
+        """Apply the effect of a card, returns True if it took effect"""
+        return self.effects[card_id](player, opponent)
 
     def check_battle_chest(self, player):
-        """10% chance at start of turn to draw a special card"""
-        if random.random() < 0.1:  # 10% chance
-            # First determine rarity
-            rarity = self.get_random_rarity(player.lucky_boost if hasattr(player, "lucky_boost") else 0)
-
-            if rarity != "NONE":
-                # Get a random card of that rarity
-                new_card = self.get_random_card_by_rarity(rarity)
-                if new_card:
-                    # Create a copy of the card to give to the player
-                    card_copy = Card(new_card.name, new_card.rarity, new_card.description, new_card.effect_function)
-                    return card_copy
+        """10% chance at start of turn to draw a special card, returns its id or None"""
+        if self.rng.random() < BATTLE_CHEST_CHANCE:
+            return self.sampler.draw(player.lucky_boost, self.rng)
         return None
 
     def check_endangered_mode(self, player):
-        """If hearts < 10, automatically get a random special card"""
+        """If hearts < 10, automatically get a random special card, returns its id or None"""
         if player.hearts < 10:
             # Get a random special card (not based on rarity)
-            card_name = random.choice(list(self.special_cards.keys()))
-            card = self.special_cards[card_name]
-
-            # Create a copy of the card to give to the player
-            card_copy = Card(card.name, card.rarity, card.description, card.effect_function)
-            return card_copy
+            return self.sampler.draw_uniform(self.rng)
         return None
 
     # Card effect implementations
@@ -147,7 +212,7 @@ class CardSystem:
 
     def effect_steal_card(self, player, opponent):
         if opponent.cards and len(opponent.cards) > 0:
-            stolen_card = random.choice(opponent.cards)
+            stolen_card = self.rng.choice(opponent.cards)
             opponent.cards.remove(stolen_card)
             player.cards.append(stolen_card)
             return True
@@ -162,8 +227,6 @@ class CardSystem:
         return True
 
     def effect_lucky_charm(self, player, opponent):
-        if not hasattr(player, "lucky_boost"):
-            player.lucky_boost = 0
         player.lucky_boost += 1
         return True
 
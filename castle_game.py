@@ -1,72 +1,26 @@
 import pygame
-import sys
 import random
-from config import WIDTH, HEIGHT, WHITE, BLACK, COLORS, font, button_font, Button_COLORS
-from card_system import CardSystem, Card  # Import your card system
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import WIDTH, HEIGHT, WHITE, BLACK, COLORS, Button_COLORS, get_font
 from game_stats import GameStats
-
-
-class Player:
-    def __init__(self, name, initial_population, color):
-        self.name = name
-        self.population = initial_population
-        self.soldier_count = 0
-        self.farmer_count = 0
-        self.hearts = 20
-        self.color = color
-        self.damage_bonus = 0
-        self.allocated_this_round = False  # Track if population has been allocated this round
-        # Card system attributes
-        self.cards = []  # List to store player's cards
-        self.has_counter_shield = False
-        self.has_rebirth = False
-        self.has_trap = False
-        self.trap_duration = 0
-        self.double_draw = False
-        self.lucky_boost = 0
-
-    def assign_population(self, soldier_count):
-        """Assign population between soldiers and farmers"""
-        if soldier_count > self.population:
-            soldier_count = self.population
-
-        self.soldier_count = soldier_count
-        self.farmer_count = self.population - soldier_count
-
-    def attack(self, opponent):
-        """Attack the opponent with soldiers"""
-        if self.soldier_count > 0:
-            # Calculate damage (1 per soldier + any damage bonus)
-            damage = self.soldier_count + self.damage_bonus  # Changed from multiplication to addition
-            opponent.hearts -= damage
-            if opponent.hearts < 0:
-                opponent.hearts = 0
-            return damage
-        return 0
-
-    def heal_soldiers(self):
-        """Use farmers to heal hearts"""
-        if self.farmer_count > 0:
-            healing = min(self.farmer_count, 30 - self.hearts)
-            self.hearts += healing
-            return healing
-        return 0
-
-    def increase_damage(self):
-        """Use farmers to increase attack damage"""
-        if self.farmer_count > 0:
-            bonus = 1 * self.farmer_count
-            self.damage_bonus += bonus
-            return bonus
-        return 0
-
-
-# Use Player as the base class for Enemy instead of having a separate class
-class Enemy(Player):
-    """Enemy class that inherits from Player but can have AI behavior"""
-
-    def __init__(self, name, initial_population, color):
-        super().__init__(name, initial_population, color)
+from rules_engine import Player, Enemy, Action, MAX_HEARTS, new_match
+from card_system import CARD_TYPES
+from ai_policy import INTERACTIVE_POLICIES
+from seeding import new_master_seed, derive_seed, derive_rng
+from action_log import ActionLog, append_logs
+from text_cache import TextCache
+from assets import CASTLE_IMAGE, get_image
+from scene import Scene, Widget
+from frame_scheduler import FrameScheduler
+from frame_profiler import FrameProfiler, NO_PROFILER
+
+ACTION_LOG_FILE = "game_logs.bin"  # Every finished game is appended here for replay
+AI_THINK_SLICE = 0.008  # Seconds of AI search between checks for cancellation
+MESSAGE_DURATION = 2.0  # Seconds each message stays on screen
+PROFILER_HUD_KEY = pygame.K_F3  # Shows and hides the frame profiler
 
 
 class Map:
@@ -80,79 +34,72 @@ class Map:
         self.castle_width = 100
         self.castle_height = 150
 
-        # Load castle image for player 1
+        # Castle image scaled to the castle dimensions, shared by both castles and loaded once per process
         try:
-            self.castle1_image = pygame.image.load('castle_icon.png').convert_alpha()
-            # Resize the image to match the castle dimensions
-            self.castle1_image = pygame.transform.scale(self.castle1_image, (self.castle_width, self.castle_height))
+            self.castle1_image = get_image(CASTLE_IMAGE, (self.castle_width, self.castle_height))
+            self.castle2_image = self.castle1_image
             self.has_custom_castle = True
         except Exception as e:
             print(f"Error loading castle image: {e}")
             self.has_custom_castle = False
 
-        try:
-            self.castle2_image = pygame.image.load('castle_icon.png').convert_alpha()
-            # Resize the image to match the castle dimensions
-            self.castle2_image = pygame.transform.scale(self.castle2_image, (self.castle_width, self.castle_height))
-            self.has_custom_castle = True
-        except Exception as e:
-            print(f"Error loading castle image: {e}")
-            self.has_custom_castle = False
+    def castle_positions(self):
+        """Top-left corners of the player 1 and player 2 castles"""
+        castle1_pos = (self.width // 5, self.height // 2 - self.castle_height // 2)
+        castle2_pos = (self.width // 2 + self.width // 5, self.height // 2 - self.castle_height // 2)
+        return castle1_pos, castle2_pos
+
+    def health_bar_rect(self, castle_pos):
+        """Rectangle of the health bar above a castle"""
+        health_bar_height = 20
+        return pygame.Rect(castle_pos[0], castle_pos[1] - health_bar_height - 10, self.castle_width, health_bar_height)
+
+    def draw_background(self, player1, player2):
+        """Pre-composite the parts that never change during a game: map halves, divider and castles"""
+        background = pygame.Surface((self.width, self.height)).convert()
 
-    def draw(self, screen, player1, player2):
         # Draw player1 side
-        pygame.draw.rect(screen, player1.color, self.player1_rect)
+        pygame.draw.rect(background, player1.color, self.player1_rect)
 
         # Draw player2 side
-        pygame.draw.rect(screen, player2.color, self.player2_rect)
+        pygame.draw.rect(background, player2.color, self.player2_rect)
 
         # Draw dividing line
-        pygame.draw.line(screen, BLACK, (self.width // 2, 0), (self.width // 2, self.height), 3)
+        pygame.draw.line(background, BLACK, (self.width // 2, 0), (self.width // 2, self.height), 3)
 
-        # Draw simple castle representations
-        castle_width = 100
-        castle_height = 150
-
-        # Player 1 castle (left side)
-        castle1_pos = (self.width // 5, self.height // 2 - castle_height // 2)
-        # Player 2 castle (right side)
-        castle2_pos = (self.width // 2 + self.width // 5, self.height // 2 - castle_height // 2)
+        castle1_pos, castle2_pos = self.castle_positions()
 
         # Player 1 castle (left side) - use custom image if available
         if self.has_custom_castle:
-            screen.blit(self.castle1_image, castle1_pos)
+            background.blit(self.castle1_image, castle1_pos)
         else:
             # Fallback to the original rectangle if image fails to load
-            pygame.draw.rect(screen, (100, 100, 100),
+            pygame.draw.rect(background, (100, 100, 100),
                              (castle1_pos[0], castle1_pos[1], self.castle_width, self.castle_height))
             # Add simple castle details
-            pygame.draw.rect(screen, (50, 50, 50),
+            pygame.draw.rect(background, (50, 50, 50),
                              (castle1_pos[0] + 30, castle1_pos[1] - 30, 40, 30))
 
         if self.has_custom_castle:
-            screen.blit(self.castle2_image, castle2_pos)
+            background.blit(self.castle2_image, castle2_pos)
         else:
-            # Player 2 castle (left side) - use custom image if available
-            pygame.draw.rect(screen, (100, 100, 100),
-                             (castle2_pos[0], castle2_pos[1], castle_width, castle_height))
+            # Player 2 castle (right side) - use custom image if available
+            pygame.draw.rect(background, (100, 100, 100),
+                             (castle2_pos[0], castle2_pos[1], self.castle_width, self.castle_height))
             # Add simple castle details
-            pygame.draw.rect(screen, (50, 50, 50),
+            pygame.draw.rect(background, (50, 50, 50),
                              (castle2_pos[0] + 30, castle2_pos[1] - 30, 40, 30))
 
-        # Draw health bars above the castles
-        # Player 1 health bar
-        health_bar_width = castle_width
-        health_bar_height = 20
-        health_bar_x = castle1_pos[0]
-        health_bar_y = castle1_pos[1] - health_bar_height - 10
+        return background
 
+    def draw_health_bar(self, screen, player, rect):
+        """Draw a player's health bar in rect"""
         # Background of health bar (empty)
-        pygame.draw.rect(screen, (100, 100, 100),
-                         (health_bar_x, health_bar_y, health_bar_width, health_bar_height))
+        pygame.draw.rect(screen, (100, 100, 100), rect)
 
         # Filled portion of health bar (green to red based on health)
-        health_percentage = player1.hearts / 20.0
-        fill_width = int(health_bar_width * health_percentage)
+        health_percentage = player.hearts / 20.0
+        fill_width = int(rect.width * health_percentage)
 
         # Color gradient from red to green based on health
         if health_percentage > 0.6:
@@ -162,41 +109,43 @@ class Map:
         else:
             color = (255, 0, 0)  # Red
 
-        pygame.draw.rect(screen, color,
-                         (health_bar_x, health_bar_y, fill_width, health_bar_height))
-
-        # Player 2 health bar
-        health_bar_x = castle2_pos[0]
-        health_bar_y = castle2_pos[1] - health_bar_height - 10
-
-        # Background of health bar
-        pygame.draw.rect(screen, (100, 100, 100),
-                         (health_bar_x, health_bar_y, health_bar_width, health_bar_height))
+        pygame.draw.rect(screen, color, (rect.x, rect.y, fill_width, rect.height))
 
-        # Filled portion
-        health_percentage = player2.hearts / 20.0
-        fill_width = int(health_bar_width * health_percentage)
-
-        # Color gradient
-        if health_percentage > 0.6:
-            color = (0, 255, 0)  # Green
-        elif health_percentage > 0.3:
-            color = (255, 255, 0)  # Yellow
-        else:
-            color = (255, 0, 0)  # Red
-
-        pygame.draw.rect(screen, color,
-                         (health_bar_x, health_bar_y, fill_width, health_bar_height))
+    def draw(self, screen, player1, player2):
+        """Draw the whole map in one go"""
+        screen.blit(self.draw_background(player1, player2), (0, 0))
+        castle1_pos, castle2_pos = self.castle_positions()
+        self.draw_health_bar(screen, player1, self.health_bar_rect(castle1_pos))
+        self.draw_health_bar(screen, player2, self.health_bar_rect(castle2_pos))
 
 
 class UIManager:
-    def __init__(self, width, height):
+    def __init__(self, width, height, profiler=NO_PROFILER):
         self.width = width
         self.height = height
         self.fonts = {
-            'large': pygame.font.Font(None, 36),
-            'medium': pygame.font.Font(None, 28),
-            'small': pygame.font.Font(None, 24)
+            'large': get_font(36),
+            'medium': get_font(28),
+            'small': get_font(24)
+        }
+        self.text = TextCache(profiler=profiler)  # Every string drawn by the UI goes through this cache
+
+        # Labels that never change are rendered once per game
+        small = self.fonts['small']
+        self.labels = {
+            'attack': small.render("ATTACK", True, WHITE),
+            'heal': small.render("HEAL", True, BLACK),
+            'heal_taken': small.render("HEAL", True, WHITE),
+            'boost': small.render("BOOST DMG", True, WHITE),
+            'play_card': small.render("PLAY CARD", True, WHITE),
+            'next_turn': small.render("NEXT TURN", True, WHITE),
+            'return_to_menu': small.render("RETURN TO MENU", True, WHITE),
+            'farmers': small.render("Farmers", True, BLACK),
+            'soldiers': small.render("Soldiers", True, BLACK),
+            'no_cards': small.render("No cards available", True, BLACK),
+            'your_cards': self.fonts['medium'].render("Your Cards:", True, BLACK),
+            'press_enter': self.fonts['medium'].render("Press ENTER when ready", True, BLACK),
+            'game_over': self.fonts['large'].render("GAME OVER", True, BLACK),
         }
 
         # Define UI elements
@@ -245,27 +194,27 @@ class UIManager:
     def draw_player_info(self, screen, player, x, y):
         """Draw player information"""
         # Draw player name
-        name_text = self.fonts['large'].render(f"{player.name}", True, BLACK)
+        name_text = self.text.render(self.fonts['large'], f"{player.name}", True, BLACK)
         screen.blit(name_text, (x, y))
 
         # Draw hearts
-        hearts_text = self.fonts['medium'].render(f"Hearts: {player.hearts}", True, BLACK)
+        hearts_text = self.text.render(self.fonts['medium'], f"Hearts: {player.hearts}", True, BLACK)
         screen.blit(hearts_text, (x, y + 40))
 
         # Draw population info
-        pop_text = self.fonts['medium'].render(f"Population: {player.population}", True, BLACK)
+        pop_text = self.text.render(self.fonts['medium'], f"Population: {player.population}", True, BLACK)
         screen.blit(pop_text, (x, y + 70))
 
         # Draw soldier and farmer counts
-        soldier_text = self.fonts['small'].render(f"Soldiers: {player.soldier_count}", True, BLACK)
+        soldier_text = self.text.render(self.fonts['small'], f"Soldiers: {player.soldier_count}", True, BLACK)
         screen.blit(soldier_text, (x, y + 100))
 
-        farmer_text = self.fonts['small'].render(f"Farmers: {player.farmer_count}", True, BLACK)
+        farmer_text = self.text.render(self.fonts['small'], f"Farmers: {player.farmer_count}", True, BLACK)
         screen.blit(farmer_text, (x, y + 130))
 
         # Draw damage bonus if any
         if player.damage_bonus > 0:
-            bonus_text = self.fonts['small'].render(f"Damage Bonus: +{player.damage_bonus:.1f}", True, BLACK)
+            bonus_text = self.text.render(self.fonts['small'], f"Damage Bonus: +{player.damage_bonus:.1f}", True, BLACK)
             screen.blit(bonus_text, (x, y + 160))
 
     # New method to draw player's cards
@@ -278,12 +227,12 @@ class UIManager:
         pygame.draw.rect(screen, BLACK, self.card_area, 2, border_radius=5)
 
         # Draw label
-        cards_label = self.fonts['medium'].render("Your Cards:", True, BLACK)
+        cards_label = self.labels['your_cards']
         screen.blit(cards_label, (self.card_area.x + 10, self.card_area.y - 30))
 
         # Draw cards
         if not player.cards:
-            no_cards_text = self.fonts['small'].render("No cards available", True, BLACK)
+            no_cards_text = self.labels['no_cards']
             screen.blit(no_cards_text, (self.card_area.x + 20, self.card_area.y + 40))
             return
 
@@ -296,7 +245,8 @@ class UIManager:
                 cards_to_display * (self.card_width + self.card_spacing) - self.card_spacing)) // 2
 
         # Draw each card
-        for i, card in enumerate(player.cards[:cards_to_display]):
+        for i, card_id in enumerate(player.cards[:cards_to_display]):
+            card = CARD_TYPES[card_id]
             card_x = start_x + i * (self.card_width + self.card_spacing)
             card_y = self.card_area.y + 10
 
@@ -317,17 +267,17 @@ class UIManager:
             pygame.draw.rect(screen, BLACK, card_rect, 2, border_radius=5)
 
             # Draw card name
-            name_text = self.fonts['small'].render(card.name.split(' ')[0], True, BLACK)  # First word only
+            name_text = self.text.render(self.fonts['small'], card.name.split(' ')[0], True, BLACK)  # First word only
             if len(card.name.split(' ')) > 1:
                 # If name has more than one word, draw second word on next line
                 screen.blit(name_text, (card_x + (self.card_width - name_text.get_width()) // 2, card_y + 10))
-                name_text2 = self.fonts['small'].render(card.name.split(' ')[1], True, BLACK)
+                name_text2 = self.text.render(self.fonts['small'], card.name.split(' ')[1], True, BLACK)
                 screen.blit(name_text2, (card_x + (self.card_width - name_text2.get_width()) // 2, card_y + 30))
             else:
                 screen.blit(name_text, (card_x + (self.card_width - name_text.get_width()) // 2, card_y + 20))
 
             # Draw rarity indicator
-            rarity_text = self.fonts['small'].render(card.rarity[0], True, BLACK)  # Just the first letter
+            rarity_text = self.text.render(self.fonts['small'], card.rarity[0], True, BLACK)  # Just the first letter
             screen.blit(rarity_text, (card_x + 5, card_y + 5))
 
     def _get_rarity_color(self, rarity):
@@ -364,7 +314,6 @@ class UIManager:
             card_rect = pygame.Rect(card_x, card_y, self.card_width, self.card_height)
 
             if card_rect.collidepoint(pos):
-                print(f"Card {i} clicked!")  # Debug print
                 return i
 
         return None
@@ -373,7 +322,12 @@ class UIManager:
         """Draw all UI elements"""
         # Draw cards first
         self.draw_cards(screen, player)
+        self.draw_allocation(screen, player)
+        self.draw_buttons(screen, current_turn, action_taken)
+        self.draw_next_turn_button(screen)
 
+    def draw_allocation(self, screen, player):
+        """Draw the soldier/farmer slider while the player still has to allocate"""
         # Only show allocation UI if we're past the first round and player hasn't allocated yet
         if player.population > 0 and not player.allocated_this_round:
             # Draw slider for soldier allocation
@@ -385,8 +339,8 @@ class UIManager:
             pygame.draw.rect(screen, Button_COLORS["white"], self.soldier_slider_handle)
 
             # Draw labels for slider (switched places)
-            farmers_label = self.fonts['small'].render("Farmers", True, BLACK)
-            soldiers_label = self.fonts['small'].render("Soldiers", True, BLACK)
+            farmers_label = self.labels['farmers']
+            soldiers_label = self.labels['soldiers']
             screen.blit(farmers_label, (self.soldier_slider.x, self.soldier_slider.y - 30))
             screen.blit(soldiers_label, (self.soldier_slider.x + self.soldier_slider.width - soldiers_label.get_width(),
                                          self.soldier_slider.y - 30))
@@ -394,12 +348,14 @@ class UIManager:
             # Draw allocation text for the current population unit
             if player.population == 1:
                 # For simplicity in Round 2, just show a binary choice
-                allocation_text = self.fonts['small'].render(
+                allocation_text = self.text.render(
+                    self.fonts['small'],
                     f"Allocate new population unit as: {'Soldier' if self.soldier_percentage >= 50 else 'Farmer'}",
                     True, BLACK)
             else:
                 # Show regular percentage for later rounds
-                allocation_text = self.fonts['small'].render(
+                allocation_text = self.text.render(
+                    self.fonts['small'],
                     f"{self.soldier_percentage}% Soldiers, {100 - self.soldier_percentage}% Farmers",
                     True, BLACK)
 
@@ -407,12 +363,14 @@ class UIManager:
                         (self.soldier_slider.x + (self.soldier_slider.width - allocation_text.get_width()) // 2,
                          self.soldier_slider.y + 30))
 
+    def draw_buttons(self, screen, current_turn, action_taken=False):
+        """Draw the action buttons"""
         # Draw action buttons if it's player's turn
         if current_turn == "player1" or current_turn == "player2":
             # Attack button - grayed out if action already taken
             button_color = COLORS["gray"] if action_taken else COLORS["red"]
             pygame.draw.rect(screen, button_color, self.attack_button)
-            attack_text = self.fonts['small'].render("ATTACK", True, WHITE)
+            attack_text = self.labels['attack']
             screen.blit(attack_text, (self.attack_button.x + (self.attack_button.width - attack_text.get_width()) // 2,
                                       self.attack_button.y + (
                                               self.attack_button.height - attack_text.get_height()) // 2))
@@ -420,14 +378,14 @@ class UIManager:
             # Heal button - grayed out if action already taken
             button_color = COLORS["gray"] if action_taken else COLORS["green"]
             pygame.draw.rect(screen, button_color, self.heal_button)
-            heal_text = self.fonts['small'].render("HEAL", True, BLACK if not action_taken else WHITE)
+            heal_text = self.labels['heal_taken' if action_taken else 'heal']
             screen.blit(heal_text, (self.heal_button.x + (self.heal_button.width - heal_text.get_width()) // 2,
                                     self.heal_button.y + (self.heal_button.height - heal_text.get_height()) // 2))
 
             # Damage boost button - grayed out if action already taken
             button_color = COLORS["gray"] if action_taken else COLORS["blue"]
             pygame.draw.rect(screen, button_color, self.damage_button)
-            damage_text = self.fonts['small'].render("BOOST DMG", True, WHITE)
+            damage_text = self.labels['boost']
             screen.blit(damage_text, (self.damage_button.x + (self.damage_button.width - damage_text.get_width()) // 2,
                                       self.damage_button.y + (
                                               self.damage_button.height - damage_text.get_height()) // 2))
@@ -435,91 +393,133 @@ class UIManager:
             # Play card button - grayed out if action already taken or no card selected
             card_button_color = COLORS["gray"] if action_taken or self.selected_card_index is None else COLORS["purple"]
             pygame.draw.rect(screen, card_button_color, self.play_card_button)
-            card_text = self.fonts['small'].render("PLAY CARD", True, WHITE)
+            card_text = self.labels['play_card']
             screen.blit(card_text,
                         (self.play_card_button.x + (self.play_card_button.width - card_text.get_width()) // 2,
                          self.play_card_button.y + (self.play_card_button.height - card_text.get_height()) // 2))
 
-        # Draw next turn button
+    def draw_next_turn_button(self, screen):
+        """Draw the next turn button"""
         pygame.draw.rect(screen, COLORS["blue"], self.next_turn_button)
-        next_text = self.fonts['small'].render("NEXT TURN", True, WHITE)
+        next_text = self.labels['next_turn']
         screen.blit(next_text, (self.next_turn_button.x + (self.next_turn_button.width - next_text.get_width()) // 2,
                                 self.next_turn_button.y + (self.next_turn_button.height - next_text.get_height()) // 2))
 
 
 class Game:
-    def __init__(self, screen, player1_name, player2_name=None):
+    def __init__(self, screen, player1_name, player2_name=None, seed=None, ai="basic", trace_file=None):
         self.screen = screen
+        # Frame timings for the F3 overlay, written to trace_file (JSON, or CSV by extension) on exit
+        self.trace_file = trace_file
+        self.profiler = FrameProfiler(keep_trace=bool(trace_file))
+        # All randomness of this game derives from one seed, so it can be replayed
+        self.seed = new_master_seed() if seed is None else seed
         self.running = True
-        self.current_round = 1
-        self.current_turn = "player1"  # player1 or player2
-        self.round_actions = []
-        self.game_over = False
-        self.winner = None
         self.waiting_for_next_player = False
-        self.action_taken = False  # Flag to track if an action has been taken this turn
         self.message_queue = []  # Queue for multiple messages
         self.stats = GameStats()
         self.stats_saved = False
+        self._pending_messages = []  # Messages emitted by the rules engine during one action
 
-        # Create players
-        player1_color = random.choice(list(COLORS.values()))
+        # Pick player colors
+        color_rng = derive_rng(self.seed, "colors")
+        player1_color = color_rng.choice(list(COLORS.values()))
         player2_colors = [color for color in COLORS.values() if color != player1_color]
-        player2_color = random.choice(player2_colors)
-
-        # Two-player mode
-        if player2_name:
-            self.mode = "two_player"
-            self.player1 = Player(player1_name, 1, player1_color)
-            self.player2 = Player(player2_name, 1, player2_color)
-        # Single-player mode with AI
-        else:
-            self.mode = "single_player"
-            self.player1 = Player(player1_name, 1, player1_color)
-            self.player2 = Enemy("Enemy Castle", 1, player2_color)
-
-        # Initial round has no soldiers or farmers yet
-        self.player1.soldier_count = 0
-        self.player1.farmer_count = 0
-        self.player2.soldier_count = 0
-        self.player2.farmer_count = 0
+        player2_color = color_rng.choice(player2_colors)
+
+        # Two-player mode, or single-player mode with AI
+        self.mode = "two_player" if player2_name else "single_player"
+        card_seed = derive_seed(self.seed, "cards")
+        self.action_log = ActionLog(card_seed, player1_name, player2_name)
+        self.engine = new_match(player1_name, player2_name, player1_color, player2_color,
+                                stats=self.stats, on_message=self._pending_messages.append,
+                                rng=random.Random(card_seed), log=self.action_log)
+        self.player1 = self.engine.state.player1
+        self.player2 = self.engine.state.player2
+        self.ai_policy = INTERACTIVE_POLICIES[ai](derive_rng(self.seed, "player2"))
+        self.ai_thinking = False  # The AI is searching on its worker thread, player input is ignored
+        self._ai_executor = None  # Single worker thread, created on the first AI turn
+        self._ai_future = None  # Pending move of the AI
+        self._ai_cancel = threading.Event()
 
         # Create map and UI manager
         self.map = Map(WIDTH, HEIGHT)
-        self.ui = UIManager(WIDTH, HEIGHT)
-
-        # Initialize card system
-        self.card_system = CardSystem(self.player1, self.player2)
+        self.ui = UIManager(WIDTH, HEIGHT, self.profiler)
+        self.return_button = pygame.Rect(WIDTH // 2 - 100, HEIGHT // 2 + 50, 200, 40)
+        self.hud_rect = pygame.Rect(WIDTH // 2 - 210, 125, 420, 90)
+        self.hud_panel = pygame.Surface(self.hud_rect.size, pygame.SRCALPHA)
+        self.hud_panel.fill((0, 0, 0, 170))
+
+        # Retained scenes: only widgets whose state changed are repainted
+        self.battle_scene = self._build_battle_scene()
+        blank = pygame.Surface((WIDTH, HEIGHT)).convert()
+        blank.fill(WHITE)
+        self.transition_scene = Scene(screen, blank, [
+            Widget(screen.get_rect(), lambda: self.get_current_player().name, self._draw_transition)],
+            self.profiler)
+        self._shown_scene = None
 
         # Setup initial message
         self.message = f"Game started! {self.player1.name}'s turn!"
-        self.message_timer = 0
+        self.message_expires = None  # time.monotonic() when the message disappears, None while hidden
+
+    # Game progress lives in the rules engine state
+    @property
+    def current_round(self):
+        return self.engine.state.current_round
+
+    @property
+    def current_turn(self):
+        return self.engine.state.current_turn
 
-    def handle_events(self):
-        """Handle game events"""
-        for event in pygame.event.get():
+    @property
+    def action_taken(self):
+        return self.engine.state.action_taken
+
+    @property
+    def game_over(self):
+        return self.engine.state.game_over
+
+    @property
+    def winner(self):
+        return self.engine.state.winner
+
+    def handle_events(self, events=None):
+        """Handle game events (all pending events by default)"""
+        for event in pygame.event.get() if events is None else events:
             if event.type == pygame.QUIT:
                 self.running = False
+                self.stop_ai()
+                self.write_trace()
                 pygame.quit()
                 sys.exit()
 
+            # The window lost its contents (uncovered, restored...), repaint everything next frame
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self._shown_scene = None
+
+            if event.type == pygame.KEYDOWN and event.key == PROFILER_HUD_KEY:
+                self.profiler.visible = not self.profiler.visible
+
             # If waiting for player switch confirmation
             if self.waiting_for_next_player:
                 if event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
                     self.waiting_for_next_player = False
-
-                    # Switch player turn immediately
-                    self.current_turn = "player2" if self.current_turn == "player1" else "player1"
-
-                    # Process start-of-turn card effects
-                    self.process_turn_start()
-
-                    # Check if we've completed a full round (both players have taken turns)
-                    if self.current_turn == "player1":
-                        # Both players have taken their turns, proceed to next round
-                        self.prepare_next_round()
                 return
 
+            if self.ai_thinking:
+                continue
+
+            # Return to the menu from the game over screen
+            if (self.game_over and event.type == pygame.MOUSEBUTTONDOWN and event.button == 1
+                    and self.return_button.collidepoint(event.pos)):
+                # Save game stats before quitting if the game wasn't already over
+                if not self.stats_saved:
+                    winner_name = self.player1.name if self.winner == "player1" else self.player2.name if self.winner == "player2" else "Game Abandoned"
+                    self.stats.save_game_stats(self.player1.name, self.player2.name, winner_name)
+                    self.stats_saved = True
+                self.running = False
+
             # Handle UI events if game is not over
             if not self.game_over:
                 player = self.get_current_player()
@@ -551,10 +551,8 @@ class Game:
                     card_clicked = self.ui.check_card_click(event.pos)
                     if card_clicked is not None and card_clicked < len(player.cards):
                         self.ui.selected_card_index = card_clicked
-                        selected_card = player.cards[card_clicked]
-                        print(f"Selected card: {selected_card.name}")  # Debug print
-                        self.message = f"Selected: {selected_card.name} - {selected_card.description}"
-                        self.message_timer = 120
+                        selected_card = CARD_TYPES[player.cards[card_clicked]]
+                        self.show_message(f"Selected: {selected_card.name} - {selected_card.description}")
 
                     # Check for button clicks
                     action = None
@@ -576,223 +574,58 @@ class Game:
                         action = "next_turn"
 
                     if action:
-                        self.process_action(action)
-
-    def process_turn_start(self):
-        """Process turn start effects (Battle Chest and Endangered Mode)"""
-        player = self.get_current_player()
-
-        # Check for double draw effect
-        if player.double_draw:
-            card1 = self.card_system.check_battle_chest(player)
-            if card1:
-                player.cards.append(card1)
-                self.message = f"{player.name} drew {card1.name} from Double Draw effect!"
-                self.message_timer = 120
-
-            card2 = self.card_system.check_battle_chest(player)
-            if card2:
-                player.cards.append(card2)
-                self.message_queue.append(f"{player.name} drew {card2.name} from Double Draw effect!")
-
-            # Reset double draw
-            player.double_draw = False
-
-        # Check Battle Chest (10% chance)
-        card = self.card_system.check_battle_chest(player)
-        if card:
-            player.cards.append(card)
-            if not self.message:
-                self.message = f"{player.name} drew {card.name} from Battle Chest!"
-                self.message_timer = 120
+                        with self.profiler.phase("actions"):
+                            self.process_action(action)
+
+    def show_message(self, text):
+        """Show a message for MESSAGE_DURATION seconds"""
+        self.message = text
+        self.message_expires = time.monotonic() + MESSAGE_DURATION
+
+    def update_message(self):
+        """Hide the message once its time is up, or move on to the next queued one"""
+        if self.message_expires is not None and time.monotonic() >= self.message_expires:
+            if self.message_queue:
+                self.show_message(self.message_queue.pop(0))
             else:
-                self.message_queue.append(f"{player.name} drew {card.name} from Battle Chest!")
-
-        # Check Endangered Mode
-        if player.hearts < 10:
-            card = self.card_system.check_endangered_mode(player)
-            if card:
-                player.cards.append(card)
-                self.message_queue.append(f"{player.name} is in danger! Drew {card.name} from Endangered Mode!")
+                self.message_expires = None
 
     def get_current_player(self):
         """Return the current player based on turn"""
-        return self.player1 if self.current_turn == "player1" else self.player2
+        return self.engine.state.get_current_player()
 
     def get_opponent(self):
         """Return the opponent of the current player"""
-        return self.player2 if self.current_turn == "player1" else self.player1
+        return self.engine.state.get_opponent()
+
+    def apply_action(self, action):
+        """Apply an action through the rules engine and show the resulting messages"""
+        del self._pending_messages[:]
+        result = self.engine.apply(action)
+
+        if self._pending_messages:
+            self.show_message(self._pending_messages[0])
+            self.message_queue.extend(self._pending_messages[1:])
+
+        # Save game stats as soon as a castle falls
+        if self.game_over and not self.stats_saved:
+            winner = self.player1 if self.winner == "player1" else self.player2
+            self.stats.save_game_stats(self.player1.name, self.player2.name, winner.name)
+            append_logs(ACTION_LOG_FILE, [self.action_log])
+            self.stats_saved = True
+        return result
 
     def process_action(self, action):
         """Process player actions"""
-        current_player = self.get_current_player()
-        opponent = self.get_opponent()
-
-        self.stats.increment_turn()
-
-        # Special case for first round, can only end turn
-        if self.current_round == 1 and action == "next_turn":
-            if self.mode == "two_player":
-                self.switch_player()
-            else:
-                self.current_turn = "player2"
-                self.ai_turn()
-            self.round_actions.append("First round - no actions taken")
-            return
-        elif self.current_round == 1:
-            self.message = "First round - only end turn is allowed."
-            self.message_timer = 120
+        if action == "play_card":
+            self.apply_action(Action(action, self.ui.soldier_percentage, self.ui.selected_card_index))
+            # Reset selected card
+            self.ui.selected_card_index = None
             return
 
-        # Allocate population when first action is taken
-        if not current_player.allocated_this_round and self.current_round > 1:
-            # First allocate the population based on the slider
-            soldier_count = int(current_player.population * self.ui.soldier_percentage / 100)
-            current_player.soldier_count = soldier_count
-            current_player.farmer_count = current_player.population - soldier_count
-            current_player.allocated_this_round = True
-
-            self.stats.record_unit_allocation(current_player.soldier_count, current_player.farmer_count)
-
-        # Regular actions for round 2 and beyond
-        if action == "attack":
-            self.stats.record_action("attack")
-            self.stats.record_battle()
-
-            damage_dealt = current_player.soldier_count + current_player.damage_bonus
-
-            # Check for counter shield
-            if opponent.has_counter_shield:
-                reflected_damage = int(damage_dealt * 0.5)
-                current_player.hearts -= reflected_damage
-                opponent.has_counter_shield = False  # Used up
-
-                self.message = f"{current_player.name}'s attack was blocked by Counter Shield! {reflected_damage} damage reflected back!"
-                self.message_timer = 120
-                self.round_actions.append(f"{current_player.name}'s attack was countered and reflected")
-
-                # TRACK HEARTS LOST BY CURRENT PLAYER
-                current_player_type = "player1" if self.current_turn == "player1" else "player2"
-                self.stats.record_hearts_lost(current_player_type, reflected_damage)
-
-            # Check for trap card
-            elif opponent.has_trap:
-                trap_damage = 10
-                current_player.hearts -= trap_damage
-                current_player.damage_bonus -= int(current_player.soldier_count * 0.2)  # 20% less damage
-                if current_player.damage_bonus < 0:
-                    current_player.damage_bonus = 0
-
-                # Apply damage to opponent
-                opponent.hearts -= damage_dealt
-
-                # TRACK HEARTS LOST BY BOTH PLAYERS
-                current_player_type = "player1" if self.current_turn == "player1" else "player2"
-                opponent_type = "player2" if self.current_turn == "player1" else "player1"
-                self.stats.record_hearts_lost(current_player_type, trap_damage)
-                self.stats.record_hearts_lost(opponent_type, damage_dealt)
-
-                # Reset trap
-                opponent.has_trap = False
-
-                self.message = f"{current_player.name} attacked for {damage_dealt} damage but triggered a Trap Card!"
-                self.message_queue.append(
-                    f"{current_player.name} took {trap_damage} damage and will deal less damage for 2 turns!")
-                self.message_timer = 120
-                self.round_actions.append(f"{current_player.name} attacked and triggered a Trap Card")
-
-                # Track hearts lost by both players
-                self.stats.record_hearts_lost(self.current_turn, trap_damage)
-                opponent_turn = "player2" if self.current_turn == "player1" else "player1"
-                self.stats.record_hearts_lost(opponent_turn, damage_dealt)
-
-                # Track hearts lost
-                opponent_turn = "player2" if self.current_turn == "player1" else "player1"
-                self.stats.record_hearts_lost(opponent_turn, damage_dealt)
-
-            else:
-                # Regular attack
-                opponent.hearts -= damage_dealt
-
-                # TRACK HEARTS LOST BY OPPONENT
-                opponent_type = "player2" if self.current_turn == "player1" else "player1"
-                self.stats.record_hearts_lost(opponent_type, damage_dealt)
-
-                player_name = current_player.name
-                self.message = f"{player_name} attacked for {damage_dealt} damage!"
-                self.message_timer = 120
-                self.round_actions.append(f"{player_name} attacked for {damage_dealt} damage")
-
-            self.action_taken = True  # Mark that an action has been taken
-            self.check_victory()
-
-        elif action == "heal":
-            healing = current_player.heal_soldiers()
-            player_name = current_player.name
-            self.message = f"{player_name} healed {healing} hearts!"
-            self.message_timer = 120
-            self.round_actions.append(f"{player_name} healed {healing} hearts")
-            self.action_taken = True  # Mark that an action has been taken
-
-            self.stats.record_action("heal")
-
-        elif action == "damage":
-            bonus = current_player.increase_damage()
-            player_name = current_player.name
-            self.message = f"{player_name} increased damage by {bonus:.1f}!"
-            self.message_timer = 120
-            self.round_actions.append(f"{player_name} increased damage by {bonus:.1f}")
-            self.action_taken = True  # Mark that an action has been taken
-
-            self.stats.record_action("damage")
-
-        elif action == "play_card":
-            # Play selected card
-            print("Attempting to play card...")  # Debug print
-            if self.ui.selected_card_index is not None and self.ui.selected_card_index < len(current_player.cards):
-                card = current_player.cards[self.ui.selected_card_index]
-
-                # Debug prints
-                print(f"Trying to play card: {card.name}")
-                print(f"Selected card index: {self.ui.selected_card_index}")
-                print(f"Player has {len(current_player.cards)} cards")
-
-                # Apply card effect
-                result = card.use(current_player, opponent)
-                print(f"Card use result: {result}")  # Debug print
-
-                if result:
-                    # Remove card from player's hand
-                    current_player.cards.pop(self.ui.selected_card_index)
-
-                    # Track card action
-                    self.stats.record_action("play_card")
-
-                    self.message = f"{current_player.name} used {card.name}!"
-                    self.message_timer = 120
-                    self.round_actions.append(f"{current_player.name} used {card.name}")
-                    self.action_taken = True
-                else:
-                    self.message = f"Card couldn't be used in the current situation."
-                    self.message_timer = 120
-
-                # Reset selected card
-                self.ui.selected_card_index = None
-            else:
-                print("No card selected or invalid index")  # Debug print
-
-            self.stats.record_action("play_card")
-
-        elif action == "next_turn":
-            # In rounds after first, require an action
-            if self.current_round > 1 and len(self.round_actions) == 0:
-                self.message = "You must take an action before ending your turn!"
-                self.message_timer = 120
-                return
-
-            # Reset action_taken flag for the next player
-            self.action_taken = False
+        result = self.apply_action(Action(action, self.ui.soldier_percentage))
 
+        if action == "next_turn" and result:
             # Reset selected card
             self.ui.selected_card_index = None
 
@@ -800,365 +633,265 @@ class Game:
             if self.mode == "two_player":
                 self.switch_player()
             else:
-                self.current_turn = "player2"
                 self.ai_turn()
 
     def switch_player(self):
         """Switch to the other player with a confirmation screen"""
-        # Set up the player switch
-        next_player = "Player 2" if self.current_turn == "player1" else "Player 1"
+        # The engine has already passed the turn, wait for the next player to confirm
+        next_player = "Player 2" if self.current_turn == "player2" else "Player 1"
         self.message = f"{next_player}'s turn. Press ENTER when ready."
         self.waiting_for_next_player = True
 
     def ai_turn(self):
-        """Handle AI turn in single-player mode"""
-        # Special case for first round
-        if self.current_round == 1:
-            self.message = "Enemy ended their first turn."
-            self.message_timer = 120
-            self.round_actions.append("Enemy first round - no actions taken")
-
-            # If game is not over, prepare for next round
-            if not self.game_over:
-                self.prepare_next_round()
-            return
-
-        # Process card effects at turn start
-        self.process_turn_start()
-
-        # For rounds 2+, allocate population
-        if not self.player2.allocated_this_round:
-            # Enemy AI decides how to allocate population
-            soldier_ratio = 0.7 if self.player2.hearts > 15 else 0.3
-            soldier_count = int(self.player2.population * soldier_ratio)
-            self.player2.soldier_count = soldier_count
-            self.player2.farmer_count = self.player2.population - soldier_count
-            self.player2.allocated_this_round = True
-
-        # First decide if AI will use a card
-        if self.player2.cards and random.random() < 0.6:  # 60% chance to use a card if available
-            # Select a random card
-            card_index = random.randint(0, len(self.player2.cards) - 1)
-            card = self.player2.cards[card_index]
-
-            # Use the card
-            result = card.use(self.player2, self.player1)
-
-            if result:
-                # Remove card from AI's hand
-                self.player2.cards.pop(card_index)
-
-                self.message = f"Enemy used {card.name}!"
-                self.message_timer = 120
-                self.round_actions.append(f"Enemy used {card.name}")
-            else:
-                # If card couldn't be used, make a different action
-                self.ai_action()
-        else:
-            # Make a regular action
-            self.ai_action()
-
-        # Check for victory
-        self.check_victory()
+        """Start the AI policy on the enemy's next move in single-player mode
 
-        # Reset action_taken flag for the next player
-        self.action_taken = False
-
-        # If game is not over, prepare for next round
-        if not self.game_over:
-            self.prepare_next_round()
-
-    def ai_action(self):
-        """AI performs a regular action (attack, heal, or boost damage)"""
-        ai_choice = random.random()
-
-        if ai_choice < 0.3:  # 30% chance to heal
-            # Track heal action
-            self.stats.record_action("heal")
-
-            healing = self.player2.heal_soldiers()
-            self.message = f"Enemy healed {healing} hearts!"
-            self.round_actions.append(f"Enemy healed {healing} hearts")
-
-        elif ai_choice < 0.6:  # 30% chance to boost damage
-            # Track damage boost action
-            self.stats.record_action("damage")
-
-            bonus = self.player2.increase_damage()
-            self.message = f"Enemy increased damage by {bonus:.1f}!"
-            self.round_actions.append(f"Enemy increased damage by {bonus:.1f}")
-
-        else:  # 40% chance to attack
-            # Track battle and attack action
-            self.stats.record_battle()
-            self.stats.record_action("attack")
-
-            # Attack with card effects consideration
-            damage_dealt = self.player2.soldier_count + self.player2.damage_bonus
-
-            # Check for counter shield
-            if self.player1.has_counter_shield:
-                reflected_damage = int(damage_dealt * 0.5)
-                self.player2.hearts -= reflected_damage
-                self.player1.has_counter_shield = False  # Used up
-
-                # TRACK HEARTS LOST BY ENEMY
-                self.stats.record_hearts_lost("player2", reflected_damage)
-
-                self.message = f"Enemy's attack was blocked by Counter Shield! {reflected_damage} damage reflected back!"
-                self.message_timer = 120
-                self.round_actions.append(f"Enemy's attack was countered and reflected")
-            # Check for trap card
-            elif self.player1.has_trap:
-                trap_damage = 10
-                self.player2.hearts -= trap_damage
-                self.player2.damage_bonus -= int(self.player2.soldier_count * 0.2)  # 20% less damage
-                if self.player2.damage_bonus < 0:
-                    self.player2.damage_bonus = 0
-
-                # Apply damage to player
-                self.player1.hearts -= damage_dealt
-
-                # TRACK HEARTS LOST BY BOTH PLAYERS
-                self.stats.record_hearts_lost("player2", trap_damage)
-                self.stats.record_hearts_lost("player1", damage_dealt)
-
-                # Reset trap
-                self.player1.has_trap = False
-
-                self.message = f"Enemy attacked for {damage_dealt} damage but triggered a Trap Card!"
-                self.message_queue.append(f"Enemy took {trap_damage} damage and will deal less damage for 2 turns!")
-                self.message_timer = 120
-                self.round_actions.append(f"Enemy attacked and triggered a Trap Card")
-
-            else:
-                # Regular attack
-                self.player1.hearts -= damage_dealt
-
-                # TRACK HEARTS LOST BY PLAYER
-                self.stats.record_hearts_lost("player1", damage_dealt)
-
-                self.message = f"Enemy attacked for {damage_dealt} damage!"
-                self.message_timer = 120
-                self.round_actions.append(f"Enemy attacked for {damage_dealt} damage")
-
-    def check_victory(self):
-        """Check if either player has won"""
-        # Check for rebirth card effect first
-        if self.player1.hearts <= 0 and self.player1.has_rebirth:
-            self.player1.hearts = 10
-            self.player1.has_rebirth = False
-            self.message = f"{self.player1.name} was revived by Rebirth Card with 10 hearts!"
-            self.message_timer = 120
+        The policy searches a copy of the position on a worker thread, so the
+        frame loop keeps running; poll_ai() applies the move once it is ready.
+        """
+        if self.game_over or self.current_turn != "player2" or self._ai_future is not None:
             return
-
-        if self.player2.hearts <= 0 and self.player2.has_rebirth:
-            self.player2.hearts = 10
-            self.player2.has_rebirth = False
-            self.message = f"{self.player2.name} was revived by Rebirth Card with 10 hearts!"
-            self.message_timer = 120
+        if self._ai_executor is None:
+            self._ai_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="enemy-ai")
+
+        # Search policies play moves on the engine they are given, never on the displayed one. Its card draws
+        # come from the game's seed and the number of moves so far, so a seeded game searches the same way again
+        engine = new_match(self.player1.name, self.player2.name,
+                           rng=derive_rng(self.seed, "ai-search", len(self.action_log)))
+        engine.state.restore(self.engine.state.snapshot())
+        self._ai_cancel.clear()
+        self._ai_future = self._ai_executor.submit(self._ai_search, engine)
+        self.ai_thinking = True
+
+    def _ai_search(self, engine):
+        """Worker thread: think in AI_THINK_SLICE steps, returns the move or None if cancelled"""
+        while not self.ai_policy.think(engine, AI_THINK_SLICE):
+            if self._ai_cancel.is_set():
+                return None
+        return self.ai_policy.choose_action(engine)
+
+    def poll_ai(self):
+        """Apply the AI's move once its search has finished and start on the following one"""
+        future = self._ai_future
+        if future is None or not future.done():
             return
-
-        # Normal victory check
-        if self.player1.hearts <= 0:
-            self.game_over = True
-            self.winner = "player2"
-            self.message = f"Game Over! {self.player2.name} has defeated {self.player1.name}!"
-            # Save game stats
-            self.stats.save_game_stats(self.player1.name, self.player2.name, self.player2.name)
-            self.stats_saved = True
-        elif self.player2.hearts <= 0:
-            self.game_over = True
-            self.winner = "player1"
-            self.message = f"Game Over! {self.player1.name} has defeated {self.player2.name}!"
-            # Save game stats
-            self.stats.save_game_stats(self.player1.name, self.player2.name, self.player1.name)
-            self.stats_saved = True
-
-    def prepare_next_round(self):
-        """Prepare for the next round"""
-        self.current_round += 1
-        self.current_turn = "player1"
-        self.round_actions = []
-        self.action_taken = False  # Reset action taken flag for the new round
-
-        # Set population to match the round number
-        # This ensures Round 1 = 1 population, Round 2 = 2 population, Round 3 = 3 population, etc.
-        self.player1.population = self.current_round
-        self.player2.population = self.current_round
-
-        # Reset allocation tracking
-        self.player1.allocated_this_round = False
-        self.player2.allocated_this_round = False
-
-        # Update lucky charm counter
-        if hasattr(self.player1, "lucky_boost") and self.player1.lucky_boost > 0:
-            self.player1.lucky_boost -= 1
-
-        if hasattr(self.player2, "lucky_boost") and self.player2.lucky_boost > 0:
-            self.player2.lucky_boost -= 1
-
-        self.message = f"Round {self.current_round} - {self.player1.name}'s turn! Allocate your new population."
-        self.message_timer = 120
-
-    def draw(self):
-        """Draw the game"""
-        # Clear screen
-        self.screen.fill(WHITE)
-
-        # If waiting for player switch, show only the transition screen
-        if self.waiting_for_next_player:
-            next_player = self.player2.name if self.current_turn == "player1" else self.player1.name
-            transition_text = self.ui.fonts['large'].render(f"{next_player}'s Turn", True, BLACK)
-            instruction_text = self.ui.fonts['medium'].render("Press ENTER when ready", True, BLACK)
-
-            self.screen.blit(transition_text, (WIDTH // 2 - transition_text.get_width() // 2, HEIGHT // 2 - 50))
-            self.screen.blit(instruction_text, (WIDTH // 2 - instruction_text.get_width() // 2, HEIGHT // 2 + 20))
-
-            pygame.display.flip()
-            return
-
-        # Draw map
-        self.map.draw(self.screen, self.player1, self.player2)
-
-        # Draw player and enemy info
-        self.ui.draw_player_info(self.screen, self.player1, 20, 20)
-        self.ui.draw_player_info(self.screen, self.player2, WIDTH - 200, 20)
-
-        # Draw UI elements if game is not over
-        if not self.game_over:
-            current_player = self.get_current_player()
-            self.ui.draw_ui(self.screen, current_player, self.current_turn, self.action_taken)
+        self._ai_future = None
+        self.ai_thinking = False
+        action = future.result()
+        if action is not None:
+            self.apply_action(action)
+            self.ai_turn()
+
+    def stop_ai(self):
+        """Cancel a running AI search and stop the worker thread"""
+        self._ai_cancel.set()
+        if self._ai_executor is not None:
+            self._ai_executor.shutdown(wait=True)
+            self._ai_executor = None
+        self._ai_future = None
+        self.ai_thinking = False
+
+    def _build_battle_scene(self):
+        """Widgets of the battle screen over the pre-composited map, in drawing order"""
+        ui = self.ui
+        castle1_pos, castle2_pos = self.map.castle_positions()
+        bar1 = self.map.health_bar_rect(castle1_pos)
+        bar2 = self.map.health_bar_rect(castle2_pos)
+        bar_width = bar1.width * MAX_HEARTS // 20  # Bars are scaled to 20 hearts and may overflow
+
+        def info_key(player):
+            return player.hearts, player.population, player.soldier_count, player.farmer_count, player.damage_bonus
+
+        def effects_key(player):
+            return player.has_counter_shield, player.has_rebirth, player.has_trap, player.lucky_boost > 0
+
+        def while_playing(draw):
+            # The controls disappear once the game is over
+            return lambda screen: None if self.game_over else draw(screen)
+
+        widgets = [
+            Widget((bar1.x, bar1.y, bar_width, bar1.height), lambda: self.player1.hearts,
+                   lambda screen: self.map.draw_health_bar(screen, self.player1, bar1), phase="map"),
+            Widget((bar2.x, bar2.y, bar_width, bar2.height), lambda: self.player2.hearts,
+                   lambda screen: self.map.draw_health_bar(screen, self.player2, bar2), phase="map"),
+            Widget((0, 0, WIDTH // 2, 210), lambda: info_key(self.player1),
+                   lambda screen: ui.draw_player_info(screen, self.player1, 20, 20)),
+            Widget((WIDTH - 200, 0, 200, 210), lambda: info_key(self.player2),
+                   lambda screen: ui.draw_player_info(screen, self.player2, WIDTH - 200, 20)),
+            Widget((0, ui.card_area.y - 30, WIDTH, ui.card_area.height + 30),
+                   lambda: (self.game_over, self.current_turn, self.get_current_player().cards.tobytes(),
+                            ui.selected_card_index),
+                   while_playing(lambda screen: ui.draw_cards(screen, self.get_current_player()))),
+            Widget((0, ui.soldier_slider.y - 30, WIDTH // 2 - 60, 80),
+                   lambda: (self.game_over, self.current_turn, self.get_current_player().population,
+                            self.get_current_player().allocated_this_round, ui.soldier_percentage),
+                   while_playing(lambda screen: ui.draw_allocation(screen, self.get_current_player()))),
+            Widget(ui.attack_button.unionall([ui.heal_button, ui.damage_button, ui.play_card_button]),
+                   lambda: (self.game_over, self.action_taken, ui.selected_card_index is None),
+                   while_playing(lambda screen: ui.draw_buttons(screen, self.current_turn, self.action_taken))),
+            Widget(ui.next_turn_button, lambda: self.game_over, while_playing(ui.draw_next_turn_button)),
+            Widget((0, 0, WIDTH, 120), lambda: (self.current_round, self.current_turn, self._status_text()),
+                   self._draw_header),
+            Widget((0, 190, WIDTH // 2, 100), lambda: effects_key(self.player1),
+                   lambda screen: self._draw_effects(screen, self.player1, 20)),
+            Widget((WIDTH - 250, 190, 250, 100), lambda: effects_key(self.player2),
+                   lambda screen: self._draw_effects(screen, self.player2, WIDTH - 250)),
+            Widget((0, HEIGHT - 150, WIDTH, 30), lambda: None if self.message_expires is None else self.message,
+                   self._draw_message),
+            Widget((0, HEIGHT // 2 - 50, WIDTH, 140), lambda: (self.game_over, self.winner), self._draw_game_over),
+            Widget(self.hud_rect, lambda: self.profiler.hud_lines() if self.profiler.visible else None,
+                   self._draw_profiler_hud, phase="hud"),
+        ]
+        return Scene(self.screen, self.map.draw_background(self.player1, self.player2), widgets, self.profiler)
+
+    def _status_text(self):
+        """What the current player should do next, None in the first round"""
+        if self.current_round <= 1:
+            return None
+        if self.ai_thinking:
+            return "Enemy is thinking..."
+        if not self.get_current_player().allocated_this_round:
+            return "Allocate your population!"
+        if not self.action_taken:
+            return "Choose an action!"
+        return "Action taken - End turn"
+
+    def _draw_transition(self, screen):
+        """Show only whose turn it is while waiting for the next player"""
+        next_player = self.get_current_player().name
+        transition_text = self.ui.text.render(self.ui.fonts['large'], f"{next_player}'s Turn", True, BLACK)
+        instruction_text = self.ui.labels['press_enter']
+
+        screen.blit(transition_text, (WIDTH // 2 - transition_text.get_width() // 2, HEIGHT // 2 - 50))
+        screen.blit(instruction_text, (WIDTH // 2 - instruction_text.get_width() // 2, HEIGHT // 2 + 20))
+
+    def _draw_header(self, screen):
+        """Draw the round, whose turn it is and the action status"""
+        font = get_font()
+        render = self.ui.text.render
 
         # Draw current round
-        round_text = font.render(f"Round: {self.current_round}", True, BLACK)
-        self.screen.blit(round_text, (WIDTH // 2 - round_text.get_width() // 2, 10))
+        round_text = render(font, f"Round: {self.current_round}", True, BLACK)
+        screen.blit(round_text, (WIDTH // 2 - round_text.get_width() // 2, 10))
 
         # Draw current turn
         current_player_name = self.player1.name if self.current_turn == "player1" else self.player2.name
-        turn_text = font.render(f"Turn: {current_player_name}", True, BLACK)
-        self.screen.blit(turn_text, (WIDTH // 2 - turn_text.get_width() // 2, 50))
+        turn_text = render(font, f"Turn: {current_player_name}", True, BLACK)
+        screen.blit(turn_text, (WIDTH // 2 - turn_text.get_width() // 2, 50))
 
         # Draw action status
-        if self.current_round > 1:
-            current_player = self.get_current_player()
-            if not current_player.allocated_this_round:
-                status_text = "Allocate your population!"
-            elif not self.action_taken:
-                status_text = "Choose an action!"
-            else:
-                status_text = "Action taken - End turn"
-
-            action_text = font.render(status_text, True, BLACK)
-            self.screen.blit(action_text, (WIDTH // 2 - action_text.get_width() // 2, 90))
-
-        # Draw active card effects for both players
+        status_text = self._status_text()
+        if status_text:
+            action_text = render(font, status_text, True, BLACK)
+            screen.blit(action_text, (WIDTH // 2 - action_text.get_width() // 2, 90))
+
+    def _draw_effects(self, screen, player, x):
+        """Draw the active card effects of a player"""
+        small_font = self.ui.fonts['small']
+        render = self.ui.text.render
         y_offset = 190
-        if self.player1.has_counter_shield:
-            effect_text = self.ui.fonts['small'].render(f"{self.player1.name} has Counter Shield active", True,
-                                                        (0, 100, 200))
-            self.screen.blit(effect_text, (20, y_offset))
+        if player.has_counter_shield:
+            effect_text = render(small_font, f"{player.name} has Counter Shield active", True, (0, 100, 200))
+            screen.blit(effect_text, (x, y_offset))
             y_offset += 25
 
-        if self.player1.has_rebirth:
-            effect_text = self.ui.fonts['small'].render(f"{self.player1.name} has Rebirth protection", True,
-                                                        (255, 100, 100))
-            self.screen.blit(effect_text, (20, y_offset))
+        if player.has_rebirth:
+            effect_text = render(small_font, f"{player.name} has Rebirth protection", True, (255, 100, 100))
+            screen.blit(effect_text, (x, y_offset))
             y_offset += 25
 
-        if self.player1.has_trap:
-            effect_text = self.ui.fonts['small'].render(f"{self.player1.name} has a Trap Card set", True, (200, 50, 50))
-            self.screen.blit(effect_text, (20, y_offset))
+        if player.has_trap:
+            effect_text = render(small_font, f"{player.name} has a Trap Card set", True, (200, 50, 50))
+            screen.blit(effect_text, (x, y_offset))
             y_offset += 25
 
-        if hasattr(self.player1, "lucky_boost") and self.player1.lucky_boost > 0:
-            effect_text = self.ui.fonts['small'].render(f"{self.player1.name} has Lucky Charm active", True,
-                                                        (100, 200, 100))
-            self.screen.blit(effect_text, (20, y_offset))
+        if player.lucky_boost > 0:
+            effect_text = render(small_font, f"{player.name} has Lucky Charm active", True, (100, 200, 100))
+            screen.blit(effect_text, (x, y_offset))
 
-        # Player 2 effects
-        y_offset = 190
-        if self.player2.has_counter_shield:
-            effect_text = self.ui.fonts['small'].render(f"{self.player2.name} has Counter Shield active", True,
-                                                        (0, 100, 200))
-            self.screen.blit(effect_text, (WIDTH - 250, y_offset))
-            y_offset += 25
+    def _draw_message(self, screen):
+        """Draw the current message while it is shown"""
+        if self.message_expires is not None:
+            message_text = self.ui.text.render(get_font(), self.message, True, BLACK)
+            screen.blit(message_text, (WIDTH // 2 - message_text.get_width() // 2, HEIGHT - 150))
 
-        if self.player2.has_rebirth:
-            effect_text = self.ui.fonts['small'].render(f"{self.player2.name} has Rebirth protection", True,
-                                                        (255, 100, 100))
-            self.screen.blit(effect_text, (WIDTH - 250, y_offset))
-            y_offset += 25
+    def _draw_game_over(self, screen):
+        """Draw the winner and the return to menu button once the game is over"""
+        if not self.game_over:
+            return
+        game_over_text = self.ui.labels['game_over']
+        screen.blit(game_over_text, (WIDTH // 2 - game_over_text.get_width() // 2, HEIGHT // 2 - 50))
+
+        winner_name = self.player1.name if self.winner == "player1" else self.player2.name
+        winner_text = self.ui.text.render(self.ui.fonts['large'], f"Winner: {winner_name}", True, BLACK)
+        screen.blit(winner_text, (WIDTH // 2 - winner_text.get_width() // 2, HEIGHT // 2))
+
+        # Show return to menu button
+        return_button = self.return_button
+        pygame.draw.rect(screen, COLORS["blue"], return_button)
+        return_text = self.ui.labels['return_to_menu']
+        screen.blit(return_text, (return_button.x + (return_button.width - return_text.get_width()) // 2,
+                                  return_button.y + (return_button.height - return_text.get_height()) // 2))
+
+    def _draw_profiler_hud(self, screen):
+        """Draw the frame time percentiles and mean phase times (toggled with F3)"""
+        if not self.profiler.visible:
+            return
+        screen.blit(self.hud_panel, self.hud_rect)
+        font = self.ui.fonts['small']
+        for index, line in enumerate(self.profiler.hud_lines()):
+            # Rendered directly: these strings change every frame and would only churn the text cache
+            screen.blit(font.render(line, True, WHITE), (self.hud_rect.x + 8, self.hud_rect.y + 6 + index * 20))
 
-        if self.player2.has_trap:
-            effect_text = self.ui.fonts['small'].render(f"{self.player2.name} has a Trap Card set", True, (200, 50, 50))
-            self.screen.blit(effect_text, (WIDTH - 250, y_offset))
-            y_offset += 25
+    def write_trace(self):
+        """Write the frame trace if the game was started with a trace file"""
+        if self.trace_file:
+            self.profiler.dump(self.trace_file)
 
-        if hasattr(self.player2, "lucky_boost") and self.player2.lucky_boost > 0:
-            effect_text = self.ui.fonts['small'].render(f"{self.player2.name} has Lucky Charm active", True,
-                                                        (100, 200, 100))
-            self.screen.blit(effect_text, (WIDTH - 250, y_offset))
-
-        # Draw message if timer is active
-        if self.message_timer > 0:
-            message_text = font.render(self.message, True, BLACK)
-            self.screen.blit(message_text, (WIDTH // 2 - message_text.get_width() // 2, HEIGHT - 150))
-            self.message_timer -= 1
-
-            # If message timer expired and we have messages in queue, show the next one
-            if self.message_timer <= 0 and self.message_queue:
-                self.message = self.message_queue.pop(0)
-                self.message_timer = 120
-
-        # Draw game over message if game is over
-        if self.game_over:
-            game_over_text = self.ui.fonts['large'].render("GAME OVER", True, BLACK)
-            self.screen.blit(game_over_text, (WIDTH // 2 - game_over_text.get_width() // 2, HEIGHT // 2 - 50))
-
-            winner_name = self.player1.name if self.winner == "player1" else self.player2.name
-            winner_text = self.ui.fonts['large'].render(f"Winner: {winner_name}", True, BLACK)
-            self.screen.blit(winner_text, (WIDTH // 2 - winner_text.get_width() // 2, HEIGHT // 2))
-
-            # Show return to menu button
-            return_button = pygame.Rect(WIDTH // 2 - 100, HEIGHT // 2 + 50, 200, 40)
-            pygame.draw.rect(self.screen, COLORS["blue"], return_button)
-            return_text = self.ui.fonts['small'].render("RETURN TO MENU", True, WHITE)
-            self.screen.blit(return_text, (return_button.x + (return_button.width - return_text.get_width()) // 2,
-                                           return_button.y + (return_button.height - return_text.get_height()) // 2))
-
-            # Check for click on return button
-            if pygame.mouse.get_pressed()[0]:
-                if return_button.collidepoint(pygame.mouse.get_pos()):
-                    # Save game stats before quitting if the game wasn't already over
-                    if not self.stats_saved:
-                        winner_name = self.player1.name if self.winner == "player1" else self.player2.name if self.winner == "player2" else "Game Abandoned"
-                        self.stats.save_game_stats(self.player1.name, self.player2.name, winner_name)
-                        self.stats_saved = True
-                    self.running = False
-
-        # Update display
-        pygame.display.flip()
+    def draw(self):
+        """Draw the game, repainting only what changed since the last frame"""
+        # If waiting for player switch, show only the transition screen
+        scene = self.transition_scene if self.waiting_for_next_player else self.battle_scene
+        if scene is not self._shown_scene:
+            scene.invalidate()
+            self._shown_scene = scene
+        scene.render()
 
     def run(self):
-        """Run the game loop"""
-        clock = pygame.time.Clock()
+        """Run the game loop, sleeping until something needs a new frame"""
+        scheduler = FrameScheduler()
+        profiler = self.profiler
+        events = []  # The first frame is drawn right away
 
         while self.running:
-            self.handle_events()
+            profiler.begin_frame()
+            with profiler.phase("events"):
+                self.handle_events(events)
+            with profiler.phase("actions"):
+                self.poll_ai()
+                self.update_message()
             self.draw()
-            clock.tick(60)
+            profiler.end_frame()
+
+            if self.ai_thinking:
+                scheduler.animate()  # Check on the AI's search every frame
+            scheduler.wake_at(self.message_expires)
+            events = scheduler.wait()
+        self.stop_ai()
+        self.write_trace()
 
 
-def start_game(player1_name, player2_name=None):
+def start_game(player1_name, player2_name=None, seed=None, ai="basic", trace_file=None):
     """Start the castle war game
 
     Args:
         player1_name: Name of the first player
         player2_name: Name of the second player (None for single-player mode)
+        seed: Seed for every random decision of the game (None picks a fresh one)
+        ai: Name of the enemy's policy in single-player mode (see ai_policy.INTERACTIVE_POLICIES)
+        trace_file: Where to write the frame profiler trace when the game ends (None for no trace)
     """
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("Castle War Game")
 
-    game = Game(screen, player1_name, player2_name)
+    game = Game(screen, player1_name, player2_name, seed, ai, trace_file)
     game.run()
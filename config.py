@@ -1,5 +1,3 @@
-import pygame
-
 # Screen settings
 WIDTH, HEIGHT = 1000, 800  # Increased for better UI layout
 
@@ -26,6 +24,35 @@ COLORS = {
 #
 
 # Fonts
-pygame.init()
-font = pygame.font.Font(None, 36)
-button_font = pygame.font.Font(None, 24)
\ No newline at end of file
+# pygame is only initialised when a font is first requested, so tools that
+# just need the constants (or the rules engine) never pay for SDL start-up.
+FONT_SIZE = 36
+BUTTON_FONT_SIZE = 24
+
+_fonts = {}
+
+
+def get_font(size=FONT_SIZE):
+    """Return the default font at the given size, created once on first use"""
+    font = _fonts.get(size)
+    if font is None:
+        import pygame
+
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = _fonts[size] = pygame.font.Font(None, size)
+    return font
+
+
+def get_button_font():
+    """Return the font used for button labels"""
+    return get_font(BUTTON_FONT_SIZE)
+
+
+def __getattr__(name):
+    # Keep config.font / config.button_font working without creating them at import time
+    if name == "font":
+        return get_font()
+    if name == "button_font":
+        return get_button_font()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
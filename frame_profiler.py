@@ -0,0 +1,135 @@
+"""
+Castle War Game - Frame Profiler
+Splits every frame of the game loop into phases (event handling, actions and
+AI, map, UI, text rendering, display update, HUD) and counts the surfaces it
+creates. Phases nest: time spent in an inner phase (e.g. text rendering
+inside the UI) is only counted for the inner one. Frame times exclude the
+scheduler's sleep between frames.
+
+Recent frames feed the in-game HUD (F3); with keep_trace every frame is kept
+and can be written to a JSON or CSV trace.
+"""
+
+import csv
+import json
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+PHASES = ("events", "actions", "map", "ui", "text", "flip", "hud")
+WINDOW = 600  # Frames behind the HUD statistics (10 s at 60 FPS)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+def _quantiles(values, quantiles=QUANTILES):
+    """Values at the given quantiles (nearest rank), zeros without values"""
+    values = sorted(values)
+    if not values:
+        return [0.0] * len(quantiles)
+    return [values[min(int(quantile * len(values)), len(values) - 1)] for quantile in quantiles]
+
+
+class FrameProfiler:
+    """Per-phase timings and counters of the frames of one game"""
+
+    def __init__(self, window=WINDOW, keep_trace=False):
+        self.visible = False  # HUD shown
+        self.frames = deque(maxlen=window)  # (total seconds, {phase: seconds}, {counter: count})
+        self.trace = [] if keep_trace else None
+        self.frame_count = 0
+        self._stack = []
+        self._times = dict.fromkeys(PHASES, 0.0)
+        self._counts = {}
+        self._frame_start = None
+        self._mark = 0.0
+
+    def begin_frame(self):
+        """Start timing a frame"""
+        self._frame_start = self._mark = time.perf_counter()
+        self._times = dict.fromkeys(PHASES, 0.0)
+        self._counts = {}
+
+    def end_frame(self):
+        """Finish the frame started by begin_frame and record it"""
+        if self._frame_start is None:
+            return
+        total = time.perf_counter() - self._frame_start
+        self.frames.append((total, self._times, self._counts))
+        if self.trace is not None:
+            self.trace.append((self._frame_start, total, self._times, self._counts))
+        self.frame_count += 1
+        self._frame_start = None
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block as the given phase, pausing the phase it is nested in"""
+        now = time.perf_counter()
+        if self._stack:
+            self._times[self._stack[-1]] += now - self._mark
+        self._stack.append(name)
+        self._mark = now
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._times[name] = self._times.get(name, 0.0) + now - self._mark
+            self._stack.pop()
+            self._mark = now
+
+    def count(self, name, amount=1):
+        """Add to a per-frame counter, e.g. "surfaces" for every surface created"""
+        self._counts[name] = self._counts.get(name, 0) + amount
+
+    def percentiles(self, quantiles=QUANTILES):
+        """Frame times in seconds at the given quantiles over the recent frames"""
+        return _quantiles((frame[0] for frame in self.frames), quantiles)
+
+    def phase_means(self):
+        """Mean seconds per frame of every phase over the recent frames"""
+        frames = max(len(self.frames), 1)
+        return {name: sum(frame[1].get(name, 0.0) for frame in self.frames) / frames for name in PHASES}
+
+    def hud_lines(self):
+        """Text lines of the HUD"""
+        p50, p95, p99 = (value * 1000 for value in self.percentiles())
+        means = self.phase_means()
+        surfaces = [frame[2].get("surfaces", 0) for frame in self.frames] or [0]
+        return [
+            f"frame ms  p50 {p50:.2f}  p95 {p95:.2f}  p99 {p99:.2f}  ({len(self.frames)} frames)",
+            "  ".join(f"{name} {means[name] * 1000:.2f}" for name in PHASES[:4]),
+            "  ".join(f"{name} {means[name] * 1000:.2f}" for name in PHASES[4:]),
+            f"surfaces/frame  mean {sum(surfaces) / len(surfaces):.1f}  max {max(surfaces)}",
+        ]
+
+    def dump(self, path):
+        """Write the kept trace to path, as CSV if it ends in .csv and JSON otherwise"""
+        counters = sorted({name for frame in self.trace or () for name in frame[3]})
+        rows = [dict([("frame", index), ("start", start), ("total_ms", total * 1000)]
+                     + [(f"{name}_ms", times.get(name, 0.0) * 1000) for name in PHASES]
+                     + [(name, counts.get(name, 0)) for name in counters])
+                for index, (start, total, times, counts) in enumerate(self.trace or ())]
+
+        if path.endswith(".csv"):
+            with open(path, "w", newline="") as file:
+                writer = csv.DictWriter(file, ["frame", "start", "total_ms"] + [f"{name}_ms" for name in PHASES]
+                                        + counters)
+                writer.writeheader()
+                writer.writerows(rows)
+        else:
+            p50, p95, p99 = _quantiles(row["total_ms"] for row in rows)
+            with open(path, "w") as file:
+                json.dump({"phases": list(PHASES), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "frames": rows},
+                          file)
+
+
+class _NoProfiler:
+    """Stands in for a FrameProfiler where nothing is measured"""
+
+    def phase(self, name):
+        return nullcontext()
+
+    def count(self, name, amount=1):
+        pass
+
+
+NO_PROFILER = _NoProfiler()
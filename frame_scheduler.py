@@ -0,0 +1,66 @@
+"""
+Castle War Game - Frame Scheduler
+Screens only need a new frame when an input event arrives, a deadline such
+as a message timeout passes, or something is animating. FrameScheduler runs
+at the full frame rate while a screen animates or shortly after input, and
+otherwise blocks in pygame.event.wait until the next event or deadline, so
+an idle screen uses almost no CPU and still answers input at once.
+"""
+
+import math
+import time
+
+import pygame
+
+FRAME_RATE = 60
+ACTIVE_PERIOD = 0.5  # Seconds of full frame rate after input, so drags and typing stay smooth
+
+
+class FrameScheduler:
+    """Decides when the next frame of a screen loop runs
+
+    Each frame, the loop calls animate() if it needs the next frame at full
+    rate and wake_at() for any deadline, then wait() for the next batch of
+    events.
+    """
+
+    def __init__(self, frame_rate=FRAME_RATE, active_period=ACTIVE_PERIOD):
+        self.frame_rate = frame_rate
+        self.active_period = active_period
+        self.clock = pygame.time.Clock()
+        self._animating = False
+        self._deadline = None
+        self._active_until = 0.0
+
+    def animate(self):
+        """Run the next frame at full frame rate"""
+        self._animating = True
+
+    def wake_at(self, deadline):
+        """Run the next frame no later than deadline, a time.monotonic() value (None is ignored)"""
+        if deadline is not None and (self._deadline is None or deadline < self._deadline):
+            self._deadline = deadline
+
+    def wait(self):
+        """Block until the next frame is due, returns the events that arrived meanwhile"""
+        animating, deadline = self._animating, self._deadline
+        self._animating = False
+        self._deadline = None
+
+        if animating or time.monotonic() < self._active_until:
+            self.clock.tick(self.frame_rate)
+            events = pygame.event.get()
+        else:
+            events = pygame.event.get()
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if not events and (remaining is None or remaining > 0):
+                # Blocks until an event or the deadline; a timeout of 0 means none, so deadlines wait 1 ms or more
+                timeout = 0 if remaining is None else max(math.ceil(remaining * 1000), 1)
+                event = pygame.event.wait(timeout)
+                if event.type != pygame.NOEVENT:  # NOEVENT: the deadline passed
+                    events = [event] + pygame.event.get()
+            self.clock.tick()
+
+        if events:
+            self._active_until = time.monotonic() + self.active_period
+        return events
@@ -1,13 +1,259 @@
+import atexit
 import csv
 import os
+import threading
 import time
 from datetime import datetime
 
+STATS_FILE = "game_stats.csv"  # Where the game records every finished game
+DATE_FORMAT = "%Y-%m-%d %H:%M"  # Format of the Date column, sorts chronologically as text
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")  # Stats files with these endings are SQLite databases
+COLUMNAR_SUFFIX = ".columns"  # Stats paths with this ending are directories of column files
+FLUSH_ROWS = 256  # Queued rows that trigger a write right away
+FLUSH_INTERVAL = 2.0  # Seconds a queued row waits at most before it is written
+
+STATS_HEADER = [
+    "Date", "Player1", "Player2", "Winner",
+    "BattleCount", "SoldiersCreated", "FarmersCreated",
+    "HeartsLostPlayer1", "HeartsLostPlayer2",
+    "GameDuration", "TurnCount", "AttackActions",
+    "HealActions", "DamageBoostActions", "CardActions"
+]
+TEXT_COLUMNS = ("Date", "Player1", "Player2", "Winner")
+REAL_COLUMNS = ("GameDuration",)  # The other columns are integers
+
+
+def is_sqlite_path(path):
+    """Whether path names a SQLite stats database rather than a CSV file"""
+    return path.endswith(SQLITE_SUFFIXES)
+
+
+def is_columnar_path(path):
+    """Whether path names a directory of column files rather than a CSV file"""
+    return path.rstrip("/\\").endswith(COLUMNAR_SUFFIX)
+
+
+class CsvStore:
+    """Stats rows appended to a CSV file with a header line"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def ensure_exists(self):
+        """Create the file with its header if it doesn't exist"""
+        if not os.path.exists(self.path):
+            self.append_rows([])
+
+    def append_rows(self, rows):
+        """Append rows in one write"""
+        new_file = not os.path.exists(self.path)
+        with open(self.path, 'a', newline='') as file:
+            writer = csv.writer(file)
+            if new_file:
+                writer.writerow(STATS_HEADER)
+            writer.writerows(rows)
+
+    def fingerprint(self):
+        """Changes whenever the file does: its size and modification time (None without a file)"""
+        if not os.path.exists(self.path):
+            return None
+        status = os.stat(self.path)
+        return f"{status.st_size}:{status.st_mtime_ns}"
+
+    def rows(self):
+        """Every stored game as a row in STATS_HEADER order, values as strings"""
+        with open(self.path, newline='') as file:
+            reader = csv.reader(file)
+            next(reader, None)
+            yield from reader
+
+    def load_dataframe(self, columns=None, since=None, until=None):
+        """Games as a pandas DataFrame, in recorded order
+
+        columns limits the columns parsed (all by default); since and until
+        keep games with since <= Date < until (DATE_FORMAT strings).
+        """
+        import pandas as pd  # Only the visualizer needs pandas
+
+        columns = list(columns or STATS_HEADER)
+        filtered = since is not None or until is not None
+        usecols = columns if not filtered or "Date" in columns else columns + ["Date"]
+        df = pd.read_csv(self.path, usecols=usecols)
+        if filtered:
+            keep = pd.Series(True, index=df.index)
+            if since is not None:
+                keep &= df["Date"] >= since
+            if until is not None:
+                keep &= df["Date"] < until
+            df = df[keep].reset_index(drop=True)
+        return df[columns]
+
+
+def open_store(path):
+    """The storage backend of a stats file
+
+    stats_db.SqliteStore for SQLite paths, stats_columnar.ColumnarStore for
+    .columns directories and CsvStore otherwise. Every store appends rows,
+    loads them back with the same load_dataframe arguments and has a
+    fingerprint() that changes when rows are appended.
+    """
+    # The other backends import sqlite3 or NumPy, so they are only imported when used
+    if is_sqlite_path(path):
+        from stats_db import SqliteStore
+
+        return SqliteStore(path)
+    if is_columnar_path(path):
+        from stats_columnar import ColumnarStore
+
+        return ColumnarStore(path)
+    return CsvStore(path)
+
+
+class StatsWriter:
+    """Appends rows to a stats file in batches from a background thread
+
+    add_rows only queues the rows; the thread hands them to the file's store
+    (see open_store) in one call once max_rows are queued or the oldest has
+    waited flush_interval seconds, and adds them to the running aggregates
+    sidecar (see stats_aggregates). flush() writes everything queued before
+    returning. Writers made by stats_writer() are flushed when the
+    interpreter exits, also after an unhandled exception, so at most
+    flush_interval seconds of rows are lost if the process is killed
+    outright.
+    """
+
+    def __init__(self, path, max_rows=FLUSH_ROWS, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.store = open_store(path)
+        self.max_rows = max_rows
+        self.flush_interval = flush_interval
+        self._rows = []
+        self._first_queued = None  # time.monotonic() when the oldest queued row was added
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()  # Keeps batches in order when flush() races the thread
+        self._thread = None
+        self._closed = False
+
+    def add_rows(self, rows):
+        """Queue rows to be appended to the file"""
+        with self._condition:
+            if not self._rows:
+                self._first_queued = time.monotonic()
+            self._rows.extend(rows)
+            closed = self._closed
+            if not closed and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stats-writer", daemon=True)
+                self._thread.start()
+            self._condition.notify()
+        if closed:
+            self.flush()  # After close() there is no thread left to write them
+
+    def flush(self):
+        """Write every queued row now"""
+        from stats_aggregates import aggregates_lock, read_aggregates
+
+        with self._write_lock:
+            with self._condition:
+                rows, self._rows = self._rows, []
+                self._first_queued = None
+            if not rows:
+                return
+            appended = False
+            try:
+                # The whole batch under the sidecar's lock, so writers in other processes don't lose counts
+                with aggregates_lock(self.path):
+                    # Read before appending: a sidecar rebuilt by scanning the file must not count these rows yet
+                    aggregates = read_aggregates(self.path, self.store)
+                    self.store.append_rows(rows)
+                    appended = True
+                    aggregates.add_rows(rows)
+                    aggregates.source = self.store.fingerprint()
+                    self._save_aggregates(aggregates)
+            except Exception:
+                if not appended:
+                    with self._condition:
+                        # Keep the rows for the next attempt, ahead of anything queued meanwhile
+                        self._rows[:0] = rows
+                        self._first_queued = time.monotonic()
+                raise
+
+    def _save_aggregates(self, aggregates):
+        from stats_aggregates import aggregates_path
+
+        try:
+            aggregates.save(aggregates_path(self.path))
+        except OSError as e:  # The rows are stored; the stale sidecar is rebuilt when next read
+            print(f"Error writing game stats aggregates of {self.path}: {e}")
+
+    def close(self):
+        """Stop the thread and write what is left; later rows are written synchronously"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _due(self):
+        return self._rows and (len(self._rows) >= self.max_rows
+                               or time.monotonic() >= self._first_queued + self.flush_interval)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._closed and not self._due():
+                    timeout = self._first_queued + self.flush_interval - time.monotonic() if self._rows else None
+                    self._condition.wait(timeout)
+                if self._closed:
+                    return  # close() writes the rest
+            try:
+                self.flush()
+            except Exception as e:  # Keep the thread alive, the rows are retried with the next batch
+                print(f"Error writing game stats to {self.path}: {e}")
+
+
+_writers = {}  # path -> the process-wide StatsWriter of that file
+_writers_lock = threading.Lock()
+
+
+def stats_writer(path):
+    """The StatsWriter shared by everything in this process that appends to path"""
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = StatsWriter(path)
+        return writer
+
+
+@atexit.register
+def close_stats_writers():
+    """Write every queued row of every file, called at interpreter exit"""
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        try:
+            writer.close()
+        except Exception as e:
+            print(f"Error writing game stats to {writer.path}: {e}")
+
+
+def _forget_writers():
+    # A forked child must not write the rows queued by its parent again, nor wait on a lock held at the fork
+    global _writers_lock
+    _writers.clear()
+    _writers_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_forget_writers)
+
 
 class GameStats:
-    def __init__(self):
-        self.stats_file = "game_stats.csv"
-        self.ensure_stats_file_exists()
+    def __init__(self, stats_file=STATS_FILE):
+        self.stats_file = stats_file  # None keeps stats in memory only, other backends by ending (see open_store)
+        self.writer = None
+        if self.stats_file:
+            self.writer = stats_writer(self.stats_file)
+            self.ensure_stats_file_exists()
 
         # Initialize counters for the current game
         self.reset_current_game_stats()
@@ -24,17 +270,8 @@ class GameStats:
         self.action_types = {"attack": 0, "heal": 0, "damage": 0, "play_card": 0}
 
     def ensure_stats_file_exists(self):
-        """Create the stats CSV file with headers if it doesn't exist"""
-        if not os.path.exists(self.stats_file):
-            with open(self.stats_file, 'w', newline='') as file:
-                writer = csv.writer(file)
-                writer.writerow([
-                    "Date", "Player1", "Player2", "Winner",
-                    "BattleCount", "SoldiersCreated", "FarmersCreated",
-                    "HeartsLostPlayer1", "HeartsLostPlayer2",
-                    "GameDuration", "TurnCount", "AttackActions",
-                    "HealActions", "DamageBoostActions", "CardActions"
-                ])
+        """Create the stats file (CSV with headers, or database) if it doesn't exist"""
+        self.writer.store.ensure_exists()
 
     def record_battle(self):
         """Increment battle counter"""
@@ -61,26 +298,38 @@ class GameStats:
         """Increment turn counter"""
         self.turn_count += 1
 
-    def save_game_stats(self, player1_name, player2_name, winner_name):
-        """Save all stats for the current game to CSV"""
+    def build_row(self, player1_name, player2_name, winner_name):
+        """Build the CSV row for the current game"""
         game_duration = time.time() - self.game_start_time
 
-        with open(self.stats_file, 'a', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow([
-                datetime.now().strftime("%Y-%m-%d %H:%M"),
-                player1_name,
-                player2_name,
-                winner_name,
-                self.battle_count,
-                self.soldiers_created,
-                self.farmers_created,
-                self.hearts_lost_player1,
-                self.hearts_lost_player2,
-                round(game_duration, 2),
-                self.turn_count,
-                self.action_types["attack"],
-                self.action_types["heal"],
-                self.action_types["damage"],
-                self.action_types["play_card"]
-            ])
\ No newline at end of file
+        return [
+            datetime.now().strftime(DATE_FORMAT),
+            player1_name,
+            player2_name,
+            winner_name,
+            self.battle_count,
+            self.soldiers_created,
+            self.farmers_created,
+            self.hearts_lost_player1,
+            self.hearts_lost_player2,
+            round(game_duration, 2),
+            self.turn_count,
+            self.action_types["attack"],
+            self.action_types["heal"],
+            self.action_types["damage"],
+            self.action_types["play_card"]
+        ]
+
+    def save_game_stats(self, player1_name, player2_name, winner_name):
+        """Save all stats for the current game to CSV (queued, see StatsWriter)"""
+        self.save_rows([self.build_row(player1_name, player2_name, winner_name)])
+
+    def save_rows(self, rows):
+        """Queue several already built rows for the CSV; written in batches by a background thread"""
+        if self.writer:
+            self.writer.add_rows(rows)
+
+    def flush(self):
+        """Write every queued row of the stats file now"""
+        if self.writer:
+            self.writer.flush()
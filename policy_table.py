@@ -0,0 +1,167 @@
+"""
+Castle War Game - Allocation Policy Table
+Offline dynamic programming over an abstract game without card draws: for
+every (round, player to move, own hearts, enemy hearts, own and enemy damage
+bonus buckets, enemy Counter Shield, enemy Trap Card) it stores the best
+allocation and action. The table is a flat NumPy file that the game opens
+with np.load(mmap_mode="r"), so a decision is an O(1) lookup and every game
+process on a host shares one page-cache copy.
+
+Rounds only move forward and population equals the round number, so values
+are computed backwards from MAX_ROUND, where positions are judged by the
+hearts difference. Shield and trap are only looked ahead one action; the
+rest of the game is valued without cards.
+
+Usage:
+    python policy_table.py    # (re)build policy_table.npy
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from rules_engine import ATTACK, HEAL, DAMAGE, MAX_HEARTS, allocation_percentages
+
+DEFAULT_TABLE_FILE = "policy_table.npy"
+MAX_ROUND = 30  # Later rounds use the decisions of this one
+
+# Lower edge of each damage bonus bucket; a bonus of MAX_HEARTS or more kills any castle
+BONUS_EDGES = np.array([0, 1, 2, 4, 7, 11, 16, 22, MAX_HEARTS])
+
+# Table entries: action code << 7 | soldier percentage
+ACTION_KINDS = (ATTACK, HEAL, DAMAGE)
+_ATTACK_CODE, _HEAL_CODE, _DAMAGE_CODE = range(3)
+
+
+def bonus_bucket(bonus):
+    """Bucket index of a damage bonus (works on arrays too)"""
+    return np.searchsorted(BONUS_EDGES, bonus, side="right") - 1
+
+
+def _value_after(next_values, second, own_hearts, enemy_hearts, own_bucket, enemy_bucket):
+    """Mover's value after its action, with the opponent to move next in next_values
+
+    next_values is indexed from the opponent's point of view. If both castles
+    fall, player2 wins, as in RulesEngine._check_victory.
+    """
+    own_index = np.clip(own_hearts, 1, MAX_HEARTS) - 1
+    enemy_index = np.clip(enemy_hearts, 1, MAX_HEARTS) - 1
+    value = 1.0 - next_values[enemy_index, own_index, enemy_bucket, own_bucket]
+    value = np.where(enemy_hearts <= 0, 1.0, value)
+    own_loses = (own_hearts <= 0) & ((enemy_hearts > 0) | (not second))
+    return np.where(own_loses, 0.0, value)
+
+
+def build_table():
+    """Run the backward induction, returns the uint16 decision table
+
+    Shape (MAX_ROUND + 1, 2, MAX_HEARTS, MAX_HEARTS, B, B, 2, 2) indexed by
+    [round, mover is player2, own hearts - 1, enemy hearts - 1, own bonus
+    bucket, enemy bonus bucket, enemy Counter Shield, enemy Trap Card].
+    """
+    buckets = len(BONUS_EDGES)
+    hearts = np.arange(1, MAX_HEARTS + 1)
+    own_hearts = hearts[:, None, None, None]
+    enemy_hearts = hearts[None, :, None, None]
+    own_bucket = np.arange(buckets)[None, None, :, None]
+    enemy_bucket = np.arange(buckets)[None, None, None, :]
+    own_bonus = BONUS_EDGES[own_bucket]
+    grid = (MAX_HEARTS, MAX_HEARTS, buckets, buckets)
+
+    values = np.zeros((MAX_ROUND + 2, 2) + grid, dtype=np.float32)
+    values[MAX_ROUND + 1] = np.broadcast_to(0.5 + 0.5 * np.tanh((own_hearts - enemy_hearts) / 20), grid)
+    table = np.zeros((MAX_ROUND + 1, 2) + grid + (2, 2), dtype=np.uint16)
+
+    for current_round in range(MAX_ROUND, 1, -1):
+        population = current_round
+        percentages = allocation_percentages(population)
+        for second in (True, False):
+            next_values = values[current_round + 1, 0] if second else values[current_round, 1]
+
+            def after(own, enemy, own_b=own_bucket):
+                return _value_after(next_values, second, own, enemy, own_b, enemy_bucket)
+
+            # Without cards, more hearts and more bonus never hurt: heal and boost with
+            # every farmer, attack with every soldier
+            heal = after(np.minimum(own_hearts + population, MAX_HEARTS), enemy_hearts)
+            damage = after(own_hearts, enemy_hearts, bonus_bucket(own_bonus + population))
+            attack = after(own_hearts, enemy_hearts - population - own_bonus)
+            plain = [(attack, _ATTACK_CODE << 7 | 100), (heal, _HEAL_CODE << 7), (damage, _DAMAGE_CODE << 7)]
+
+            # Against a Counter Shield or Trap Card the attack may want fewer soldiers
+            shielded = []
+            trapped = []
+            for soldiers, percentage in enumerate(percentages):
+                damage_dealt = soldiers + own_bonus
+                code = _ATTACK_CODE << 7 | percentage
+                shielded.append((after(own_hearts - damage_dealt // 2, enemy_hearts), code))
+                reduced = bonus_bucket(np.maximum(own_bonus - int(soldiers * 0.2), 0))
+                trapped.append((after(own_hearts - 10, enemy_hearts - damage_dealt, reduced), code))
+
+            for shield in (0, 1):
+                for trap in (0, 1):
+                    # Counter Shield takes precedence over the Trap Card
+                    attacks = shielded if shield else trapped if trap else plain[:1]
+                    candidates = attacks + plain[1:]
+                    stacked = np.stack([np.broadcast_to(value, grid) for value, _ in candidates])
+                    best = stacked.argmax(axis=0)
+                    codes = np.array([code for _, code in candidates], dtype=np.uint16)
+                    table[current_round, int(second), ..., shield, trap] = codes[best]
+                    if not shield and not trap:
+                        values[current_round, int(second)] = stacked.max(axis=0)
+
+    return table
+
+
+def save_table(table, path=DEFAULT_TABLE_FILE):
+    """Write the table as a flat .npy file, replacing path atomically
+
+    Processes that have the old table memory-mapped keep reading it; new
+    readers never see a partly written file.
+    """
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        np.save(file, table)
+    os.replace(temporary, path)
+
+
+def require_table(path=DEFAULT_TABLE_FILE):
+    """Raise FileNotFoundError, saying how to build it, if the table file is missing"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Policy table {path} not found, build it first with: python policy_table.py")
+
+
+def load_table(path=DEFAULT_TABLE_FILE):
+    """Memory-map the table read-only (it is built offline, see require_table)"""
+    require_table(path)
+    return np.load(path, mmap_mode="r")
+
+
+def table_action(table, state):
+    """(action kind, soldier percentage) from the table for the current player of a GameState"""
+    player = state.get_current_player()
+    enemy = state.get_opponent()
+    # Plain ints: NumPy would treat bools as masks
+    entry = int(table[min(state.current_round, MAX_ROUND), int(state.current_turn == "player2"),
+                      min(max(player.hearts, 1), MAX_HEARTS) - 1, min(max(enemy.hearts, 1), MAX_HEARTS) - 1,
+                      bonus_bucket(player.damage_bonus), bonus_bucket(enemy.damage_bonus),
+                      int(enemy.has_counter_shield), int(enemy.has_trap)])
+    return ACTION_KINDS[entry >> 7], entry & 0x7F
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the allocation policy table.")
+    parser.add_argument("--table-file", default=DEFAULT_TABLE_FILE, help="where to write the table")
+    args = parser.parse_args(argv)
+
+    start_time = time.perf_counter()
+    table = build_table()
+    save_table(table, args.table_file)
+    print(f"Wrote {args.table_file}: shape {table.shape}, {table.nbytes / 1e6:.1f} MB "
+          f"in {time.perf_counter() - start_time:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
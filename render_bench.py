@@ -0,0 +1,196 @@
+"""
+Castle War Game - Rendering Benchmark
+Draws the game screens headlessly (SDL dummy video driver) for a fixed
+number of frames per case and reports the median milliseconds per frame and
+the Python heap allocated per frame (tracemalloc peak; pixel buffers that
+SDL allocates are not included). Results are compared with a stored
+baseline, and any case slower or allocating more than the tolerance allows
+makes the run exit with status 1.
+
+Timings depend on the machine: refresh the baseline with --update-baseline
+on the box the numbers are compared on.
+
+Usage:
+    python render_bench.py                      # compare with render_baseline.json
+    python render_bench.py --update-baseline    # store this run as the baseline
+    python render_bench.py --frames 500 --case dashboard
+"""
+
+import os
+
+os.environ["SDL_VIDEODRIVER"] = "dummy"  # Before pygame is imported, so no display is needed
+
+import argparse
+import itertools
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+import pygame
+
+DEFAULT_BASELINE_FILE = "render_baseline.json"
+DEFAULT_FRAMES = 200
+WARMUP_FRAMES = 5  # Untimed frames per case, so first-use caches are filled
+TOLERANCE = 0.25  # Allowed slowdown or allocation growth over the baseline, as a fraction
+MS_SLACK = 0.05  # Allowed absolute slowdown in ms, so microsecond cases do not flap on timer noise
+ALLOC_SLACK_KIB = 1.0  # Allowed absolute allocation growth in KiB per frame
+HAND_SIZES = (0, 10, 50)
+
+
+def game_cases(screen):
+    """Cases drawing the battle screen through Game.draw, Map.draw and UIManager.draw_cards"""
+    from card_system import CARD_TYPES
+    from castle_game import Game
+
+    game = Game(screen, "Player", seed=1)  # Single player against the basic AI, which is never started
+    player = game.player1
+
+    def draw_full():
+        game.battle_scene.invalidate()
+        game.draw()
+
+    def draw_changed():
+        # Two widgets change every frame, as when a castle takes damage
+        player.hearts = 51 - player.hearts
+        game.draw()
+
+    cases = {
+        "game.draw/idle": game.draw,
+        "game.draw/changed": draw_changed,
+        "game.draw/full": draw_full,
+        "map.draw": lambda: game.map.draw(screen, game.player1, game.player2),
+    }
+    for size in HAND_SIZES:
+        hand = [index % len(CARD_TYPES) for index in range(size)]
+
+        def draw_cards(hand=hand):
+            del player.cards[:]
+            player.cards.extend(hand)
+            game.ui.draw_cards(screen, player)
+        cases[f"ui.draw_cards/{size}"] = draw_cards
+    return cases
+
+
+def dashboard_cases(screen):
+    """Cases drawing VisualizationDashboard.draw, one per category, cycling through every scroll position"""
+    from visualization_menu import VisualizationDashboard
+
+    dashboard = VisualizationDashboard(screen)
+    cases = {}
+    for category in dashboard.categories:
+        dashboard.active_category = category["name"]
+        dashboard.scroll_y = 0
+        dashboard.draw()  # Lays out the content, which sets max_scroll
+        positions = itertools.cycle(list(range(0, dashboard.max_scroll, dashboard.scroll_speed))
+                                    + [dashboard.max_scroll])
+
+        def draw(name=category["name"], positions=positions):
+            dashboard.active_category = name
+            dashboard.scroll_y = next(positions)
+            dashboard.draw()
+        cases[f"dashboard.draw/{category['name']}"] = draw
+    return cases
+
+
+def measure(draw, frames):
+    """Median ms per frame and mean KiB of Python heap allocated per frame"""
+    for _ in range(WARMUP_FRAMES):
+        draw()
+
+    times = []
+    for _ in range(frames):
+        start = time.perf_counter()
+        draw()
+        times.append(time.perf_counter() - start)
+
+    # Allocations in a separate pass: tracing would distort the timings
+    tracemalloc.start()
+    allocated = 0
+    for _ in range(frames):
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        draw()
+        allocated += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return statistics.median(times) * 1000, allocated / frames / 1024
+
+
+def run_benchmarks(frames, selected=None):
+    """Run every case whose name contains selected (all by default), returns {name: {ms, alloc_kib}}"""
+    from config import WIDTH, HEIGHT
+
+    pygame.display.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    cases = {**game_cases(screen), **dashboard_cases(screen)}
+
+    results = {}
+    for name, draw in cases.items():
+        if selected and selected not in name:
+            continue
+        ms, alloc_kib = measure(draw, frames)
+        results[name] = {"ms": round(ms, 4), "alloc_kib": round(alloc_kib, 2)}
+    pygame.quit()
+    return results
+
+
+def load_baseline(path):
+    """Stored results by case name, empty if there is no baseline yet"""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """Lines describing each result against the baseline, and whether any case regressed"""
+    lines = [f"{'case':34} {'ms/frame':>9} {'baseline':>9} {'KiB/frame':>10} {'baseline':>9}"]
+    regressed = False
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            lines.append(f"{name:34} {result['ms']:9.3f} {'-':>9} {result['alloc_kib']:10.1f} {'-':>9}  new")
+            continue
+        problems = []
+        if result["ms"] > base["ms"] * (1 + tolerance) + MS_SLACK:
+            problems.append(f"{result['ms'] / max(base['ms'], 1e-9):.2f}x slower")
+        if result["alloc_kib"] > base["alloc_kib"] * (1 + tolerance) + ALLOC_SLACK_KIB:
+            problems.append("allocates more")
+        regressed = regressed or bool(problems)
+        lines.append(f"{name:34} {result['ms']:9.3f} {base['ms']:9.3f} {result['alloc_kib']:10.1f} "
+                     f"{base['alloc_kib']:9.1f}  {'REGRESSION: ' + ', '.join(problems) if problems else 'ok'}")
+    return lines, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Castle War rendering headlessly against a baseline.")
+    parser.add_argument("--frames", type=int, default=DEFAULT_FRAMES, help="timed frames per case")
+    parser.add_argument("--case", default=None, help="only run cases whose name contains this text")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE_FILE, help="baseline file to compare with")
+    parser.add_argument("--update-baseline", action="store_true", help="store this run's results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="allowed slowdown or allocation growth over the baseline (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.frames, args.case)
+    baseline = load_baseline(args.baseline)
+    if args.update_baseline:
+        baseline.update(results)  # Cases not run this time (see --case) keep their stored numbers
+        with open(args.baseline, "w") as file:
+            json.dump(baseline, file, indent=2, sort_keys=True)
+            file.write("\n")
+        print(f"Stored {len(results)} cases in {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"No baseline at {args.baseline}, run with --update-baseline to store one")
+    lines, regressed = compare(results, baseline, args.tolerance)
+    print("\n".join(lines))
+    if regressed:
+        print("Rendering regressed against the baseline")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
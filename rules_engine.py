@@ -0,0 +1,489 @@
+"""
+Castle War Game - Rules Engine
+Pure-Python game rules with no pygame dependency. The GUI in castle_game.py
+drives this engine, and headless tools (AI-vs-AI simulation, balance work)
+use it directly without booting SDL or loading fonts.
+"""
+
+import random
+from collections import namedtuple
+from functools import lru_cache
+
+from card_system import CardSystem, CARD_TYPES, HEAL_CARD, STEAL_CARD, new_hand
+
+# Action kinds understood by RulesEngine.apply
+ATTACK = "attack"
+HEAL = "heal"
+DAMAGE = "damage"
+PLAY_CARD = "play_card"
+NEXT_TURN = "next_turn"
+
+STARTING_HEARTS = 20
+MAX_HEARTS = 30
+DEFAULT_SOLDIER_PERCENTAGE = 40  # Same default as the UI slider
+
+# An action for the current player. soldier_percentage is only used by the first
+# action of a round (it allocates the population); card_index picks the card to play.
+Action = namedtuple("Action", ["kind", "soldier_percentage", "card_index"])
+Action.__new__.__defaults__ = (None, None)
+
+END_TURN = Action(NEXT_TURN)
+
+
+class Player:
+    # Fixed layout: every field is declared, nothing is added at runtime
+    __slots__ = ("name", "population", "soldier_count", "farmer_count", "hearts", "color", "damage_bonus",
+                 "allocated_this_round", "cards", "has_counter_shield", "has_rebirth", "has_trap",
+                 "trap_duration", "double_draw", "lucky_boost")
+
+    def __init__(self, name, initial_population, color=None):
+        self.name = name
+        self.population = initial_population
+        self.soldier_count = 0
+        self.farmer_count = 0
+        self.hearts = STARTING_HEARTS
+        self.color = color
+        self.damage_bonus = 0
+        self.allocated_this_round = False  # Track if population has been allocated this round
+        # Card system attributes
+        self.cards = new_hand()  # Card ids of the player's hand (see card_system.CARD_TYPES)
+        self.has_counter_shield = False
+        self.has_rebirth = False
+        self.has_trap = False
+        self.trap_duration = 0
+        self.double_draw = False
+        self.lucky_boost = 0
+
+    def assign_population(self, soldier_count):
+        """Assign population between soldiers and farmers"""
+        if soldier_count > self.population:
+            soldier_count = self.population
+
+        self.soldier_count = soldier_count
+        self.farmer_count = self.population - soldier_count
+
+    def attack(self, opponent):
+        """Attack the opponent with soldiers"""
+        if self.soldier_count > 0:
+            # Calculate damage (1 per soldier + any damage bonus)
+            damage = self.soldier_count + self.damage_bonus  # Changed from multiplication to addition
+            opponent.hearts -= damage
+            if opponent.hearts < 0:
+                opponent.hearts = 0
+            return damage
+        return 0
+
+    def heal_soldiers(self):
+        """Use farmers to heal hearts"""
+        if self.farmer_count > 0:
+            healing = min(self.farmer_count, MAX_HEARTS - self.hearts)
+            self.hearts += healing
+            return healing
+        return 0
+
+    def increase_damage(self):
+        """Use farmers to increase attack damage"""
+        if self.farmer_count > 0:
+            bonus = 1 * self.farmer_count
+            self.damage_bonus += bonus
+            return bonus
+        return 0
+
+    def snapshot(self):
+        """Capture the mutable game state as an immutable tuple (name and color never change)"""
+        return (self.population, self.soldier_count, self.farmer_count, self.hearts, self.damage_bonus,
+                self.allocated_this_round, self.cards.tobytes(), self.has_counter_shield, self.has_rebirth,
+                self.has_trap, self.trap_duration, self.double_draw, self.lucky_boost)
+
+    def restore(self, snapshot):
+        """Return to a state captured by snapshot()"""
+        (self.population, self.soldier_count, self.farmer_count, self.hearts, self.damage_bonus,
+         self.allocated_this_round, cards, self.has_counter_shield, self.has_rebirth,
+         self.has_trap, self.trap_duration, self.double_draw, self.lucky_boost) = snapshot
+        self.cards = new_hand()
+        self.cards.frombytes(cards)
+
+
+# Use Player as the base class for Enemy instead of having a separate class
+class Enemy(Player):
+    """Enemy class that inherits from Player but can have AI behavior"""
+    __slots__ = ()
+
+    def __init__(self, name, initial_population, color=None):
+        super().__init__(name, initial_population, color)
+
+
+@lru_cache(maxsize=None)
+def allocation_percentages(population):
+    """Smallest slider percentage for each distinct soldier count of a population"""
+    percentages = {}
+    for percentage in range(101):
+        soldiers = int(population * percentage / 100)
+        if soldiers not in percentages:
+            percentages[soldiers] = percentage
+    return tuple(percentages.values())
+
+
+class GameState:
+    """Everything needed to continue a match, independent of any display"""
+    __slots__ = ("player1", "player2", "current_round", "current_turn", "action_taken", "game_over", "winner")
+
+    def __init__(self, player1, player2):
+        self.player1 = player1
+        self.player2 = player2
+        self.current_round = 1
+        self.current_turn = "player1"  # player1 or player2
+        self.action_taken = False  # Whether the current player has acted this turn
+        self.game_over = False
+        self.winner = None  # "player1" or "player2" once the game is over
+
+    def get_current_player(self):
+        """Return the current player based on turn"""
+        return self.player1 if self.current_turn == "player1" else self.player2
+
+    def get_opponent(self):
+        """Return the opponent of the current player"""
+        return self.player2 if self.current_turn == "player1" else self.player1
+
+    def snapshot(self):
+        """Capture the whole match state, e.g. before a search explores a move"""
+        return (self.player1.snapshot(), self.player2.snapshot(), self.current_round, self.current_turn,
+                self.action_taken, self.game_over, self.winner)
+
+    def restore(self, snapshot):
+        """Return to a state captured by snapshot()"""
+        (player1, player2, self.current_round, self.current_turn,
+         self.action_taken, self.game_over, self.winner) = snapshot
+        self.player1.restore(player1)
+        self.player2.restore(player2)
+
+
+class RulesEngine:
+    """Applies actions to a GameState following the Castle War rules
+
+    stats is an optional GameStats-like recorder, and on_message an optional
+    callback receiving human-readable event messages (only formatted when set).
+    log is an optional action_log.ActionLog recording every applied action.
+    """
+
+    def __init__(self, state, card_system=None, stats=None, on_message=None, log=None):
+        self.state = state
+        self.card_system = card_system or CardSystem(state.player1, state.player2)
+        self.stats = stats
+        self.on_message = on_message
+        self.log = log
+
+    def is_terminal(self):
+        """True once one of the castles has fallen"""
+        return self.state.game_over
+
+    def playable_cards(self, player=None, opponent=None):
+        """Indices of cards in the current player's hand that would take effect"""
+        state = self.state
+        player = player or state.get_current_player()
+        opponent = opponent or state.get_opponent()
+        return [index for index, card_id in enumerate(player.cards)
+                if self._card_usable(card_id, player, opponent)]
+
+    def legal_actions(self):
+        """List every action the current player may take right now"""
+        state = self.state
+        if state.game_over:
+            return []
+        if state.current_round == 1 or state.action_taken:
+            return [END_TURN]
+
+        player = state.get_current_player()
+        opponent = state.get_opponent()
+
+        # One card index per distinct card, playing duplicates is equivalent
+        card_indices = []
+        seen_ids = set()
+        for index in self.playable_cards(player, opponent):
+            card_id = player.cards[index]
+            if card_id not in seen_ids:
+                seen_ids.add(card_id)
+                card_indices.append(index)
+
+        if player.allocated_this_round:
+            percentages = (None,)
+        else:
+            percentages = allocation_percentages(player.population)
+
+        actions = []
+        for percentage in percentages:
+            actions.append(Action(ATTACK, percentage))
+            actions.append(Action(HEAL, percentage))
+            actions.append(Action(DAMAGE, percentage))
+            for index in card_indices:
+                actions.append(Action(PLAY_CARD, percentage, index))
+        return actions
+
+    def apply(self, action):
+        """Apply an action for the current player, returns True if it took effect"""
+        if self.log is None:
+            return self._apply(action)
+
+        card_id = None
+        if action.kind == PLAY_CARD:
+            cards = self.state.get_current_player().cards
+            if action.card_index is not None and 0 <= action.card_index < len(cards):
+                card_id = cards[action.card_index]
+        # Encoded first: an action the log cannot hold raises before it changes the state
+        word = self.log.encode(action, card_id)
+        result = self._apply(action)
+        if result:
+            self.log.append(word)
+        return result
+
+    def _apply(self, action):
+        state = self.state
+        if state.game_over:
+            return False
+
+        if self.stats:
+            self.stats.increment_turn()
+
+        if action.kind == NEXT_TURN:
+            return self._end_turn()
+
+        # Special case for first round, can only end turn
+        if state.current_round == 1:
+            self._message("First round - only end turn is allowed.")
+            return False
+        if state.action_taken:
+            return False
+
+        current_player = state.get_current_player()
+        opponent = state.get_opponent()
+
+        # Allocate population when first action is taken
+        if not current_player.allocated_this_round:
+            percentage = action.soldier_percentage
+            if percentage is None:
+                percentage = DEFAULT_SOLDIER_PERCENTAGE
+            current_player.assign_population(int(current_player.population * percentage / 100))
+            current_player.allocated_this_round = True
+
+            if self.stats:
+                self.stats.record_unit_allocation(current_player.soldier_count, current_player.farmer_count)
+
+        if action.kind == ATTACK:
+            self._attack(current_player, opponent)
+        elif action.kind == HEAL:
+            healing = current_player.heal_soldiers()
+            if self.stats:
+                self.stats.record_action("heal")
+            if self.on_message:
+                self._message(f"{current_player.name} healed {healing} hearts!")
+        elif action.kind == DAMAGE:
+            bonus = current_player.increase_damage()
+            if self.stats:
+                self.stats.record_action("damage")
+            if self.on_message:
+                self._message(f"{current_player.name} increased damage by {bonus:.1f}!")
+        elif action.kind == PLAY_CARD:
+            return self._play_card(current_player, opponent, action.card_index)
+        else:
+            raise ValueError(f"Unknown action: {action.kind}")
+
+        state.action_taken = True
+        return True
+
+    def _attack(self, current_player, opponent):
+        """Resolve an attack, including Counter Shield and Trap Card reactions"""
+        current_type = self.state.current_turn
+        opponent_type = "player2" if current_type == "player1" else "player1"
+
+        if self.stats:
+            self.stats.record_action("attack")
+            self.stats.record_battle()
+
+        damage_dealt = current_player.soldier_count + current_player.damage_bonus
+
+        # Check for counter shield
+        if opponent.has_counter_shield:
+            reflected_damage = int(damage_dealt * 0.5)
+            current_player.hearts -= reflected_damage
+            opponent.has_counter_shield = False  # Used up
+
+            if self.stats:
+                self.stats.record_hearts_lost(current_type, reflected_damage)
+            if self.on_message:
+                self._message(f"{current_player.name}'s attack was blocked by Counter Shield! "
+                              f"{reflected_damage} damage reflected back!")
+
+        # Check for trap card
+        elif opponent.has_trap:
+            trap_damage = 10
+            current_player.hearts -= trap_damage
+            current_player.damage_bonus -= int(current_player.soldier_count * 0.2)  # 20% less damage
+            if current_player.damage_bonus < 0:
+                current_player.damage_bonus = 0
+
+            # Apply damage to opponent
+            opponent.hearts -= damage_dealt
+
+            # Reset trap
+            opponent.has_trap = False
+
+            if self.stats:
+                self.stats.record_hearts_lost(current_type, trap_damage)
+                self.stats.record_hearts_lost(opponent_type, damage_dealt)
+            if self.on_message:
+                self._message(f"{current_player.name} attacked for {damage_dealt} damage but triggered a Trap Card!")
+                self._message(f"{current_player.name} took {trap_damage} damage and will deal less damage for 2 turns!")
+
+        else:
+            # Regular attack
+            opponent.hearts -= damage_dealt
+
+            if self.stats:
+                self.stats.record_hearts_lost(opponent_type, damage_dealt)
+            if self.on_message:
+                self._message(f"{current_player.name} attacked for {damage_dealt} damage!")
+
+        self._check_victory()
+
+    def _card_usable(self, card_id, player, opponent):
+        """Whether playing a card would have any effect right now"""
+        if card_id == HEAL_CARD:
+            return player.hearts < 20
+        if card_id == STEAL_CARD:
+            return bool(opponent.cards)
+        return True
+
+    def _play_card(self, current_player, opponent, card_index):
+        """Play a card from the current player's hand"""
+        if card_index is None or not 0 <= card_index < len(current_player.cards):
+            return False
+
+        card_id = current_player.cards[card_index]
+        if not self.card_system.use_card(card_id, current_player, opponent):
+            self._message("Card couldn't be used in the current situation.")
+            return False
+
+        # Remove card from player's hand
+        current_player.cards.pop(card_index)
+
+        if self.stats:
+            self.stats.record_action("play_card")
+        if self.on_message:
+            self._message(f"{current_player.name} used {CARD_TYPES[card_id].name}!")
+
+        self.state.action_taken = True
+        return True
+
+    def _end_turn(self):
+        """Pass the turn to the other player, starting a new round after player 2"""
+        state = self.state
+
+        # In rounds after first, require an action
+        if state.current_round > 1 and not state.action_taken:
+            self._message("You must take an action before ending your turn!")
+            return False
+
+        state.action_taken = False
+        if state.current_turn == "player1":
+            state.current_turn = "player2"
+        else:
+            self._prepare_next_round()
+
+        if state.current_round > 1:
+            self._process_turn_start()
+        return True
+
+    def _process_turn_start(self):
+        """Process turn start effects (Double Draw, Battle Chest and Endangered Mode)"""
+        player = self.state.get_current_player()
+        card_system = self.card_system
+
+        # Check for double draw effect
+        if player.double_draw:
+            for _ in range(2):
+                card_id = card_system.check_battle_chest(player)
+                if card_id is not None:
+                    player.cards.append(card_id)
+                    if self.on_message:
+                        self._message(f"{player.name} drew {CARD_TYPES[card_id].name} from Double Draw effect!")
+
+            # Reset double draw
+            player.double_draw = False
+
+        # Check Battle Chest (10% chance)
+        card_id = card_system.check_battle_chest(player)
+        if card_id is not None:
+            player.cards.append(card_id)
+            if self.on_message:
+                self._message(f"{player.name} drew {CARD_TYPES[card_id].name} from Battle Chest!")
+
+        # Check Endangered Mode
+        if player.hearts < 10:
+            card_id = card_system.check_endangered_mode(player)
+            if card_id is not None:
+                player.cards.append(card_id)
+                if self.on_message:
+                    self._message(f"{player.name} is in danger! Drew {CARD_TYPES[card_id].name} "
+                                  f"from Endangered Mode!")
+
+    def _check_victory(self):
+        """Check if either player has won, applying Rebirth Cards first"""
+        state = self.state
+        for player in (state.player1, state.player2):
+            if player.hearts <= 0 and player.has_rebirth:
+                player.hearts = 10
+                player.has_rebirth = False
+                if self.on_message:
+                    self._message(f"{player.name} was revived by Rebirth Card with 10 hearts!")
+
+        if state.player1.hearts <= 0:
+            state.game_over = True
+            state.winner = "player2"
+        elif state.player2.hearts <= 0:
+            state.game_over = True
+            state.winner = "player1"
+        else:
+            return
+
+        if self.on_message:
+            winner = state.player2 if state.winner == "player2" else state.player1
+            loser = state.player1 if state.winner == "player2" else state.player2
+            self._message(f"Game Over! {winner.name} has defeated {loser.name}!")
+
+    def _prepare_next_round(self):
+        """Prepare for the next round"""
+        state = self.state
+        state.current_round += 1
+        state.current_turn = "player1"
+
+        for player in (state.player1, state.player2):
+            # Population matches the round number: Round 2 = 2 population, Round 3 = 3, etc.
+            player.population = state.current_round
+            # Reset allocation tracking
+            player.allocated_this_round = False
+            # Update lucky charm counter
+            if player.lucky_boost > 0:
+                player.lucky_boost -= 1
+
+        if self.on_message:
+            self._message(f"Round {state.current_round} - {state.player1.name}'s turn! "
+                          f"Allocate your new population.")
+
+    def _message(self, text):
+        if self.on_message:
+            self.on_message(text)
+
+
+def new_match(player1_name, player2_name=None, player1_color=None, player2_color=None, stats=None,
+              on_message=None, rng=None, log=None):
+    """Create a RulesEngine for a fresh match (no player2_name means an AI Enemy)
+
+    rng is the random.Random used for every card draw of this match.
+    """
+    player1 = Player(player1_name, 1, player1_color)
+    if player2_name:
+        player2 = Player(player2_name, 1, player2_color)
+    else:
+        player2 = Enemy("Enemy Castle", 1, player2_color)
+    card_system = CardSystem(player1, player2, rng=rng or random.Random())
+    return RulesEngine(GameState(player1, player2), card_system, stats=stats, on_message=on_message, log=log)
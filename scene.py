@@ -0,0 +1,82 @@
+"""
+Castle War Game - Retained Scene
+A screen is a pre-composited background with widgets on top. Every widget
+owns a fixed rectangle and a key function returning everything it shows, so
+a frame only repaints the rectangles whose key changed and hands just those
+to pygame.display.update. A screen where nothing happens costs one key
+comparison per widget and no drawing at all.
+"""
+
+import pygame
+
+from frame_profiler import NO_PROFILER
+
+_NOT_SHOWN = object()  # Key of a widget that has not been drawn yet
+
+
+class Widget:
+    """A region of the screen, what it shows and how to draw it
+
+    key() returns a comparable value covering everything draw(screen)
+    depends on; draw must stay inside rect (it is clipped to it). Drawing
+    time is profiled as phase.
+    """
+
+    def __init__(self, rect, key, draw, phase="ui"):
+        self.rect = pygame.Rect(rect)
+        self.key = key
+        self.draw = draw
+        self.phase = phase
+        self.shown = _NOT_SHOWN
+
+
+class Scene:
+    """Widgets drawn in order over a background surface the size of the screen
+
+    Drawing is timed on profiler (a frame_profiler.FrameProfiler): the
+    background as "map", the widgets by their phase and the display update
+    as "flip".
+    """
+
+    def __init__(self, screen, background, widgets, profiler=NO_PROFILER):
+        self.screen = screen
+        self.background = background
+        self.widgets = widgets
+        self.profiler = profiler
+        self._full_redraw = True
+
+    def invalidate(self):
+        """Repaint the whole screen on the next render, e.g. after another scene was shown"""
+        self._full_redraw = True
+
+    def render(self):
+        """Repaint every widget whose key changed, returns the rectangles sent to the display"""
+        dirty = []
+        for widget in self.widgets:
+            key = widget.key()
+            if key != widget.shown:
+                widget.shown = key
+                dirty.append(widget.rect)
+        if self._full_redraw:
+            self._full_redraw = False
+            dirty = [self.screen.get_rect()]
+        if not dirty:
+            return dirty
+
+        # Each rectangle is rebuilt from the background up, so overlapping widgets stay in order
+        screen = self.screen
+        phase = self.profiler.phase
+        for rect in dirty:
+            screen.set_clip(rect)
+            with phase("map"):
+                screen.blit(self.background, rect, rect)
+            for widget in self.widgets:
+                area = rect.clip(widget.rect)
+                if area.width and area.height:
+                    screen.set_clip(area)
+                    with phase(widget.phase):
+                        widget.draw(screen)
+        screen.set_clip(None)
+        with phase("flip"):
+            pygame.display.update(dirty)
+        return dirty
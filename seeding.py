@@ -0,0 +1,27 @@
+"""
+Castle War Game - Seed Derivation
+Every random decision in a match comes from an RNG owned by that match. The
+seeds are derived from one master seed and a path such as (game_index, "cards"),
+so a game's streams depend only on its index and not on which worker played it,
+and any single game of a large batch can be replayed on its own.
+"""
+
+import hashlib
+import os
+import random
+
+
+def new_master_seed():
+    """Pick a fresh 64-bit master seed (print it so the run can be reproduced)"""
+    return int.from_bytes(os.urandom(8), "little")
+
+
+def derive_seed(master_seed, *path):
+    """Derive an independent 64-bit seed for the stream named by path"""
+    key = repr((master_seed,) + path).encode()
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+def derive_rng(master_seed, *path):
+    """A random.Random seeded for the stream named by path"""
+    return random.Random(derive_seed(master_seed, *path))
@@ -0,0 +1,264 @@
+"""
+Castle War Game - Match Simulator
+Plays many complete AI-vs-AI matches headlessly across a process pool and
+streams aggregate results to stdout and to a stats CSV.
+
+Usage:
+    python simulate.py --games 100000 --policy1 basic --policy2 basic
+    python simulate.py --seed 1234 --replay 40217    # replay one game of that run
+    python simulate.py --games 1000 --log-file runs.bin  # archive every action for action_log.replay
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from action_log import ActionLog, append_logs
+from ai_policy import POLICIES, play_match, search_in_process, shutdown_search_pool
+from game_stats import GameStats
+from rules_engine import new_match
+from seeding import new_master_seed, derive_seed, derive_rng
+
+DEFAULT_STATS_FILE = "simulation_stats.csv"
+
+
+class SimulationSummary:
+    """Running totals over a batch of simulated matches"""
+
+    def __init__(self):
+        self.games = 0
+        self.player1_wins = 0
+        self.player2_wins = 0
+        self.draws = 0
+        self.total_rounds = 0
+        self.hearts_lost_player1 = 0
+        self.hearts_lost_player2 = 0
+        self.cards_played = 0
+
+    def add_game(self, engine, stats):
+        """Add one finished match"""
+        state = engine.state
+        self.games += 1
+        if state.winner == "player1":
+            self.player1_wins += 1
+        elif state.winner == "player2":
+            self.player2_wins += 1
+        else:
+            self.draws += 1
+        # Rounds played: a match stopped at max_rounds has already moved on to the next round
+        self.total_rounds += state.current_round if state.game_over else state.current_round - 1
+        self.hearts_lost_player1 += stats.hearts_lost_player1
+        self.hearts_lost_player2 += stats.hearts_lost_player2
+        self.cards_played += stats.action_types["play_card"]
+
+    def merge(self, other):
+        """Fold another summary (e.g. from a worker) into this one"""
+        for name, value in vars(other).items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def format(self):
+        """One-line human readable summary"""
+        games = max(self.games, 1)
+        return (f"games={self.games} "
+                f"p1_win={self.player1_wins / games:.3f} "
+                f"p2_win={self.player2_wins / games:.3f} "
+                f"draws={self.draws / games:.3f} "
+                f"mean_rounds={self.total_rounds / games:.2f} "
+                f"hearts_lost_p1={self.hearts_lost_player1 / games:.2f} "
+                f"hearts_lost_p2={self.hearts_lost_player2 / games:.2f} "
+                f"cards_per_game={self.cards_played / games:.2f}")
+
+
+def player_names(policy1_name, policy2_name):
+    """Names recorded for the two simulated players"""
+    return f"AI {policy1_name} (P1)", f"AI {policy2_name} (P2)"
+
+
+def play_seeded_match(master_seed, game_index, policy1_name, policy2_name, max_rounds, stats=None,
+                      on_message=None, record=False):
+    """Play game number game_index of a run; the result depends only on these arguments
+
+    With record set, engine.log holds the ActionLog of the match.
+    """
+    player1_name, player2_name = player_names(policy1_name, policy2_name)
+    card_seed = derive_seed(master_seed, game_index, "cards")
+    log = ActionLog(card_seed, player1_name, player2_name) if record else None
+    engine = new_match(player1_name, player2_name, stats=stats, on_message=on_message,
+                       rng=random.Random(card_seed), log=log)
+    policy1 = POLICIES[policy1_name](derive_rng(master_seed, game_index, "player1"))
+    policy2 = POLICIES[policy2_name](derive_rng(master_seed, game_index, "player2"))
+    play_match(engine, policy1, policy2, max_rounds)
+    return engine
+
+
+def simulate_chunk(policy1_name, policy2_name, master_seed, first_game, num_games, max_rounds, collect_rows,
+                   collect_logs=False):
+    """Worker entry point: play games first_game.. of a run
+
+    Returns the summary, the CSV rows and the serialised action logs.
+    """
+    player1_name, player2_name = player_names(policy1_name, policy2_name)
+
+    # Stats are only recorded in memory here, the parent process writes the rows
+    stats = GameStats(None)
+    summary = SimulationSummary()
+    rows = []
+    logs = []
+
+    try:
+        for game_index in range(first_game, first_game + num_games):
+            stats.reset_current_game_stats()
+            engine = play_seeded_match(master_seed, game_index, policy1_name, policy2_name, max_rounds, stats,
+                                       record=collect_logs)
+            summary.add_game(engine, stats)
+            if collect_logs:
+                logs.append(engine.log.to_bytes())
+
+            if collect_rows:
+                winner = engine.state.winner
+                winner_name = player1_name if winner == "player1" else player2_name if winner == "player2" else "Draw"
+                rows.append(stats.build_row(player1_name, player2_name, winner_name))
+    finally:
+        # Search policies may have started their own pool inside this worker
+        shutdown_search_pool()
+
+    return summary, rows, logs
+
+
+def simulate_batch_chunk(master_seed, first_game, num_games, max_rounds):
+    """Worker entry point for basic-vs-basic matches on the vectorised batch engine
+
+    The games of a batch share one NumPy stream, so they are reproducible per
+    chunk rather than individually.
+    """
+    import numpy as np  # NumPy is only needed for vectorised runs
+    from batch_engine import BatchGames
+
+    rng = np.random.default_rng(derive_seed(master_seed, "batch", first_game))
+    batch = BatchGames(num_games, rng, max_rounds=max_rounds).run()
+    summary = SimulationSummary()
+    summary.games = num_games
+    summary.player1_wins = int((batch.winner == 0).sum())
+    summary.player2_wins = int((batch.winner == 1).sum())
+    summary.draws = int((batch.winner == -1).sum())
+    summary.total_rounds = int(batch.rounds.sum())
+    summary.hearts_lost_player1 = int(batch.total_hearts_lost[0].sum())
+    summary.hearts_lost_player2 = int(batch.total_hearts_lost[1].sum())
+    summary.cards_played = int(batch.total_cards_played.sum())
+    return summary, [], []
+
+
+def run_simulation(num_games, policy1_name="basic", policy2_name="basic", workers=None, chunk_size=1000,
+                   max_rounds=200, stats_file=DEFAULT_STATS_FILE, vectorized=False, seed=None, log_file=None,
+                   out=sys.stdout):
+    """Play num_games matches across a process pool, streaming progress to out
+
+    Game i of the run is seeded from (seed, i), see play_seeded_match.
+    vectorized plays basic-vs-basic matches on the NumPy batch engine; it records
+    aggregates only, no per-game rows.
+    log_file appends the ActionLog of every game to an action log archive.
+    """
+    if vectorized and (policy1_name, policy2_name) != ("basic", "basic"):
+        raise ValueError("Vectorised simulation only supports the basic policy")
+    if vectorized and log_file:
+        raise ValueError("Vectorised simulation does not record action logs")
+
+    workers = workers or os.cpu_count() or 1
+    store = GameStats(stats_file) if stats_file and not vectorized else None
+    summary = SimulationSummary()
+    master_seed = new_master_seed() if seed is None else seed
+    print(f"master_seed={master_seed}", file=out, flush=True)
+    start_time = time.perf_counter()
+
+    next_game = 0
+    remaining = num_games
+    with ProcessPoolExecutor(max_workers=workers, initializer=search_in_process) as executor:
+        pending = set()
+        while remaining > 0 or pending:
+            # Keep a bounded number of chunks in flight so memory stays flat for huge runs
+            while remaining > 0 and len(pending) < workers * 2:
+                size = min(chunk_size, remaining)
+                if vectorized:
+                    pending.add(executor.submit(simulate_batch_chunk, master_seed, next_game, size, max_rounds))
+                else:
+                    pending.add(executor.submit(simulate_chunk, policy1_name, policy2_name, master_seed, next_game,
+                                                size, max_rounds, store is not None, bool(log_file)))
+                next_game += size
+                remaining -= size
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk_summary, rows, logs = future.result()
+                summary.merge(chunk_summary)
+                if store and rows:
+                    store.save_rows(rows)
+                if logs:
+                    append_logs(log_file, logs)
+
+            elapsed = time.perf_counter() - start_time
+            print(f"{summary.format()} games_per_sec={summary.games / elapsed:.0f}", file=out, flush=True)
+
+    if store:
+        store.flush()  # Rows are written in batches in the background, the file is complete once this returns
+    return summary
+
+
+def replay_game(master_seed, game_index, policy1_name="basic", policy2_name="basic", max_rounds=200,
+                out=sys.stdout):
+    """Replay a single game of a run, printing every event"""
+    stats = GameStats(None)
+    engine = play_seeded_match(master_seed, game_index, policy1_name, policy2_name, max_rounds, stats,
+                               on_message=lambda text: print(text, file=out))
+    print(f"Winner: {engine.state.winner} after {engine.state.current_round} rounds, "
+          f"hearts {engine.state.player1.hearts}/{engine.state.player2.hearts}", file=out)
+    return engine
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate Castle War matches between two AI policies.")
+    parser.add_argument("--games", type=int, default=10000, help="number of matches to play")
+    parser.add_argument("--policy1", choices=sorted(POLICIES), default="basic", help="policy for player 1")
+    parser.add_argument("--policy2", choices=sorted(POLICIES), default="basic", help="policy for player 2")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="matches per worker task")
+    parser.add_argument("--max-rounds", type=int, default=200, help="rounds before a match is called a draw")
+    parser.add_argument("--stats-file", default=DEFAULT_STATS_FILE,
+                        help="CSV to append per-game rows to (empty string to disable)")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="use the NumPy batch engine (basic policies only, no per-game rows)")
+    parser.add_argument("--seed", type=int, default=None, help="master seed (default: fresh, printed at start)")
+    parser.add_argument("--replay", type=int, metavar="GAME_INDEX", default=None,
+                        help="replay one game of the run given by --seed and print its events")
+    parser.add_argument("--log-file", default=None, help="append the action log of every game to this archive")
+    args = parser.parse_args(argv)
+
+    if "table" in (args.policy1, args.policy2):
+        from policy_table import require_table
+
+        try:
+            require_table()  # Before any worker starts, so each does not fail on its own
+        except FileNotFoundError as error:
+            parser.error(str(error))
+
+    if args.replay is not None:
+        if args.seed is None:
+            parser.error("--replay needs the --seed of the run")
+        replay_game(args.seed, args.replay, args.policy1, args.policy2, args.max_rounds)
+        return
+
+    if args.vectorized and (args.policy1, args.policy2) != ("basic", "basic"):
+        parser.error("--vectorized only supports the basic policy")
+    if args.vectorized and args.log_file:
+        parser.error("--vectorized does not record action logs")
+
+    summary = run_simulation(args.games, args.policy1, args.policy2, args.workers, args.chunk_size,
+                             args.max_rounds, args.stats_file or None, args.vectorized, args.seed,
+                             args.log_file)
+    print(f"Done: {summary.format()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,414 @@
+"""
+Castle War Game - Expectimax Solver
+Depth-limited expectiminimax over the rules engine: player1 maximises and
+player2 minimises player1's chance of winning, and turn starts, steals and
+Endangered Mode are chance nodes weighted with the real card probabilities.
+Values are memoised in a transposition table keyed by a packed state, and a
+value whose subtree ends in finished games everywhere is exact: the win
+probability under perfect play. The table is appended to a file, so positions
+solved once are answered instantly later (see ai_policy.PerfectPolicy).
+
+Usage:
+    python solver.py --games 50 --depth 2    # grow the table by solving self-play positions
+"""
+
+import argparse
+import os
+import random
+import struct
+import time
+
+from action_log import encode_action, decode_action
+from ai_policy import BasicPolicy, heuristic_value
+from card_system import CardSystem, BATTLE_CHEST_CHANCE
+from rules_engine import END_TURN, NEXT_TURN, PLAY_CARD, new_match
+
+DEFAULT_TABLE_FILE = "solver_table.bin"
+
+# Table file records: key length, value, depth, exact flag, best move, then the key
+_RECORD = struct.Struct("<HdBBI")
+_PLAYER_KEY = struct.Struct("<iIIBBBBBB")
+_KEY_HEADER = struct.Struct("<HBB")
+_ALLOCATION_KEY = struct.Struct("<BII")
+_HAND_LENGTH = struct.Struct("<I")
+EXACT_DEPTH = 255  # Depth stored for exact values, valid at any search depth
+
+
+def state_key(state):
+    """Pack everything that can still affect the game into bytes
+
+    Soldier and farmer counts only matter to the player who has allocated and
+    not yet acted, and hand order never matters, so both are normalised and
+    equivalent positions share one table entry.
+    """
+    mover = state.get_current_player()
+    parts = [_KEY_HEADER.pack(state.current_round, state.current_turn == "player2", state.action_taken)]
+    for player in (state.player1, state.player2):
+        allocated = player is mover and player.allocated_this_round and not state.action_taken
+        parts.append(_PLAYER_KEY.pack(player.hearts, player.population, player.damage_bonus,
+                                      player.has_counter_shield, player.has_rebirth, player.has_trap,
+                                      player.trap_duration, player.double_draw, min(player.lucky_boost, 255)))
+        parts.append(_ALLOCATION_KEY.pack(allocated, player.soldier_count if allocated else 0,
+                                          player.farmer_count if allocated else 0))
+        parts.append(_HAND_LENGTH.pack(len(player.cards)) + bytes(sorted(player.cards)))
+    return b"".join(parts)
+
+
+def _is_state_key(key):
+    """Whether bytes have the layout state_key() produces, used to reject damaged table records"""
+    offset = _KEY_HEADER.size
+    for _ in range(2):
+        offset += _PLAYER_KEY.size + _ALLOCATION_KEY.size
+        if offset + _HAND_LENGTH.size > len(key):
+            return False
+        offset += _HAND_LENGTH.size + _HAND_LENGTH.unpack_from(key, offset)[0]
+    return offset == len(key)
+
+
+class _ChanceEvent(Exception):
+    """Raised when a move reaches a random event that has no scripted outcome yet"""
+
+    def __init__(self, outcomes):
+        super().__init__()
+        self.outcomes = outcomes  # {outcome: probability}
+
+
+class _ChanceCardSystem(CardSystem):
+    """CardSystem whose random events take their outcomes from a script
+
+    When the script runs out the event raises _ChanceEvent with its outcome
+    distribution, so the solver can enumerate every outcome of a move. With
+    script None every event takes its most likely outcome.
+    """
+
+    script = ()
+    position = 0
+
+    def _outcome(self, outcomes):
+        if self.script is None:
+            distribution = outcomes()
+            return max(distribution, key=distribution.get)
+        if self.position < len(self.script):
+            self.position += 1
+            return self.script[self.position - 1]
+        raise _ChanceEvent(outcomes())
+
+    def check_battle_chest(self, player):
+        def outcomes():
+            draws = {card_id: BATTLE_CHEST_CHANCE * p for card_id, p in
+                     self.sampler.distribution(player.lucky_boost).items()}
+            draws[None] = draws.get(None, 0.0) + 1 - BATTLE_CHEST_CHANCE
+            return draws
+        return self._outcome(outcomes)
+
+    def check_endangered_mode(self, player):
+        if player.hearts >= 10:
+            return None
+        card_count = len(self.sampler.card_names)
+        return self._outcome(lambda: {card_id: 1 / card_count for card_id in range(card_count)})
+
+    def effect_steal_card(self, player, opponent):
+        cards = opponent.cards
+        if not cards:
+            return False
+
+        def outcomes():
+            return {card_id: cards.count(card_id) / len(cards) for card_id in set(cards)}
+        stolen_card = self._outcome(outcomes)
+        cards.remove(stolen_card)
+        player.cards.append(stolen_card)
+        return True
+
+
+class SolverTimeout(Exception):
+    """The deadline passed in the middle of a search"""
+
+
+class ExpectimaxSolver:
+    """Expectiminimax with a persistent transposition table
+
+    table maps state_key() to (value, depth, best move word), where value is
+    player1's win probability searched depth moves deep (EXACT_DEPTH when it
+    is exact) and the move is encoded with action_log.encode_action.
+    """
+
+    def __init__(self, table_file=DEFAULT_TABLE_FILE):
+        self.table_file = table_file
+        self.table = {}
+        self._unsaved = []
+        self._deadline = None
+        if table_file and os.path.exists(table_file):
+            self.load()
+
+    def load(self):
+        """Read the table file, later records replace earlier ones
+
+        Reading stops at the first record that does not make sense (a value
+        outside [0, 1], a key of the wrong layout, a record cut short), as
+        nothing after it can be trusted to start at a record boundary.
+        """
+        with open(self.table_file, "rb") as file:
+            data = file.read()
+        offset = 0
+        while offset + _RECORD.size <= len(data):
+            key_length, value, depth, exact, move = _RECORD.unpack_from(data, offset)
+            key = data[offset + _RECORD.size:offset + _RECORD.size + key_length]
+            if not (0.0 <= value <= 1.0 and exact == (depth == EXACT_DEPTH) and len(key) == key_length
+                    and _is_state_key(key)):
+                break
+            self.table[key] = (value, depth, move)
+            offset += _RECORD.size + key_length
+        if offset < len(data):
+            print(f"Ignoring the last {len(data) - offset} bytes of {self.table_file} from byte {offset}: "
+                  f"not a valid record (delete the file to start a new table)")
+
+    def save(self):
+        """Append the entries added since the last save to the table file
+
+        The records go out in a single write to a file opened for appending,
+        so records of solvers saving from other processes never interleave
+        with them.
+        """
+        if not self.table_file or not self._unsaved:
+            return
+        records = []
+        for key in self._unsaved:
+            value, depth, move = self.table[key]
+            records.append(_RECORD.pack(len(key), value, depth, depth == EXACT_DEPTH, move) + key)
+        data = b"".join(records)
+        descriptor = os.open(self.table_file, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0),
+                             0o644)
+        try:
+            written = os.write(descriptor, data)
+        finally:
+            os.close(descriptor)
+        if written != len(data):
+            raise OSError(f"Short write to {self.table_file}: {written} of {len(data)} bytes")
+        self._unsaved = []
+
+    def lookup(self, engine, min_depth=0):
+        """Table entry (value, depth, move) of the engine's position if searched at least min_depth deep"""
+        entry = self.table.get(state_key(engine.state))
+        if entry is not None and entry[1] >= min_depth:
+            return entry
+        return None
+
+    def best_action(self, engine, depth, seconds=None):
+        """Best action for the current player: from the table, else by iterative deepening
+
+        With seconds set the search deepens until depth or the time budget is
+        reached, whichever comes first; depth 1 always completes.
+        """
+        state = engine.state
+        if state.current_round == 1 or state.action_taken:
+            return END_TURN
+
+        entry = self.lookup(engine, depth)
+        if entry is None:
+            self.solve(engine, 1)
+            deadline = None if seconds is None else time.perf_counter() + seconds
+            for search_depth in range(2, depth + 1):
+                try:
+                    self.solve(engine, search_depth, deadline)
+                except SolverTimeout:
+                    break
+            entry = self.lookup(engine)
+        return self._to_action(entry[2], state.get_current_player())
+
+    def solve(self, engine, depth, deadline=None):
+        """Player1's win probability with depth moves of lookahead, filling the table"""
+        solver_engine = new_match(engine.state.player1.name, engine.state.player2.name)
+        state = solver_engine.state
+        state.restore(engine.state.snapshot())
+        solver_engine.card_system = _ChanceCardSystem(state.player1, state.player2)
+        self._deadline = deadline
+        try:
+            return self._value(solver_engine, depth)[0]
+        finally:
+            self._deadline = None
+            self.save()
+
+    def _value(self, engine, depth, alpha=0.0, beta=1.0):
+        """Returns (value, exact) of the engine's position, leaving the state unchanged
+
+        Alpha-beta search: a value at or below alpha is only an upper bound and
+        one at or above beta a lower bound. exact means no heuristic was used.
+        """
+        state = engine.state
+        if state.game_over:
+            return heuristic_value(state), True
+
+        key = state_key(state)
+        entry = self.table.get(key)
+        if entry is not None and entry[1] >= depth:
+            return entry[0], entry[1] == EXACT_DEPTH
+        if depth == 0:
+            return heuristic_value(state), False
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise SolverTimeout()
+
+        snapshot = state.snapshot()
+        player = state.get_current_player()
+        maximising = state.current_turn == "player1"
+        actions = engine.legal_actions() if depth == 1 else self._distinct_actions(engine, snapshot)
+        if entry is not None:
+            # Try the best move of a shallower search first, for earlier cutoffs
+            actions.sort(key=lambda action: self._encode(action, player) != entry[2])
+
+        best_value = best_move = None
+        exact = True
+        for action in actions:
+            window_alpha, window_beta = alpha, beta
+            if best_value is not None:
+                if maximising:
+                    window_alpha = max(alpha, best_value)
+                else:
+                    window_beta = min(beta, best_value)
+
+            if depth == 1:
+                # Card draws never change hearts or end the game, so every outcome of
+                # the last move has the same heuristic value: skip enumerating them
+                value, move_exact = self._leaf_value(engine, action, snapshot)
+            else:
+                outcomes = self._outcomes(engine, action, snapshot)
+                value, move_exact = self._chance_value(engine, outcomes, depth - 1, window_alpha, window_beta)
+            state.restore(snapshot)
+            exact = exact and move_exact
+
+            if best_value is None or (value > best_value if maximising else value < best_value):
+                best_value = value
+                best_move = self._encode(action, player)
+            if best_value >= beta if maximising else best_value <= alpha:
+                break
+
+        # Bounds from a cutoff are not stored, values are in [0, 1] so 0 and 1 are never bounds
+        if (best_value > alpha or alpha <= 0.0) and (best_value < beta or beta >= 1.0):
+            self.table[key] = (best_value, EXACT_DEPTH if exact else depth, best_move)
+            self._unsaved.append(key)
+        return best_value, exact
+
+    def _chance_value(self, engine, outcomes, depth, alpha, beta):
+        """Expected (value, exact) over the outcomes of a move, with Star1 cutoffs against alpha and beta"""
+        state = engine.state
+        total = 0.0
+        remaining = 1.0
+        exact = True
+        for probability, child_snapshot in sorted(outcomes.values(), key=lambda outcome: -outcome[0]):
+            remaining -= probability
+            # Window for this child, assuming the unsearched outcomes end 0 or 1
+            child_alpha = max(0.0, (alpha - total - remaining) / probability)
+            child_beta = min(1.0, (beta - total) / probability)
+            state.restore(child_snapshot)
+            value, child_exact = self._value(engine, depth, child_alpha, child_beta)
+            total += probability * value
+            exact = exact and child_exact
+            if total + remaining <= alpha:
+                return total + remaining, exact
+            if total >= beta:
+                return total, exact
+        return total, exact
+
+    def _encode(self, action, player):
+        """Table move word of an action in the player's current hand"""
+        card_id = player.cards[action.card_index] if action.kind == PLAY_CARD else None
+        return encode_action(action, card_id)
+
+    def _distinct_actions(self, engine, snapshot):
+        """Legal actions, keeping one of those that lead to the same position
+
+        Allocations that only differ in soldiers the action does not use (card
+        plays, heals past the cap) end in the same position once the action is
+        taken, since the soldier count is not used again before the next round.
+        """
+        state = engine.state
+        card_system = engine.card_system
+        actions = []
+        seen = set()
+        card_system.script = None
+        for action in engine.legal_actions():
+            player = state.get_current_player()
+            card_id = player.cards[action.card_index] if action.kind == PLAY_CARD else None
+            engine.apply(action)
+            key = (state_key(state), card_id)
+            state.restore(snapshot)
+            if key not in seen:
+                seen.add(key)
+                actions.append(action)
+        card_system.script = ()
+        return actions
+
+    def _leaf_value(self, engine, action, snapshot):
+        """(value, exact) after an action plus ending the turn, judged without looking further"""
+        state = engine.state
+        state.restore(snapshot)
+        engine.card_system.script = None
+        self._play(engine, action)
+        engine.card_system.script = ()
+        return heuristic_value(state), state.game_over
+
+    def _play(self, engine, action):
+        engine.apply(action)
+        if action.kind != NEXT_TURN and not engine.state.game_over:
+            engine.apply(END_TURN)
+
+    def _outcomes(self, engine, action, snapshot):
+        """Every position an action plus ending the turn can lead to: {state key: (probability, snapshot)}"""
+        state = engine.state
+        card_system = engine.card_system
+        outcomes = {}
+        scripts = [((), 1.0)]
+        while scripts:
+            script, probability = scripts.pop()
+            state.restore(snapshot)
+            card_system.script = script
+            card_system.position = 0
+            try:
+                self._play(engine, action)
+            except _ChanceEvent as event:
+                scripts.extend((script + (outcome,), probability * p)
+                               for outcome, p in event.outcomes.items() if p > 0)
+                continue
+
+            key = state_key(state)
+            if key in outcomes:
+                outcomes[key] = (outcomes[key][0] + probability, outcomes[key][1])
+            else:
+                outcomes[key] = (probability, state.snapshot())
+        card_system.script = ()
+        # Probabilities are rounded so equivalent moves compare equal
+        return {key: (round(probability, 12), child) for key, (probability, child) in outcomes.items()}
+
+    def _to_action(self, move, player):
+        """Turn a stored move into an Action for the player's current hand"""
+        action, card_id = decode_action(move)
+        if action.kind == PLAY_CARD:
+            action = action._replace(card_index=player.cards.index(card_id))
+        return action
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grow the expectimax table by solving self-play positions.")
+    parser.add_argument("--games", type=int, default=20, help="self-play games whose positions are solved")
+    parser.add_argument("--depth", type=int, default=2, help="moves of lookahead per position")
+    parser.add_argument("--table-file", default=DEFAULT_TABLE_FILE, help="table file to extend")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the self-play games")
+    args = parser.parse_args(argv)
+
+    solver = ExpectimaxSolver(args.table_file)
+    rng = random.Random(args.seed)
+    policy = BasicPolicy(rng)
+    start_time = time.perf_counter()
+    for game in range(args.games):
+        engine = new_match("Player 1", "Player 2", rng=random.Random(rng.getrandbits(64)))
+        state = engine.state
+        while not state.game_over:
+            if state.current_round > 1 and not state.action_taken:
+                solver.solve(engine, args.depth)
+            engine.apply(policy.choose_action(engine))
+        exact = sum(1 for entry in solver.table.values() if entry[1] == EXACT_DEPTH)
+        print(f"games={game + 1} entries={len(solver.table)} exact={exact} "
+              f"elapsed={time.perf_counter() - start_time:.1f}s", flush=True)
+
+
+if __name__ == "__main__":
+    main()
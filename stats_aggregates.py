@@ -0,0 +1,232 @@
+"""
+Castle War Game - Running Stats Aggregates
+Summary statistics of every recorded game, updated as games are written
+instead of recomputed from the whole history. They cover:
+- the Welford mean and variance, min, max and total of every numeric column;
+- wins and games per player;
+- fixed-width histograms of hearts lost and game duration.
+They live in a small JSON sidecar next to the stats file
+(game_stats.csv -> game_stats.csv.aggregates.json). Reading the summary
+costs the same for ten games as for a hundred million.
+
+The StatsWriter updates the sidecar with every batch it writes: holding
+a lock file shared by all processes, it re-reads the sidecar, appends the
+batch, adds it and saves the sidecar. That costs O(players + bins) per
+batch, not O(1) per game, but keeps several writers of one file (the game
+and simulate.py, say) from losing each other's counts.
+
+The sidecar records the fingerprint of the stats file it was built from
+(see the stores' fingerprint()). A missing sidecar, or one that no longer
+matches because the stats file was changed by other means (imported into,
+edited by hand), is rebuilt by scanning the stats file. To force that:
+
+    python stats_aggregates.py game_stats.csv
+"""
+
+import json
+import math
+import os
+import sys
+from contextlib import contextmanager
+
+from game_stats import STATS_FILE, STATS_HEADER, TEXT_COLUMNS, REAL_COLUMNS, open_store
+
+SIDECAR_SUFFIX = ".aggregates.json"
+LOCK_SUFFIX = ".lock"  # Lock file next to the sidecar, held while it is read and replaced
+NUMERIC_COLUMNS = tuple(name for name in STATS_HEADER if name not in TEXT_COLUMNS)
+# Derived per-game values summarised next to the columns
+SOLDIER_SHARE = "SoldierShare"  # SoldiersCreated / (SoldiersCreated + FarmersCreated), games with units only
+HEARTS_LOST_TOTAL = "HeartsLostTotal"  # HeartsLostPlayer1 + HeartsLostPlayer2
+HISTOGRAM_BIN_WIDTHS = {"HeartsLostPlayer1": 5, "HeartsLostPlayer2": 5, "GameDuration": 30.0}
+_INDEX = {name: index for index, name in enumerate(STATS_HEADER)}
+
+
+def aggregates_path(stats_file):
+    """Path of the aggregates sidecar of a stats file"""
+    return stats_file.rstrip("/\\") + SIDECAR_SUFFIX
+
+
+@contextmanager
+def aggregates_lock(stats_file):
+    """Hold the lock of a stats file's sidecar, excluding other threads and processes"""
+    with open(aggregates_path(stats_file) + LOCK_SUFFIX, "a") as file:
+        if os.name == "nt":
+            import msvcrt
+
+            while True:
+                try:
+                    msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)  # Gives up after 10 s, so retry
+                    break
+                except OSError:
+                    pass
+            try:
+                yield
+            finally:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+class RunningStat:
+    """Count, mean and variance (Welford), min, max and total of a stream of numbers"""
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, minimum=None, maximum=None, total=0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2  # Sum of squared differences from the mean
+        self.minimum = minimum
+        self.maximum = maximum
+        self.total = total
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        self.total += value
+
+    def std(self):
+        """Sample standard deviation (like pandas), NaN below two values"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else float("nan")
+
+    def to_list(self):
+        return [self.count, self.mean, self.m2, self.minimum, self.maximum, self.total]
+
+
+class RunningAggregates:
+    """Summary statistics of a stream of stats rows (lists in STATS_HEADER order), each added in O(1)"""
+
+    def __init__(self):
+        self.source = None  # Fingerprint of the stats file the aggregates were built from
+        self.games = 0
+        self.stats = {name: RunningStat() for name in NUMERIC_COLUMNS + (SOLDIER_SHARE, HEARTS_LOST_TOTAL)}
+        self.players = {}  # name -> [wins, games], in order of first appearance
+        self.histograms = {name: [] for name in HISTOGRAM_BIN_WIDTHS}  # Counts per bin, growing as needed
+
+    def add_row(self, row):
+        """Add one game; values may be strings, as read from a CSV"""
+        self.games += 1
+        values = {}
+        for name in NUMERIC_COLUMNS:
+            value = row[_INDEX[name]]
+            value = float(value) if name in REAL_COLUMNS else int(value)
+            values[name] = value
+            self.stats[name].add(value)
+        units = values["SoldiersCreated"] + values["FarmersCreated"]
+        if units:
+            self.stats[SOLDIER_SHARE].add(values["SoldiersCreated"] / units)
+        self.stats[HEARTS_LOST_TOTAL].add(values["HeartsLostPlayer1"] + values["HeartsLostPlayer2"])
+
+        player1, player2, winner = row[_INDEX["Player1"]], row[_INDEX["Player2"]], row[_INDEX["Winner"]]
+        for player in (player1, player2) if player1 != player2 else (player1,):
+            record = self.players.setdefault(player, [0, 0])
+            record[1] += 1
+            if player == winner:
+                record[0] += 1
+
+        for name, width in HISTOGRAM_BIN_WIDTHS.items():
+            counts = self.histograms[name]
+            index = max(int(values[name] // width), 0)
+            if index >= len(counts):
+                counts.extend([0] * (index + 1 - len(counts)))
+            counts[index] += 1
+
+    def add_rows(self, rows):
+        for row in rows:
+            self.add_row(row)
+
+    def player_record(self, player):
+        """(wins, games) of a player"""
+        wins, games = self.players.get(player, (0, 0))
+        return wins, games
+
+    def histogram(self, name):
+        """(bin edges, counts) of a histogrammed column; edges has one more entry than counts"""
+        width = HISTOGRAM_BIN_WIDTHS[name]
+        counts = self.histograms[name]
+        return [index * width for index in range(len(counts) + 1)], list(counts)
+
+    def to_dict(self):
+        return {"source": self.source, "games": self.games, "stats": {name: stat.to_list() for name, stat in self.stats.items()},
+                "players": self.players, "histograms": self.histograms}
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregates = cls()
+        aggregates.source = data.get("source")
+        aggregates.games = data["games"]
+        aggregates.stats.update((name, RunningStat(*values)) for name, values in data["stats"].items())
+        aggregates.players = data["players"]
+        aggregates.histograms.update(data["histograms"])
+        return aggregates
+
+    def save(self, path):
+        """Write to path, replacing it atomically"""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as file:
+            json.dump(self.to_dict(), file)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            return cls.from_dict(json.load(file))
+
+
+def build_aggregates(stats_file):
+    """Aggregates of every game in a stats file, by scanning it"""
+    aggregates = RunningAggregates()
+    if os.path.exists(stats_file):
+        store = open_store(stats_file)
+        aggregates.source = store.fingerprint()  # Taken first: rows appended during the scan make it stale
+        aggregates.add_rows(store.rows())
+    return aggregates
+
+
+def read_aggregates(stats_file, store):
+    """Aggregates of the stats file as it is now, from its sidecar or rebuilt (and saved) when that is stale
+
+    Call it holding aggregates_lock(stats_file).
+    """
+    path = aggregates_path(stats_file)
+    if os.path.exists(path):
+        try:
+            aggregates = RunningAggregates.load(path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Rebuilding {path}, it could not be read: {e}")
+        else:
+            if aggregates.source == store.fingerprint():
+                return aggregates
+            print(f"Rebuilding {path}, {stats_file} was changed since it was written")
+    aggregates = build_aggregates(stats_file)
+    aggregates.save(path)
+    return aggregates
+
+
+def load_aggregates(stats_file):
+    """Aggregates of every game in a stats file, from its sidecar when that is current
+
+    Without a stats file (e.g. deleted to reset the statistics) they are
+    empty, whatever sidecar is left.
+    """
+    if not os.path.exists(stats_file):
+        return RunningAggregates()
+    with aggregates_lock(stats_file):
+        return read_aggregates(stats_file, open_store(stats_file))
+
+
+if __name__ == "__main__":
+    stats_file = sys.argv[1] if len(sys.argv) > 1 else STATS_FILE
+    with aggregates_lock(stats_file):
+        aggregates = build_aggregates(stats_file)
+        aggregates.save(aggregates_path(stats_file))
+    print(f"Rebuilt {aggregates_path(stats_file)} from {aggregates.games} games")
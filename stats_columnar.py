@@ -0,0 +1,224 @@
+"""
+Castle War Game - Columnar Stats Store
+Game statistics as date-partitioned column files, for analytics over long
+histories: one directory per month (e.g. 2025-05/) holding chunk files in
+which every column of a batch of games is stored and compressed on its own,
+as NumPy .npz members or, when pyarrow is installed, as Parquet. Readers
+only decompress the columns they ask for and skip the months outside the
+date range they ask for.
+
+Every batch written by the StatsWriter becomes a new chunk, written to a
+temporary file and renamed into place, so readers never see half a chunk.
+compact() merges the chunks of each month into one.
+
+GameStats uses this store for stats paths ending in .columns.
+
+Usage:
+    python stats_columnar.py import game_stats.csv game_stats.columns    # one-shot import of an existing CSV
+    python stats_columnar.py compact game_stats.columns
+"""
+
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+
+from game_stats import STATS_HEADER, TEXT_COLUMNS, REAL_COLUMNS
+
+CHUNK_SUFFIXES = (".npz", ".parquet")
+IMPORT_BATCH_ROWS = 100000  # Rows converted to arrays at a time when importing a CSV
+
+
+def _dtype(name):
+    return str if name in TEXT_COLUMNS else np.float64 if name in REAL_COLUMNS else np.int64
+
+
+def _month(date):
+    return date[:7]  # "YYYY-MM" of a DATE_FORMAT string
+
+
+def default_format():
+    """"parquet" when pyarrow is installed, "npz" otherwise"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return "npz"
+    return "parquet"
+
+
+class ColumnarStore:
+    """Stats rows stored as monthly partitions of compressed column chunks under path"""
+
+    def __init__(self, path, chunk_format=None):
+        self.path = path
+        self.chunk_format = chunk_format or default_format()
+
+    def ensure_exists(self):
+        """Create the store's directory if it doesn't exist"""
+        os.makedirs(self.path, exist_ok=True)
+
+    def append_rows(self, rows):
+        """Write rows as one new chunk per month they fall in"""
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(_month(row[0]), []).append(row)
+        for month, month_rows in by_month.items():
+            values = zip(*month_rows)
+            self._write_chunk(month, {name: np.array(column, dtype=_dtype(name))
+                                      for name, column in zip(STATS_HEADER, values)})
+
+    def _write_chunk(self, month, arrays, name=None):
+        directory = os.path.join(self.path, month)
+        os.makedirs(directory, exist_ok=True)
+        # Chunk names sort in the order they were written, which keeps games in recorded order
+        name = name or f"{time.time_ns():020d}-{os.getpid()}.{self.chunk_format}"
+        temporary = os.path.join(directory, f".{name}.tmp")
+        if name.endswith(".parquet"):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            pq.write_table(pa.table(arrays), temporary, compression="zstd")
+        else:
+            with open(temporary, "wb") as file:
+                np.savez_compressed(file, **arrays)
+        os.replace(temporary, os.path.join(directory, name))
+
+    def months(self, since=None, until=None):
+        """Partitions holding games with since <= Date < until, oldest first"""
+        if not os.path.isdir(self.path):
+            return []
+        return [month for month in sorted(os.listdir(self.path))
+                if len(month) == 7 and os.path.isdir(os.path.join(self.path, month))
+                and (since is None or month >= _month(since)) and (until is None or month <= _month(until))]
+
+    def chunks(self, month):
+        """Paths of the chunk files of a partition, in the order they were written"""
+        directory = os.path.join(self.path, month)
+        return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+                if name.endswith(CHUNK_SUFFIXES) and not name.startswith(".")]
+
+    def _read_chunk(self, path, columns):
+        if path.endswith(".parquet"):
+            import pyarrow.parquet as pq
+
+            table = pq.read_table(path, columns=columns)
+            # Strings come back as object arrays, which .npz chunks could only hold pickled
+            return {name: table.column(name).to_numpy().astype(_dtype(name)) for name in columns}
+        with np.load(path) as data:  # Only the members asked for are decompressed
+            return {name: data[name] for name in columns}
+
+    def read_columns(self, columns=None, since=None, until=None):
+        """{column: NumPy array} of the games with since <= Date < until, in recorded order
+
+        Only the partitions overlapping the range are opened, and Date is
+        only read to filter the rows of the first and last of them.
+        """
+        columns = list(columns or STATS_HEADER)
+        unknown = set(columns) - set(STATS_HEADER)
+        if unknown:
+            raise ValueError(f"Unknown stats columns: {', '.join(sorted(unknown))}")
+        parts = {name: [] for name in columns}
+        for month in self.months(since, until):
+            boundary = ((since is not None and month == _month(since))
+                        or (until is not None and month == _month(until)))
+            wanted = columns + ["Date"] if boundary and "Date" not in columns else columns
+            for chunk in self.chunks(month):
+                arrays = self._read_chunk(chunk, wanted)
+                if boundary:
+                    keep = np.ones(len(arrays["Date"]), dtype=bool)
+                    if since is not None:
+                        keep &= arrays["Date"] >= since
+                    if until is not None:
+                        keep &= arrays["Date"] < until
+                    arrays = {name: array[keep] for name, array in arrays.items()}
+                for name in columns:
+                    parts[name].append(arrays[name])
+        return {name: np.concatenate(arrays) if arrays else np.array([], dtype=_dtype(name))
+                for name, arrays in parts.items()}
+
+    def fingerprint(self):
+        """Changes whenever chunks are written or merged: their number and the newest name (None when empty)"""
+        names = [os.path.basename(chunk) for month in self.months() for chunk in self.chunks(month)]
+        return f"{len(names)}:{max(names)}" if names else None
+
+    def rows(self):
+        """Every stored game as a row in STATS_HEADER order, in recorded order"""
+        for month in self.months():
+            for chunk in self.chunks(month):
+                arrays = self._read_chunk(chunk, STATS_HEADER)
+                yield from zip(*(arrays[name].tolist() for name in STATS_HEADER))
+
+    def load_dataframe(self, columns=None, since=None, until=None):
+        """Games as a pandas DataFrame, in recorded order (same arguments as read_columns)"""
+        import pandas as pd  # Only the visualizer needs pandas
+
+        arrays = self.read_columns(columns, since, until)
+        return pd.DataFrame(arrays, columns=list(arrays))
+
+    def compact(self):
+        """Merge the chunks of every month into one, returns the number of chunks removed
+
+        Run it while nothing reads the store: between writing a merged chunk
+        and removing the chunks it replaces, their games are seen twice.
+        """
+        removed = 0
+        for month in self.months():
+            chunks = self.chunks(month)
+            if len(chunks) < 2:
+                continue
+            arrays = [self._read_chunk(chunk, STATS_HEADER) for chunk in chunks]
+            merged = {name: np.concatenate([chunk[name] for chunk in arrays]) for name in STATS_HEADER}
+            # The merged chunk takes the newest name, so chunks written meanwhile still sort after it
+            newest = os.path.basename(chunks[-1])
+            name = f"{os.path.splitext(newest)[0]}.{self.chunk_format}"
+            self._write_chunk(month, merged, name)
+            for chunk in chunks:
+                if os.path.basename(chunk) != name:
+                    os.remove(chunk)
+                    removed += 1
+        return removed
+
+    def import_csv(self, csv_path, batch_rows=IMPORT_BATCH_ROWS):
+        """Append every game of a stats CSV and compact the store, returns the number of games imported"""
+        self.ensure_exists()
+        imported = 0
+        with open(csv_path, newline='') as file:
+            reader = csv.reader(file)
+            if next(reader, None) != STATS_HEADER:
+                raise ValueError(f"{csv_path} is not a game stats CSV")
+            batch = []
+            for row in reader:
+                batch.append(row)
+                if len(batch) >= batch_rows:
+                    self.append_rows(batch)
+                    imported += len(batch)
+                    batch = []
+            self.append_rows(batch)
+            imported += len(batch)
+        self.compact()
+        return imported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage a columnar Castle War stats store.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="append every game of a stats CSV to a store")
+    import_parser.add_argument("csv_file")
+    import_parser.add_argument("store")
+    compact_parser = commands.add_parser("compact", help="merge the chunks of every month into one")
+    compact_parser.add_argument("store")
+    args = parser.parse_args(argv)
+
+    store = ColumnarStore(args.store)
+    if args.command == "import":
+        print(f"Imported {store.import_csv(args.csv_file)} games into {args.store}")
+    else:
+        print(f"Removed {store.compact()} chunks from {args.store}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
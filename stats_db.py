@@ -0,0 +1,223 @@
+"""
+Castle War Game - SQLite Stats Store
+Game statistics in a SQLite database instead of the flat CSV: one row per
+game in the "games" table, with the same columns as game_stats.csv. The
+database runs in WAL mode, so the game or the simulator can keep appending
+while the visualizer or a query reads. Rows are inserted in batches, one
+transaction per batch.
+
+Besides the index on Date, the indexes on Player1, Player2 and Winner are
+followed by Date, so per-player questions over a time window ("win rate of
+X over the last 30 days") are answered by counting index ranges without
+touching the table.
+
+GameStats uses this store for stats files ending in .db, .sqlite or
+.sqlite3 (see game_stats.open_store).
+
+Usage:
+    python stats_db.py import game_stats.csv game_stats.db    # one-shot import of an existing CSV
+    python stats_db.py win-rate game_stats.db tan --days 30
+"""
+
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+
+from game_stats import DATE_FORMAT, STATS_HEADER, TEXT_COLUMNS, REAL_COLUMNS
+
+TABLE = "games"
+INDEXES = {
+    "games_date": ("Date",),
+    "games_player1": ("Player1", "Date"),
+    "games_player2": ("Player2", "Date", "Player1"),  # Player1 too, so self-play is not counted twice
+    "games_winner": ("Winner", "Date"),
+}
+IMPORT_BATCH_ROWS = 50000  # Rows per transaction when importing a CSV
+BUSY_TIMEOUT = 30.0  # Seconds to wait for another process's write transaction
+
+
+def _column_type(name):
+    return "TEXT" if name in TEXT_COLUMNS else "REAL" if name in REAL_COLUMNS else "INTEGER"
+
+
+class SqliteStore:
+    """Stats rows stored in a SQLite database in WAL mode
+
+    A connection is opened per call, so a store can be used from any thread
+    (the StatsWriter thread appends, queries may run elsewhere).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._ready = False  # Schema known to exist
+
+    def connect(self):
+        """A new connection to the database, in WAL mode"""
+        connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")  # Durable at checkpoints, safe against corruption in WAL
+        return connection
+
+    def ensure_exists(self, indexes=True):
+        """Create the games table (and its indexes) if they don't exist"""
+        if self._ready:
+            return
+        columns = ", ".join(f"{name} {_column_type(name)}" for name in STATS_HEADER)
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute(f"CREATE TABLE IF NOT EXISTS {TABLE} ({columns})")
+                if indexes:
+                    self._create_indexes(connection)
+        finally:
+            connection.close()
+        self._ready = indexes
+
+    def _create_indexes(self, connection):
+        for name, columns in INDEXES.items():
+            connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {TABLE} ({', '.join(columns)})")
+
+    def append_rows(self, rows):
+        """Insert rows in one transaction"""
+        self.ensure_exists()
+        connection = self.connect()
+        try:
+            with connection:
+                self._insert(connection, rows)
+        finally:
+            connection.close()
+
+    def _insert(self, connection, rows):
+        placeholders = ", ".join("?" * len(STATS_HEADER))
+        connection.executemany(f"INSERT INTO {TABLE} VALUES ({placeholders})", rows)
+
+    def import_csv(self, csv_path, batch_rows=IMPORT_BATCH_ROWS):
+        """Append every game of a stats CSV, returns the number of games imported
+
+        Indexes that don't exist yet, as in a new database, are built once
+        after the import, which is much faster than updating them row by row.
+        """
+        self.ensure_exists(indexes=False)
+        connection = self.connect()
+        imported = 0
+        try:
+            with open(csv_path, newline='') as file:
+                reader = csv.reader(file)
+                if next(reader, None) != STATS_HEADER:
+                    raise ValueError(f"{csv_path} is not a game stats CSV")
+                batch = []
+                for row in reader:
+                    batch.append(row)
+                    if len(batch) >= batch_rows:
+                        with connection:
+                            self._insert(connection, batch)
+                        imported += len(batch)
+                        batch = []
+                with connection:
+                    self._insert(connection, batch)
+                imported += len(batch)
+            with connection:
+                self._create_indexes(connection)
+            connection.execute("ANALYZE")
+        finally:
+            connection.close()
+        self._ready = True
+        return imported
+
+    def player_record(self, player, days=None, now=None):
+        """(wins, games) of player, over the last days days if given"""
+        since = "" if days is None else ((now or datetime.now()) - timedelta(days=days)).strftime(DATE_FORMAT)
+        connection = self.connect()
+        try:
+            games = connection.execute(
+                f"SELECT (SELECT COUNT(*) FROM {TABLE} WHERE Player1 = ? AND Date >= ?)"
+                f" + (SELECT COUNT(*) FROM {TABLE} WHERE Player2 = ? AND Date >= ? AND Player1 != ?)",
+                (player, since, player, since, player)).fetchone()[0]
+            wins = connection.execute(f"SELECT COUNT(*) FROM {TABLE} WHERE Winner = ? AND Date >= ?",
+                                      (player, since)).fetchone()[0]
+        finally:
+            connection.close()
+        return wins, games
+
+    def win_rate(self, player, days=None, now=None):
+        """Fraction of player's games won, over the last days days if given (0.0 without games)"""
+        wins, games = self.player_record(player, days, now)
+        return wins / games if games else 0.0
+
+    def fingerprint(self):
+        """Changes whenever rows are appended: the highest rowid (None without a database or table)"""
+        if not os.path.exists(self.path):
+            return None
+        connection = self.connect()
+        try:
+            return connection.execute(f"SELECT MAX(rowid) FROM {TABLE}").fetchone()[0]
+        except sqlite3.OperationalError:  # No games table yet
+            return None
+        finally:
+            connection.close()
+
+    def rows(self):
+        """Every stored game as a row in STATS_HEADER order, oldest first"""
+        connection = self.connect()
+        try:
+            yield from connection.execute(f"SELECT {', '.join(STATS_HEADER)} FROM {TABLE} ORDER BY Date, rowid")
+        finally:
+            connection.close()
+
+    def load_dataframe(self, columns=None, since=None, until=None):
+        """Games as a pandas DataFrame, oldest first
+
+        columns limits the columns read (all by default); since and until
+        keep games with since <= Date < until (DATE_FORMAT strings), using
+        the Date index.
+        """
+        import pandas as pd  # Only the visualizer needs pandas
+
+        columns = list(columns or STATS_HEADER)
+        unknown = set(columns) - set(STATS_HEADER)
+        if unknown:
+            raise ValueError(f"Unknown stats columns: {', '.join(sorted(unknown))}")
+        conditions, parameters = [], []
+        if since is not None:
+            conditions.append("Date >= ?")
+            parameters.append(since)
+        if until is not None:
+            conditions.append("Date < ?")
+            parameters.append(until)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        connection = self.connect()
+        try:
+            return pd.read_sql_query(f"SELECT {', '.join(columns)} FROM {TABLE}{where} ORDER BY Date, rowid",
+                                     connection, params=parameters)
+        finally:
+            connection.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage a SQLite Castle War stats database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    import_parser = commands.add_parser("import", help="append every game of a stats CSV to a database")
+    import_parser.add_argument("csv_file")
+    import_parser.add_argument("database")
+    rate_parser = commands.add_parser("win-rate", help="print a player's win rate")
+    rate_parser.add_argument("database")
+    rate_parser.add_argument("player")
+    rate_parser.add_argument("--days", type=float, default=None, help="only count the last DAYS days")
+    args = parser.parse_args(argv)
+
+    store = SqliteStore(args.database)
+    if args.command == "import":
+        print(f"Imported {store.import_csv(args.csv_file)} games into {args.database}")
+    else:
+        wins, games = store.player_record(args.player, args.days)
+        period = "" if args.days is None else f" over the last {args.days:g} days"
+        print(f"{args.player}: {wins}/{games} games won{period} "
+              f"(win rate {wins / games if games else 0.0:.3f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
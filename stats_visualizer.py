@@ -2,42 +2,136 @@
 Castle War Game - Statistics Visualizer
 This script analyzes game_stats.csv and creates various visualizations
 to help understand player behavior and game balance.
+
+Summary charts (totals, win rates, histograms and the statistical table)
+read the running aggregates kept next to the stats file (see
+stats_aggregates.py), so they cost the same however many games were
+recorded. Every other chart declares the columns it needs (CHART_COLUMNS)
+and reads them through StatsQuery, so only those columns are loaded, once
+per run, and with a columnar store (stats_columnar.py) or a database only
+the date range asked for is read.
 """
 
 import os
+import sys
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
 
+from game_stats import DATE_FORMAT, STATS_FILE, STATS_HEADER, open_store
+from stats_aggregates import HEARTS_LOST_TOTAL, SOLDIER_SHARE, RunningAggregates, load_aggregates
+
+# Columns each chart that needs per-game data reads
+CHART_COLUMNS = {
+    "unit_allocation_comparison": ("Player1", "Player2", "SoldiersCreated", "FarmersCreated"),
+    "hearts_lost_per_game": ("Player1", "Player2", "HeartsLostPlayer1", "HeartsLostPlayer2"),
+    "player_improvement": ("Player1", "Player2", "Winner"),
+    "game_duration_trend": ("Player1", "Player2", "GameDuration"),
+    "battle_count_chart": ("Player1", "Player2", "BattleCount"),
+    "game_duration_box_plot": ("GameDuration",),
+}
+MAX_MARKERS = 200  # Longest per-player series still drawn with a marker on every game
+
+
+def player_games(games):
+    """Long-format table of who played which game: one row per game and player, oldest first
+
+    games needs Player1, Player2 and Winner. The result has columns game
+    (row position in games), player and won; a player facing themself
+    appears once for that game.
+    """
+    long = (games[['Player1', 'Player2', 'Winner']].reset_index(drop=True).rename_axis('game').reset_index()
+            .melt(id_vars=['game', 'Winner'], value_vars=['Player1', 'Player2'], value_name='player'))
+    long = long.drop_duplicates(['game', 'player']).sort_values('game', kind='stable')
+    return pd.DataFrame({'game': long['game'].to_numpy(), 'player': long['player'].to_numpy(),
+                         'won': (long['player'] == long['Winner']).to_numpy()})
+
+
+def matchup_labels(games):
+    """ "Player1 vs Player2" label of every game, games needs Player1 and Player2"""
+    return (games['Player1'].astype(str) + ' vs ' + games['Player2'].astype(str)).tolist()
+
+
+def cumulative_win_rates(long):
+    """player_games table with each player's games_played and win_ratio after each of their games"""
+    by_player = long.groupby('player', sort=False)['won']
+    games_played = by_player.cumcount() + 1
+    return long.assign(games_played=games_played, win_ratio=by_player.cumsum() / games_played)
+
+
+class StatsQuery:
+    """Reads only the columns and date range asked for from a stats file of any backend
+
+    since and until (datetimes or DATE_FORMAT strings) keep the games with
+    since <= Date < until; the backend skips what it can (see
+    game_stats.open_store). Loaded columns are kept, so charts sharing
+    columns read them once. Rows are in recorded order, i.e. oldest first,
+    and Date is returned as datetimes.
+    """
+
+    def __init__(self, stats_file, since=None, until=None):
+        self.store = open_store(stats_file)
+        self.since = since.strftime(DATE_FORMAT) if isinstance(since, datetime) else since
+        self.until = until.strftime(DATE_FORMAT) if isinstance(until, datetime) else until
+        self._frame = None  # Columns loaded so far
+
+    def select(self, *columns):
+        """DataFrame of the given columns"""
+        missing = [name for name in columns if self._frame is None or name not in self._frame.columns]
+        if missing:
+            loaded = self.store.load_dataframe(missing, self.since, self.until)
+            if "Date" in loaded.columns:
+                loaded["Date"] = pd.to_datetime(loaded["Date"])
+            if self._frame is None:
+                self._frame = loaded
+            elif len(loaded) == len(self._frame):
+                self._frame = pd.concat([self._frame, loaded], axis=1)
+            else:
+                # Games were recorded since the first read: load everything again so the rows line up
+                self._frame = None
+                return self.select(*columns)
+        return self._frame[list(columns)]
+
 
 class GameStatsVisualizer:
-    def __init__(self, stats_file="game_stats.csv"):
+    def __init__(self, stats_file=STATS_FILE, since=None, until=None):
         self.stats_file = stats_file
-        self.df = None
+        self.query = StatsQuery(stats_file, since, until)
+        self.summary = None  # RunningAggregates of the games shown, loaded on first use
+        self.player_table = None  # player_games table of the games shown, built on first use
         self.load_data()
         # Set a consistent style for all plots
         plt.style.use('ggplot')
         sns.set_palette("Set2")
 
     def load_data(self):
-        """Load data from CSV file"""
+        """Check that the stats file exists; the charts read their columns through self.query"""
         if not os.path.exists(self.stats_file):
             print(f"Error: {self.stats_file} not found!")
             return False
+        return True
 
-        try:
-            self.df = pd.read_csv(self.stats_file)
-            # Convert date string to datetime
-            self.df['Date'] = pd.to_datetime(self.df['Date'])
-            # Sort by date
-            self.df = self.df.sort_values('Date')
-            print(f"Loaded {len(self.df)} game records.")
-            return True
-        except Exception as e:
-            print(f"Error loading data: {e}")
-            return False
+    def _data(self, chart):
+        """The columns a chart needs (see CHART_COLUMNS)"""
+        return self.query.select(*CHART_COLUMNS[chart])
+
+    def _summary(self):
+        """Running aggregates of the games shown: the sidecar's, or built from the rows of a date range"""
+        if self.summary is None:
+            if self.query.since is None and self.query.until is None:
+                self.summary = load_aggregates(self.stats_file)
+            else:
+                self.summary = RunningAggregates()
+                self.summary.add_rows(self.query.select(*STATS_HEADER).itertuples(index=False))
+        return self.summary
+
+    def _player_table(self):
+        """player_games table of the games shown, shared by the per-player charts"""
+        if self.player_table is None:
+            self.player_table = player_games(self._data("player_improvement"))
+        return self.player_table
 
     def create_all_visualizations(self, output_dir="game_stats_visualizations"):
         """Create all visualizations and save to output directory"""
@@ -45,6 +139,10 @@ class GameStatsVisualizer:
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
+        # Read every column the charts need at once: a CSV is parsed a single time
+        games = self.query.select(*dict.fromkeys(name for columns in CHART_COLUMNS.values() for name in columns))
+        print(f"Loaded {len(games)} game records, {self._summary().games} in the running aggregates.")
+
         # Generate all visualizations
         self.create_win_loss_distribution(output_dir)
         self.create_unit_allocation_comparison(output_dir)
@@ -62,22 +160,19 @@ class GameStatsVisualizer:
 
     def create_win_loss_distribution(self, output_dir):
         """Create bar chart showing win/loss distribution for each player"""
+        summary = self._summary()
         plt.figure(figsize=(10, 6))
 
-        # Get all unique player names
-        all_players = set(self.df['Player1'].tolist() + self.df['Player2'].tolist())
-        all_players = [p for p in all_players if p != 'Enemy Castle']  # Exclude AI
+        # Get all player names
+        all_players = [p for p in summary.players if p != 'Enemy Castle']  # Exclude AI
 
         # Calculate wins for each player
         wins_data = []
         losses_data = []
 
         for player in all_players:
-            # Count wins
-            wins = len(self.df[self.df['Winner'] == player])
-
-            # Count games played
-            games_played = len(self.df[(self.df['Player1'] == player) | (self.df['Player2'] == player)])
+            # Count wins and games played
+            wins, games_played = summary.player_record(player)
 
             # Calculate losses
             losses = games_played - wins
@@ -121,28 +216,29 @@ class GameStatsVisualizer:
 
     def create_unit_allocation_comparison(self, output_dir):
         """Create bar chart comparing soldier vs farmer allocation across games"""
+        df = self._data("unit_allocation_comparison")
         plt.figure(figsize=(12, 6))
 
         # Create bar chart
-        x = np.arange(len(self.df))
+        x = np.arange(len(df))
         width = 0.35
 
-        fig, ax = plt.subplots(figsize=(max(8, len(self.df)), 6))
+        fig, ax = plt.subplots(figsize=(max(8, len(df)), 6))
 
         # Plot soldiers and farmers
-        soldiers_bar = ax.bar(x - width / 2, self.df['SoldiersCreated'], width, label='Soldiers', color='red')
-        farmers_bar = ax.bar(x + width / 2, self.df['FarmersCreated'], width, label='Farmers', color='green')
+        soldiers_bar = ax.bar(x - width / 2, df['SoldiersCreated'], width, label='Soldiers', color='red')
+        farmers_bar = ax.bar(x + width / 2, df['FarmersCreated'], width, label='Farmers', color='green')
 
         # Add labels and title
         ax.set_xlabel('Game Number', fontweight='bold')
         ax.set_ylabel('Unit Count', fontweight='bold')
         ax.set_title('Soldier vs. Farmer Allocation Comparison by Game', fontsize=14, fontweight='bold')
         ax.set_xticks(x)
-        ax.set_xticklabels([f'Game {i + 1}' for i in range(len(self.df))])
+        ax.set_xticklabels([f'Game {i + 1}' for i in range(len(df))])
         ax.legend()
 
         # Add secondary labels for player names
-        players_labels = [f"{row['Player1']} vs {row['Player2']}" for _, row in self.df.iterrows()]
+        players_labels = matchup_labels(df)
         ax2 = ax.twiny()
         ax2.set_xlim(ax.get_xlim())
         ax2.set_xticks(x)
@@ -154,35 +250,36 @@ class GameStatsVisualizer:
 
     def create_hearts_lost_per_game(self, output_dir):
         """Create bar chart showing hearts lost by each player per game"""
+        df = self._data("hearts_lost_per_game")
         plt.figure(figsize=(12, 6))
 
         # Create bar chart
-        x = np.arange(len(self.df))
+        x = np.arange(len(df))
         width = 0.35
 
-        fig, ax = plt.subplots(figsize=(max(8, len(self.df)), 6))
+        fig, ax = plt.subplots(figsize=(max(8, len(df)), 6))
 
         # Plot hearts lost
-        p1_bar = ax.bar(x - width / 2, self.df['HeartsLostPlayer1'], width, label='Player 1', color='blue')
-        p2_bar = ax.bar(x + width / 2, self.df['HeartsLostPlayer2'], width, label='Player 2', color='orange')
+        p1_bar = ax.bar(x - width / 2, df['HeartsLostPlayer1'], width, label='Player 1', color='blue')
+        p2_bar = ax.bar(x + width / 2, df['HeartsLostPlayer2'], width, label='Player 2', color='orange')
 
         # Add labels and title
         ax.set_xlabel('Game Number', fontweight='bold')
         ax.set_ylabel('Hearts Lost', fontweight='bold')
         ax.set_title('Hearts Lost Per Game by Player', fontsize=14, fontweight='bold')
         ax.set_xticks(x)
-        ax.set_xticklabels([f'Game {i + 1}' for i in range(len(self.df))])
+        ax.set_xticklabels([f'Game {i + 1}' for i in range(len(df))])
 
         # Add secondary labels for player names
-        players_labels = [f"{row['Player1']} vs {row['Player2']}" for _, row in self.df.iterrows()]
+        players_labels = matchup_labels(df)
         ax2 = ax.twiny()
         ax2.set_xlim(ax.get_xlim())
         ax2.set_xticks(x)
         ax2.set_xticklabels(players_labels, rotation=45, ha='left')
 
         # Add legend with player names
-        player1_names = self.df['Player1'].tolist()
-        player2_names = self.df['Player2'].tolist()
+        player1_names = df['Player1'].tolist()
+        player2_names = df['Player2'].tolist()
         ax.legend([f'Player 1 ({", ".join(set(player1_names))})',
                    f'Player 2 ({", ".join(set(player2_names))})'])
 
@@ -194,47 +291,17 @@ class GameStatsVisualizer:
         """Create line graph showing player improvement over time"""
         plt.figure(figsize=(12, 6))
 
-        # Get all unique players except AI
-        all_players = set(self.df['Player1'].tolist() + self.df['Player2'].tolist())
-        all_players = [p for p in all_players if p != 'Enemy Castle']
-
-        # Track win ratio for each player over time
-        player_performance = {}
-
-        for player in all_players:
-            wins = []
-            total_games = []
-            win_ratios = []
-
-            # Calculate cumulative win ratio over time
-            for i, row in self.df.iterrows():
-                # Check if this player was involved in this game
-                if row['Player1'] == player or row['Player2'] == player:
-                    # Update win count if player won
-                    if row['Winner'] == player:
-                        wins.append(1)
-                    else:
-                        wins.append(0)
-
-                    # Update total games
-                    total_games.append(1)
-
-                    # Calculate win ratio so far
-                    win_ratio = sum(wins) / sum(total_games)
-                    win_ratios.append(win_ratio)
-
-            # Store performance data
-            if win_ratios:  # Only if player played games
-                player_performance[player] = {
-                    'win_ratios': win_ratios,
-                    'game_indices': list(range(1, len(win_ratios) + 1))
-                }
+        # Cumulative win ratio of each player after each of their games, except the AI
+        performance = cumulative_win_rates(self._player_table())
+        performance = performance[performance['player'] != 'Enemy Castle']
 
         # Plot improvement over time for each player
         fig, ax = plt.subplots(figsize=(12, 6))
 
-        for player, data in player_performance.items():
-            ax.plot(data['game_indices'], data['win_ratios'], marker='o', label=player)
+        for player, data in performance.groupby('player', sort=False):
+            # Markers only while they can be told apart; long histories are drawn as lines
+            marker = 'o' if len(data) <= MAX_MARKERS else None
+            ax.plot(data['games_played'], data['win_ratio'], marker=marker, label=player)
 
         # Add labels and title
         ax.set_xlabel('Games Played', fontweight='bold')
@@ -252,11 +319,12 @@ class GameStatsVisualizer:
 
     def create_game_duration_trend(self, output_dir):
         """Create line graph showing trend in game duration over time"""
+        df = self._data("game_duration_trend")
         plt.figure(figsize=(12, 6))
 
         # Prepare data
-        game_indices = list(range(1, len(self.df) + 1))
-        durations = self.df['GameDuration'].tolist()
+        game_indices = list(range(1, len(df) + 1))
+        durations = df['GameDuration'].tolist()
 
         # Calculate moving average (if there are enough data points)
         window_size = min(3, len(durations))
@@ -290,7 +358,7 @@ class GameStatsVisualizer:
         ax.grid(True)
 
         # Add labels for matchups
-        matchups = [f"{row['Player1']} vs {row['Player2']}" for _, row in self.df.iterrows()]
+        matchups = matchup_labels(df)
 
         # If there are many games, add labels for selected games only
         if len(matchups) > 10:
@@ -317,15 +385,16 @@ class GameStatsVisualizer:
 
     def create_battle_count_chart(self, output_dir):
         """Create bar chart showing battle frequency per game"""
+        df = self._data("battle_count_chart")
         plt.figure(figsize=(12, 6))
 
         # Prepare data
-        games = [f"Game {i + 1}" for i in range(len(self.df))]
-        battle_counts = self.df['BattleCount'].tolist()
+        games = [f"Game {i + 1}" for i in range(len(df))]
+        battle_counts = df['BattleCount'].tolist()
 
         # Create bar chart
-        fig, ax = plt.subplots(figsize=(max(8, len(self.df)), 6))
-        bars = ax.bar(games, battle_counts, color=sns.color_palette("Blues_d", len(self.df)))
+        fig, ax = plt.subplots(figsize=(max(8, len(df)), 6))
+        bars = ax.bar(games, battle_counts, color=sns.color_palette("Blues_d", len(df)))
 
         # Add labels and title
         ax.set_xlabel('Game', fontweight='bold')
@@ -346,7 +415,7 @@ class GameStatsVisualizer:
         ax.axhline(y=avg_battles, color='r', linestyle='--', label=f'Average: {avg_battles:.1f}')
 
         # Add matchup labels under the bars
-        matchups = [f"{row['Player1']} vs {row['Player2']}" for _, row in self.df.iterrows()]
+        matchups = matchup_labels(df)
         ax.set_xticks(range(len(games)))
         ax.set_xticklabels(games)
 
@@ -363,11 +432,12 @@ class GameStatsVisualizer:
 
     def create_unit_allocation_pie_chart(self, output_dir):
         """Create pie chart showing soldier vs farmer ratio"""
+        summary = self._summary()
         plt.figure(figsize=(10, 8))
 
-        # Calculate total soldiers and farmers across all games
-        total_soldiers = self.df['SoldiersCreated'].sum()
-        total_farmers = self.df['FarmersCreated'].sum()
+        # Total soldiers and farmers across all games
+        total_soldiers = summary.stats['SoldiersCreated'].total
+        total_farmers = summary.stats['FarmersCreated'].total
 
         # Create pie chart
         fig, ax = plt.subplots(figsize=(10, 8))
@@ -398,22 +468,22 @@ class GameStatsVisualizer:
 
     def create_hearts_lost_histogram(self, output_dir):
         """Create histogram showing the distribution of hearts lost"""
+        summary = self._summary()
         plt.figure(figsize=(12, 6))
 
-        # Gather all hearts lost data
-        player1_hearts = self.df['HeartsLostPlayer1'].tolist()
-        player2_hearts = self.df['HeartsLostPlayer2'].tolist()
+        # Hearts lost per game, counted in bins of 5 hearts
+        player1_edges, player1_counts = summary.histogram('HeartsLostPlayer1')
+        player2_edges, player2_counts = summary.histogram('HeartsLostPlayer2')
+        player1_stats = summary.stats['HeartsLostPlayer1']
+        player2_stats = summary.stats['HeartsLostPlayer2']
 
         # Create separate histograms for player 1 and player 2
         fig, ax = plt.subplots(figsize=(12, 6))
 
-        # Set bin range based on data
-        max_hearts = max(max(player1_hearts) if player1_hearts else 0,
-                         max(player2_hearts) if player2_hearts else 0)
-        bins = range(0, int(max_hearts) + 5, 5)  # bins of 5 hearts
-
-        ax.hist(player1_hearts, bins=bins, alpha=0.7, label='Player 1', color='blue')
-        ax.hist(player2_hearts, bins=bins, alpha=0.7, label='Player 2', color='orange')
+        # Both players share the bins, the counts weigh one value per bin
+        bins = max(player1_edges, player2_edges, key=len)
+        ax.hist(player1_edges[:-1], bins=bins, weights=player1_counts, alpha=0.7, label='Player 1', color='blue')
+        ax.hist(player2_edges[:-1], bins=bins, weights=player2_counts, alpha=0.7, label='Player 2', color='orange')
 
         # Add labels and title
         ax.set_xlabel('Hearts Lost', fontweight='bold')
@@ -425,10 +495,10 @@ class GameStatsVisualizer:
         ax.grid(axis='y', alpha=0.75)
 
         # Add statistics as text
-        stats_text = (f"Player 1 Avg: {np.mean(player1_hearts):.1f} hearts\n"
-                      f"Player 2 Avg: {np.mean(player2_hearts):.1f} hearts\n"
-                      f"Player 1 Max: {max(player1_hearts) if player1_hearts else 0} hearts\n"
-                      f"Player 2 Max: {max(player2_hearts) if player2_hearts else 0} hearts")
+        stats_text = (f"Player 1 Avg: {player1_stats.mean:.1f} hearts\n"
+                      f"Player 2 Avg: {player2_stats.mean:.1f} hearts\n"
+                      f"Player 1 Max: {player1_stats.maximum or 0} hearts\n"
+                      f"Player 2 Max: {player2_stats.maximum or 0} hearts")
 
         # Position text in the upper right corner
         props = dict(boxstyle='round', facecolor='wheat', alpha=0.5)
@@ -441,13 +511,14 @@ class GameStatsVisualizer:
 
     def create_game_duration_box_plot(self, output_dir):
         """Create box plot showing game duration distribution"""
+        df = self._data("game_duration_box_plot")
         plt.figure(figsize=(10, 6))
 
         # Create box plot
         fig, ax = plt.subplots(figsize=(10, 6))
 
         # Calculate game durations in minutes for better readability
-        durations_min = self.df['GameDuration'] / 60
+        durations_min = df['GameDuration'] / 60
 
         # Create box plot
         box = ax.boxplot(durations_min, patch_artist=True, vert=False)
@@ -489,12 +560,13 @@ class GameStatsVisualizer:
 
     def create_action_type_distribution(self, output_dir):
         """Create bar chart showing action type frequency"""
+        summary = self._summary()
         plt.figure(figsize=(12, 6))
 
         # Gather action type data
         action_types = ['AttackActions', 'HealActions', 'DamageBoostActions', 'CardActions']
         action_labels = ['Attack', 'Heal', 'Damage Boost', 'Card Play']
-        action_counts = [self.df[col].sum() for col in action_types]
+        action_counts = [summary.stats[col].total for col in action_types]
 
         # Create bar chart
         fig, ax = plt.subplots(figsize=(12, 6))
@@ -535,44 +607,44 @@ class GameStatsVisualizer:
 
     def create_statistical_table(self, output_dir):
         """Create a table showing statistical values for game features"""
-        # Calculate statistics
+        summary = self._summary()
+        # Statistics from the running aggregates
+        battles = summary.stats['BattleCount']
+        soldier_share = summary.stats[SOLDIER_SHARE]  # Fraction of the units that were soldiers
+        hearts_lost = summary.stats[HEARTS_LOST_TOTAL]
+        duration = summary.stats['GameDuration']
         stats = {
             'Battle Count': {
-                'Mean': self.df['BattleCount'].mean(),
-                'Min': self.df['BattleCount'].min(),
-                'Max': self.df['BattleCount'].max(),
-                'StdDev': self.df['BattleCount'].std()
+                'Mean': battles.mean,
+                'Min': battles.minimum,
+                'Max': battles.maximum,
+                'StdDev': battles.std()
             },
             'Unit Allocation': {
-                'Mean': (self.df['SoldiersCreated'] /
-                         (self.df['SoldiersCreated'] + self.df['FarmersCreated'])).mean() * 100,
-                'Min': (self.df['SoldiersCreated'] /
-                        (self.df['SoldiersCreated'] + self.df['FarmersCreated'])).min() * 100,
-                'Max': (self.df['SoldiersCreated'] /
-                        (self.df['SoldiersCreated'] + self.df['FarmersCreated'])).max() * 100
+                'Mean': soldier_share.mean * 100,
+                'Min': soldier_share.minimum * 100 if soldier_share.count else float("nan"),
+                'Max': soldier_share.maximum * 100 if soldier_share.count else float("nan")
             },
             'Hearts Lost': {
-                'Mean': (self.df['HeartsLostPlayer1'] + self.df['HeartsLostPlayer2']).mean(),
-                'Min': (self.df['HeartsLostPlayer1'] + self.df['HeartsLostPlayer2']).min(),
-                'Max': (self.df['HeartsLostPlayer1'] + self.df['HeartsLostPlayer2']).max(),
-                'StdDev': (self.df['HeartsLostPlayer1'] + self.df['HeartsLostPlayer2']).std()
+                'Mean': hearts_lost.mean,
+                'Min': hearts_lost.minimum,
+                'Max': hearts_lost.maximum,
+                'StdDev': hearts_lost.std()
             },
             'Game Duration': {
-                'Mean': self.df['GameDuration'].mean(),
-                'Min': self.df['GameDuration'].min(),
-                'Max': self.df['GameDuration'].max(),
-                'StdDev': self.df['GameDuration'].std()
+                'Mean': duration.mean,
+                'Min': duration.minimum,
+                'Max': duration.maximum,
+                'StdDev': duration.std()
             }
         }
 
         # Calculate win rate for each player
-        all_players = set(self.df['Player1'].tolist() + self.df['Player2'].tolist())
-        all_players = [p for p in all_players if p != 'Enemy Castle']  # Exclude AI
+        all_players = [p for p in summary.players if p != 'Enemy Castle']  # Exclude AI
 
         win_rates = {}
         for player in all_players:
-            games_played = len(self.df[(self.df['Player1'] == player) | (self.df['Player2'] == player)])
-            wins = len(self.df[self.df['Winner'] == player])
+            wins, games_played = summary.player_record(player)
             win_rate = (wins / games_played) * 100 if games_played > 0 else 0
             win_rates[player] = win_rate
 
@@ -626,6 +698,7 @@ class GameStatsVisualizer:
 
 
 if __name__ == "__main__":
-    visualizer = GameStatsVisualizer()
+    # Optionally pass another stats file, e.g. a SQLite database: python stats_visualizer.py game_stats.db
+    visualizer = GameStatsVisualizer(sys.argv[1] if len(sys.argv) > 1 else STATS_FILE)
     visualizer.create_all_visualizations()
     print("Done! Check the 'game_stats_visualizations' folder for all visualizations")
\ No newline at end of file
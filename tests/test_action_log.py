@@ -0,0 +1,88 @@
+"""Tests of the binary action log and replayer (action_log.py)"""
+
+import random
+import struct
+
+import pytest
+
+from action_log import (MAX_CARD_INDEX, ActionLog, append_logs, decode_action, encode_action, index_logs, read_log_at,
+                        read_logs, replay)
+from ai_policy import BasicPolicy
+from rules_engine import ATTACK, END_TURN, HEAL, NEXT_TURN, PLAY_CARD, Action, new_match
+
+
+def recorded_match(seed, player2_name="Bob"):
+    """Play a logged match, returns its log and the state snapshot after every action"""
+    log = ActionLog(seed, "Alice", player2_name)
+    engine = new_match("Alice", player2_name, rng=random.Random(seed), log=log)
+    policies = {"player1": BasicPolicy(random.Random(seed + 1)), "player2": BasicPolicy(random.Random(seed + 2))}
+    snapshots = [engine.state.snapshot()]
+    while not engine.state.game_over:
+        if engine.apply(policies[engine.state.current_turn].choose_action(engine)):
+            snapshots.append(engine.state.snapshot())
+    return log, snapshots
+
+
+def test_replay_rebuilds_every_intermediate_state():
+    log, snapshots = recorded_match(3)
+    assert len(log) == len(snapshots) - 1
+    for actions, snapshot in enumerate(snapshots):
+        assert replay(log, actions).state.snapshot() == snapshot
+    assert replay(log).state.snapshot() == snapshots[-1]
+
+
+def test_archive_round_trip(tmp_path):
+    path = str(tmp_path / "logs.bin")
+    logs = [recorded_match(seed, name)[0] for seed, name in ((1, "Bob"), (2, None), (3, "Carol"))]
+    append_logs(path, logs[:2])
+    append_logs(path, [logs[2].to_bytes()])
+
+    read = list(read_logs(path))
+    assert [(log.card_seed, log.player1_name, log.player2_name, list(log.actions)) for log in read] == \
+        [(log.card_seed, log.player1_name, log.player2_name, list(log.actions)) for log in logs]
+    offsets = index_logs(path)
+    assert len(offsets) == 3
+    assert list(read_log_at(path, offsets[2]).actions) == list(logs[2].actions)
+
+
+def test_encode_decode_round_trip():
+    for action, card_id in ((Action(ATTACK, 40), None), (Action(HEAL, None), None), (END_TURN, None),
+                            (Action(NEXT_TURN), None), (Action(PLAY_CARD, 100, 255), 8), (Action(PLAY_CARD, 0, 0), 0),
+                            (Action(PLAY_CARD, 100, MAX_CARD_INDEX), 14)):
+        assert decode_action(encode_action(action, card_id)) == (action, card_id)
+
+
+def test_unencodable_action_leaves_the_state_unchanged():
+    log = ActionLog(0, "Alice", "Bob")
+    engine = new_match("Alice", "Bob", rng=random.Random(0), log=log)
+    engine.state.player1.cards.extend([0] * (MAX_CARD_INDEX + 2))
+    snapshot = engine.state.snapshot()
+    with pytest.raises(ValueError):
+        engine.apply(Action(PLAY_CARD, 50, MAX_CARD_INDEX + 1))
+    assert engine.state.snapshot() == snapshot
+    assert len(log) == 0
+
+
+def test_large_hands_and_long_names_are_recorded(tmp_path):
+    path = str(tmp_path / "logs.bin")
+    name = "Ä" * 300  # 600 UTF-8 bytes
+    log = ActionLog(0, name, "Bob")
+    engine = new_match(name, "Bob", rng=random.Random(0), log=log)
+    engine.state.current_round = 2
+    engine.state.player1.cards.extend([0] * 300)
+    assert engine.apply(Action(PLAY_CARD, 50, 299))
+    append_logs(path, [log])
+
+    read = next(read_logs(path))
+    assert read.player1_name == name
+    assert list(read.decoded()) == list(log.decoded())
+    assert next(read.decoded())[0] == Action(PLAY_CARD, 50, 299)
+
+
+def test_first_format_archives_can_still_be_read(tmp_path):
+    path = tmp_path / "logs.bin"
+    log, _ = recorded_match(4)
+    old_header = struct.pack("<4sQIBB", b"CWL1", log.card_seed, len(log), 5, 3)
+    path.write_bytes(old_header + b"AliceBob" + log.actions.tobytes() + log.to_bytes())
+    assert index_logs(str(path))[1] == len(old_header) + 8 + 4 * len(log)
+    assert [list(read.actions) for read in read_logs(str(path))] == [list(log.actions)] * 2
@@ -0,0 +1,46 @@
+"""Tests of the NumPy batch engine (batch_engine.py) against the scalar rules engine"""
+
+import numpy as np
+
+from batch_engine import BatchGames
+from simulate import simulate_chunk
+
+GAMES = 4000
+
+
+def batch_summary(games, seed, max_rounds=200):
+    return BatchGames(games, np.random.default_rng(seed), max_rounds=max_rounds).run().summary()
+
+
+def scalar_summary(games, seed, max_rounds=200):
+    summary, _, _ = simulate_chunk("basic", "basic", seed, 0, games, max_rounds, False)
+    return summary
+
+
+def test_same_seed_same_batch():
+    assert batch_summary(500, 7) == batch_summary(500, 7)
+
+
+def test_every_game_has_one_result():
+    summary = batch_summary(1000, 1)
+    assert summary["player1_wins"] + summary["player2_wins"] + summary["draws"] == 1000
+
+
+def test_batch_agrees_with_scalar_engine():
+    # Both play BasicPolicy against itself; with fixed seeds the differences are sampling noise only
+    batch = batch_summary(GAMES, 1)
+    scalar = scalar_summary(GAMES, 1)
+    assert abs(batch["player1_wins"] - scalar.player1_wins) / GAMES < 0.04
+    assert abs(batch["player2_wins"] - scalar.player2_wins) / GAMES < 0.04
+    assert abs(batch["mean_rounds"] - scalar.total_rounds / GAMES) < 0.3
+    assert abs(batch["mean_hearts_lost_player1"] - scalar.hearts_lost_player1 / GAMES) < 1.0
+    assert abs(batch["mean_hearts_lost_player2"] - scalar.hearts_lost_player2 / GAMES) < 1.0
+    assert abs(batch["mean_cards_played"] - scalar.cards_played / GAMES) < 0.2
+
+
+def test_rounds_of_unfinished_games_agree():
+    # Hardly any game ends within 3 rounds, both engines count the rounds played
+    batch = batch_summary(200, 2, max_rounds=3)
+    scalar = scalar_summary(200, 2, max_rounds=3)
+    assert batch["mean_rounds"] <= 3
+    assert abs(batch["mean_rounds"] - scalar.total_rounds / 200) < 0.05
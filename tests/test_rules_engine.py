@@ -0,0 +1,64 @@
+"""Tests of the headless rules engine (rules_engine.py)"""
+
+import os
+import random
+import subprocess
+import sys
+
+from ai_policy import BasicPolicy, play_match
+from rules_engine import ATTACK, END_TURN, Action, new_match
+
+
+def play(seed, max_rounds=None):
+    engine = new_match("Alice", "Bob", rng=random.Random(seed))
+    play_match(engine, BasicPolicy(random.Random(seed + 1)), BasicPolicy(random.Random(seed + 2)), max_rounds)
+    return engine
+
+
+def test_imports_without_pygame():
+    code = "import sys, rules_engine; sys.exit('pygame' in sys.modules)"
+    repository = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert subprocess.run([sys.executable, "-c", code], cwd=repository).returncode == 0
+
+
+def test_same_seeds_play_the_same_match():
+    for seed in range(5):
+        assert play(seed).state.snapshot() == play(seed).state.snapshot()
+
+
+def test_finished_match_has_a_defeated_loser():
+    for seed in range(20):
+        state = play(seed).state
+        assert state.game_over
+        loser = state.player1 if state.winner == "player2" else state.player2
+        assert loser.hearts <= 0
+
+
+def test_finished_match_rejects_actions():
+    engine = play(0)
+    snapshot = engine.state.snapshot()
+    assert not engine.apply(Action(ATTACK, 50))
+    assert engine.state.snapshot() == snapshot
+
+
+def test_snapshot_restore_round_trip():
+    engine = play(3, max_rounds=4)
+    snapshot = engine.state.snapshot()
+    policy = BasicPolicy(random.Random(9))
+    for _ in range(10):
+        engine.apply(policy.choose_action(engine))
+    engine.state.restore(snapshot)
+    assert engine.state.snapshot() == snapshot
+
+
+def test_every_legal_action_applies():
+    engine = play(4, max_rounds=5)
+    state = engine.state
+    if state.action_taken:
+        engine.apply(END_TURN)
+    snapshot = state.snapshot()
+    actions = engine.legal_actions()
+    assert actions
+    for action in actions:
+        state.restore(snapshot)
+        assert engine.apply(action), action
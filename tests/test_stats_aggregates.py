@@ -0,0 +1,106 @@
+"""Tests of the running stats aggregates sidecar (stats_aggregates.py)"""
+
+import csv
+import math
+import random
+import statistics
+
+import pytest
+
+from game_stats import StatsWriter
+from stats_aggregates import (HISTOGRAM_BIN_WIDTHS, RunningAggregates, RunningStat, aggregates_path,
+                              build_aggregates, load_aggregates)
+
+
+def stats_rows(count, seed=0):
+    rng = random.Random(seed)
+    players = ["Alice", "Bob", "Carol", "Enemy Castle"]
+    rows = []
+    for index in range(count):
+        player1, player2 = rng.sample(players, 2)
+        rows.append([f"2025-05-{index % 28 + 1:02d} 12:00", player1, player2, rng.choice((player1, player2)),
+                     rng.randint(0, 20), rng.randint(0, 40), rng.randint(0, 40), rng.randint(0, 30),
+                     rng.randint(0, 30), round(rng.uniform(5, 400), 2), rng.randint(2, 80),
+                     rng.randint(0, 20), rng.randint(0, 20), rng.randint(0, 20), rng.randint(0, 10)])
+    return rows
+
+
+def write(path, rows, **options):
+    writer = StatsWriter(str(path), **options)
+    writer.add_rows(rows)
+    writer.close()
+
+
+def test_running_stat_matches_statistics_module():
+    values = [random.Random(1).uniform(-50, 50) for _ in range(1000)]
+    stat = RunningStat()
+    for value in values:
+        stat.add(value)
+    assert stat.count == len(values)
+    assert stat.mean == pytest.approx(statistics.fmean(values))
+    assert stat.std() == pytest.approx(statistics.stdev(values))
+    assert (stat.minimum, stat.maximum) == (min(values), max(values))
+    assert math.isnan(RunningStat().std())
+
+
+def test_aggregates_count_players_and_histograms():
+    rows = stats_rows(500)
+    aggregates = RunningAggregates()
+    aggregates.add_rows(rows)
+    for player in ("Alice", "Bob"):
+        games = sum(player in (row[1], row[2]) for row in rows)
+        wins = sum(row[3] == player for row in rows)
+        assert aggregates.player_record(player) == (wins, games)
+    for name, width in HISTOGRAM_BIN_WIDTHS.items():
+        edges, counts = aggregates.histogram(name)
+        assert sum(counts) == 500
+        assert len(edges) == len(counts) + 1 and edges[1] == width
+
+
+def test_sidecar_written_in_batches_matches_rebuild(tmp_path):
+    path = tmp_path / "stats.csv"
+    rows = stats_rows(1000)
+    write(path, rows[:300], max_rows=7)
+    write(path, rows[300:], max_rows=64)
+    sidecar = load_aggregates(str(path)).to_dict()
+    rebuilt = build_aggregates(str(path)).to_dict()
+    assert sidecar["games"] == rebuilt["games"] == 1000
+    assert sidecar["players"] == rebuilt["players"]
+    assert sidecar["histograms"] == rebuilt["histograms"]
+    for name, values in sidecar["stats"].items():
+        assert values == pytest.approx(rebuilt["stats"][name]), name
+
+
+def test_writers_of_one_file_keep_each_others_counts(tmp_path):
+    path = str(tmp_path / "stats.csv")
+    first, second = StatsWriter(path), StatsWriter(path)
+    for writer, row in zip((first, second, first, second), stats_rows(4)):
+        writer.add_rows([row])
+        writer.flush()
+    assert load_aggregates(path).games == 4
+
+
+def test_stale_sidecar_is_rebuilt(tmp_path):
+    path = tmp_path / "stats.csv"
+    write(path, stats_rows(10))
+    with open(path, "a", newline="") as file:
+        csv.writer(file).writerows(stats_rows(5, seed=1))  # Appended without a StatsWriter
+    assert load_aggregates(str(path)).games == 15
+    assert RunningAggregates.load(aggregates_path(str(path))).games == 15
+
+
+def test_missing_stats_file_means_no_games(tmp_path):
+    path = tmp_path / "stats.csv"
+    write(path, stats_rows(10))
+    path.unlink()
+    assert load_aggregates(str(path)).games == 0
+
+
+def test_rows_round_trip_through_every_store(tmp_path):
+    rows = stats_rows(50)
+    for name in ("stats.csv", "stats.db", "stats.columns"):
+        path = tmp_path / name
+        write(path, rows)
+        aggregates = load_aggregates(str(path))
+        assert aggregates.games == 50, name
+        assert aggregates.players == build_aggregates(str(path)).players, name
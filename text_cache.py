@@ -0,0 +1,56 @@
+"""
+Castle War Game - Text Surface Cache
+Rendering text rasterises every glyph, which is the most expensive part of a
+frame, yet almost all strings on screen are the same from one frame to the
+next. TextCache keeps the rendered surfaces of recent strings and hands the
+same surface out again until it falls out of the LRU.
+"""
+
+from collections import OrderedDict
+
+from frame_profiler import NO_PROFILER
+
+DEFAULT_MAX_SIZE = 512  # A game screen shows well under a hundred distinct strings
+
+
+class TextCache:
+    """LRU cache of rendered text surfaces keyed on (font, text, antialias, color)
+
+    Surfaces are shared between callers, so they must only be blitted, never
+    drawn on. Rendering on a miss is timed as the "text" phase of profiler.
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, profiler=NO_PROFILER):
+        self.max_size = max_size
+        self.profiler = profiler
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def __len__(self):
+        return len(self._surfaces)
+
+    def render(self, font, text, antialias, color):
+        """Same arguments as font.render(text, antialias, color), cached"""
+        key = (font, text, antialias, color)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        with self.profiler.phase("text"):
+            surface = self._surfaces[key] = font.render(text, antialias, color)
+        self.profiler.count("surfaces")
+        if len(self._surfaces) > self.max_size:
+            self._surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        """Drop every cached surface, e.g. after the fonts changed"""
+        self._surfaces.clear()
+
+    def hit_rate(self):
+        """Fraction of render calls answered from the cache"""
+        return self.hits / max(self.hits + self.misses, 1)
@@ -6,14 +6,39 @@ This file adds a visualization dashboard to the main menu with scrolling functio
 import pygame
 import sys
 import os
-from config import WIDTH, HEIGHT, WHITE, BLACK, COLORS, font, button_font
+from config import WIDTH, HEIGHT, WHITE, BLACK, COLORS, get_font
+from assets import load_image, get_image
+from frame_scheduler import FrameScheduler
+from game_stats import STATS_FILE
+from stats_aggregates import load_aggregates
+
+VISUALIZATIONS_PATH = "game_stats_visualizations"
+SUMMARY_CATEGORY = "Summary"  # Category that also shows the live totals of every recorded game
+SUMMARY_TOP_PLAYERS = 3  # Players listed in the live totals, most games first
+
+# Menu categories and the charts they show
+CATEGORIES = [
+    {"name": "Player Stats", "images": ["win_loss_distribution.png", "player_improvement.png"]},
+    {"name": "Unit Analysis", "images": ["unit_allocation_comparison.png", "unit_allocation_pie_chart.png"]},
+    {"name": "Battle Stats", "images": ["battle_count_chart.png", "hearts_lost_histogram.png", "hearts_lost_per_game.png"]},
+    {"name": "Game Length", "images": ["game_duration_trend.png", "game_duration_box_plot.png"]},
+    {"name": "Action Types", "images": ["action_type_distribution.png"]},
+    {"name": "Summary", "images": ["statistical_table.png"]}
+]
+
+
+def visualization_image_paths():
+    """Paths of every chart the dashboard can show, e.g. to preload them"""
+    return [os.path.join(VISUALIZATIONS_PATH, image_name)
+            for category in CATEGORIES for image_name in category["images"]]
+
 
 class VisualizationDashboard:
     def __init__(self, screen):
         self.screen = screen
         self.running = True
         self.active_category = None
-        self.visualizations_path = "game_stats_visualizations"
+        self.visualizations_path = VISUALIZATIONS_PATH
 
         # Scrolling variables
         self.scroll_y = 0
@@ -27,19 +52,12 @@ class VisualizationDashboard:
             self.vis_available = any(file.endswith('.png') for file in os.listdir(self.visualizations_path))
 
         # Define menu categories
-        self.categories = [
-            {"name": "Player Stats", "images": ["win_loss_distribution.png", "player_improvement.png"]},
-            {"name": "Unit Analysis", "images": ["unit_allocation_comparison.png", "unit_allocation_pie_chart.png"]},
-            {"name": "Battle Stats", "images": ["battle_count_chart.png", "hearts_lost_histogram.png", "hearts_lost_per_game.png"]},
-            {"name": "Game Length", "images": ["game_duration_trend.png", "game_duration_box_plot.png"]},
-            {"name": "Action Types", "images": ["action_type_distribution.png"]},
-            {"name": "Summary", "images": ["statistical_table.png"]}
-        ]
-
-        # Load font for buttons and headings
-        self.menu_font = pygame.font.Font(None, 28)
-        self.heading_font = pygame.font.Font(None, 36)
-        self.title_font = pygame.font.Font(None, 48)
+        self.categories = CATEGORIES
+
+        # Font for buttons and headings
+        self.menu_font = get_font(28)
+        self.heading_font = get_font(36)
+        self.title_font = get_font(48)
 
         # Preload background for buttons
         self.button_bg = pygame.Surface((200, 40))
@@ -64,14 +82,17 @@ class VisualizationDashboard:
         if self.vis_available:
             self.preload_images()
 
+        # Live totals, rendered once: read from the running aggregates, so their cost doesn't grow with the games
+        self.summary_texts = [self.menu_font.render(line, True, BLACK) for line in self.summary_lines()]
+
     def preload_images(self):
-        """Preload all visualization images"""
+        """Preload all visualization images (decoded and scaled once per process, see assets.py)"""
         for category in self.categories:
             for image_name in category["images"]:
                 image_path = os.path.join(self.visualizations_path, image_name)
                 if os.path.exists(image_path):
                     try:
-                        img = pygame.image.load(image_path)
+                        img = load_image(image_path)
                         # Scale image to fit in visualization area
                         max_width = WIDTH - self.menu_width - 80  # 40px padding on each side
                         max_height = HEIGHT - 200  # Leave space for title and bottom area
@@ -84,25 +105,52 @@ class VisualizationDashboard:
                         new_width = int(img.get_width() * scale_factor)
                         new_height = int(img.get_height() * scale_factor)
 
-                        scaled_img = pygame.transform.smoothscale(img, (new_width, new_height))
-                        self.images[image_name] = scaled_img
+                        self.images[image_name] = get_image(image_path, (new_width, new_height), smooth=True)
                     except pygame.error as e:
                         print(f"Error loading image {image_name}: {e}")
                         self.images[image_name] = None
 
+    def summary_lines(self, stats_file=STATS_FILE):
+        """Text lines of the live totals of every recorded game, empty without games"""
+        try:
+            summary = load_aggregates(stats_file)
+        except (OSError, ValueError) as e:
+            print(f"Error loading game statistics: {e}")
+            return []
+        if not summary.games:
+            return []
+
+        stats = summary.stats
+        duration = stats["GameDuration"].mean
+        units = stats["SoldiersCreated"].total + stats["FarmersCreated"].total
+        lines = [f"Games played: {summary.games}",
+                 f"Average battles per game: {stats['BattleCount'].mean:.1f}",
+                 f"Average game length: {int(duration // 60)}:{int(duration % 60):02d}",
+                 f"Soldiers: {stats['SoldiersCreated'].total / units:.0%} of all units" if units
+                 else "No units created"]
+        players = sorted((player for player in summary.players if player != "Enemy Castle"),
+                         key=lambda player: -summary.players[player][1])
+        for player in players[:SUMMARY_TOP_PLAYERS]:
+            wins, games = summary.player_record(player)
+            lines.append(f"{player}: {wins} wins in {games} games ({wins / games:.0%})")
+        return lines
+
     def run(self):
         """Main loop for the visualization dashboard"""
-        clock = pygame.time.Clock()
+        scheduler = FrameScheduler()
+        events = None
 
         while self.running:
-            self.handle_events()
-            self.draw()
-            pygame.display.flip()
-            clock.tick(60)  # Limit to 60 FPS
-
-    def handle_events(self):
-        """Handle pygame events"""
-        for event in pygame.event.get():
+            # The dashboard only changes on input: draw the first frame, then only after events
+            if events is None or events:
+                self.draw()
+                pygame.display.flip()
+            events = scheduler.wait()
+            self.handle_events(events)
+
+    def handle_events(self, events=None):
+        """Handle pygame events (all pending events by default)"""
+        for event in pygame.event.get() if events is None else events:
             if event.type == pygame.QUIT:
                 self.running = False
                 pygame.quit()
@@ -287,6 +335,13 @@ class VisualizationDashboard:
         # Keep track of total content height to determine if scrolling is needed
         total_height = 60  # Start after the title
 
+        # Live totals above the summary charts
+        if selected_category["name"] == SUMMARY_CATEGORY and self.summary_texts:
+            for text in self.summary_texts:
+                surface.blit(text, (40, total_height - self.scroll_y))
+                total_height += 30
+            total_height += 10
+
         # Display images for this category
         for image_name in selected_category["images"]:
             if image_name in self.images and self.images[image_name]: